@@ -12,15 +12,21 @@ module_c = Extension(
 # Define the PoW optimization module
 module_pow = Extension(
     "twopidgeons.pow_module",
-    sources=["twopidgeons/pow_module.c"],
-    libraries=["crypto"]
+    sources=[
+        "twopidgeons/pow_module.c",
+        "twopidgeons/sha256.c"  # Shared SHA-256 (SHA-NI dispatch)
+    ],
+    depends=["twopidgeons/sha256.h"]
 )
 
 # Define the Merkle Tree optimization module
 module_merkle = Extension(
     "twopidgeons.merkle_module",
-    sources=["twopidgeons/merkle_module.c"],
-    libraries=["crypto"]
+    sources=[
+        "twopidgeons/merkle_module.c",
+        "twopidgeons/sha256.c"
+    ],
+    depends=["twopidgeons/sha256.h"]
 )
 
 # Define the Smart Contract VM module
@@ -136,3 +136,189 @@ def test_is_valid_chain_static():
         Blockchain.difficulty = old_diff
     chain_bad = [b0, b1, b2_bad]
     assert Blockchain.is_valid_chain(chain_bad) is False
+
+def test_compute_hash_matches_reference():
+    # The C SHA-256 path must produce exactly the hashlib digest of the JSON header
+    import hashlib
+    block = Block(3, [{"a": 1}], 1700000000.25, "ab" * 32, nonce=12345)
+    header = {
+        'index': block.index,
+        'timestamp': block.timestamp,
+        'previous_hash': block.previous_hash,
+        'nonce': block.nonce,
+        'merkle_root': block.merkle_root
+    }
+    expected = hashlib.sha256(json.dumps(header, sort_keys=True).encode()).hexdigest()
+    assert block.compute_hash() == expected
+
+@pytest.mark.parametrize("index, timestamp, previous_hash", [
+    (0, 0.0, "0"),
+    (7, 1700000000, "wrong_hash"),
+    (2, 1e-07, 'quote"and\\slash'),
+    (5, 123.456, "caf\u00e9"),
+])
+def test_header_string_matches_json(index, timestamp, previous_hash):
+    block = Block(index, [], timestamp, previous_hash, nonce=42)
+    header = {
+        'index': index,
+        'timestamp': timestamp,
+        'previous_hash': previous_hash,
+        'nonce': 42,
+        'merkle_root': block.merkle_root
+    }
+    assert block.header_string() == json.dumps(header, sort_keys=True)
+
+def test_pow_search_matches_compute_hash():
+    pow_module = pytest.importorskip("twopidgeons.pow_module")
+    block = Block(1, [{"a": 1}], 1700000000.5, "ab" * 32)
+    prefix, suffix = block.header_parts()
+
+    nonce, hash_val = pow_module.pow_search(prefix.encode(), suffix.encode(), 2)
+    block.nonce = nonce
+    assert hash_val == block.compute_hash()
+    assert hash_val.startswith("00")
+
+    # A bounded search that cannot succeed returns None
+    assert pow_module.pow_search(prefix.encode(), suffix.encode(), 64, max_iters=1000) is None
+    # Threaded search returns the same (smallest) nonce as the serial one
+    assert pow_module.pow_search(prefix.encode(), suffix.encode(), 3, threads=4) == \
+        pow_module.pow_search(prefix.encode(), suffix.encode(), 3)
+
+def test_compute_hash_cache_invalidated_by_header_change():
+    block = Block(1, [{"a": 1}], 1700000000, "prev")
+    cached = block.compute_hash()
+    assert block.compute_hash() is cached
+
+    block.nonce = 42
+    assert block.compute_hash() != cached
+    assert block.compute_hash() == Block(1, [{"a": 1}], 1700000000, "prev", nonce=42).hash
+
+    # Transactions only reach the hash through merkle_root
+    block.transactions = [{"b": 2}]
+    assert block.compute_hash() == Block(1, [{"a": 1}], 1700000000, "prev", nonce=42).hash
+    assert "_hash_cache" not in block.to_dict()
+
+def test_to_json_bytes_cached_until_fields_change():
+    block = Block(1, [{"a": 1}], 1700000000, "prev")
+    encoded = block.to_json_bytes()
+    assert block.to_json_bytes() is encoded
+    assert json.loads(encoded) == block.to_dict()
+
+    block.transactions = [{"b": 2}]
+    assert json.loads(block.to_json_bytes())['transactions'] == [{"b": 2}]
+    block.nonce = 7
+    assert json.loads(block.to_json_bytes()) == block.to_dict()
+
+@pytest.mark.parametrize("difficulty", [1, 2, 3])
+def test_python_pow_fallback_matches_compute_hash(monkeypatch, difficulty):
+    import twopidgeons.blockchain as blockchain_module
+    monkeypatch.setattr(blockchain_module, "pow_module", None)
+    monkeypatch.setattr(Blockchain, "difficulty", difficulty)
+    block = Block(1, [{"a": 1}], 1700000000.5, "ab" * 32)
+
+    hash_val = Blockchain.proof_of_work(None, block)
+    assert hash_val.startswith("0" * difficulty)
+    assert block.hash == hash_val
+    assert Block(1, [{"a": 1}], 1700000000.5, "ab" * 32, nonce=block.nonce).hash == hash_val
+
+def test_verify_hash_detects_tampering():
+    block = Block(1, [{"a": 1}], 1700000000, "prev")
+    assert block.verify_hash()
+
+    # A trusted hash is adopted as-is, but a forged one still fails
+    trusted = Block(1, [{"a": 1}], 1700000000, "prev", block_hash=block.hash)
+    assert trusted.verify_hash()
+    trusted.hash = "0" * 64
+    assert not trusted.verify_hash()
+
+    block.timestamp = 1700000001
+    assert not block.verify_hash()
+
+def test_replace_chain_verifies_from_fork_point(monkeypatch):
+    from twopidgeons.storage import InMemoryBackend
+    monkeypatch.setattr(Blockchain, "difficulty", 1)
+    ours = Blockchain(storage=InMemoryBackend())
+    for i in range(3):
+        ours.add_new_transaction({"data": i})
+        ours.mine()
+
+    def copy(block):
+        return Block(block.index, block.transactions, block.timestamp, block.previous_hash,
+                     nonce=block.nonce, merkle_root=block.merkle_root)
+
+    peer = Blockchain(storage=InMemoryBackend())
+    peer.chain = [copy(b) for b in ours.chain]
+    assert ours.shared_prefix(peer.chain) == 4
+    peer.add_new_transaction({"data": "peer"})
+    peer.mine()
+
+    # A broken block after the fork point is still rejected
+    forged = [copy(b) for b in peer.chain]
+    forged[-1].hash = "0" * 64
+    assert not ours.replace_chain(forged)
+
+    assert ours.replace_chain(peer.chain)
+    assert ours.last_block.transactions == [{"data": "peer"}]
+
+def test_find_transaction_by_filename_follows_chain(monkeypatch):
+    from twopidgeons.storage import InMemoryBackend
+    monkeypatch.setattr(Blockchain, "difficulty", 1)
+    bc = Blockchain(storage=InMemoryBackend())
+    bc.add_new_transaction({"filename": "abcde.2pg", "ipfs_cid": "one"})
+    bc.mine()
+    assert bc.find_transaction_by_filename("abcde.2pg")["ipfs_cid"] == "one"
+    assert bc.find_transaction_by_filename("fghij.2pg") is None
+
+    # Later blocks win, and are picked up without a full rescan
+    bc.add_new_transaction({"filename": "abcde.2pg", "ipfs_cid": "two", "type": "transfer"})
+    bc.mine()
+    assert bc.find_transaction_by_filename("abcde.2pg")["ipfs_cid"] == "two"
+
+    # A replaced chain is re-indexed
+    other = Blockchain(storage=InMemoryBackend())
+    other.add_new_transaction({"filename": "fghij.2pg", "ipfs_cid": "three"})
+    other.mine()
+    other.add_new_transaction({"data": 0})
+    other.mine()
+    other.add_new_transaction({"data": 1})
+    other.mine()
+    assert bc.replace_chain(other.chain)
+    assert bc.find_transaction_by_filename("abcde.2pg") is None
+    assert bc.find_transaction_by_filename("fghij.2pg")["ipfs_cid"] == "three"
+
+def test_append_blocks_stops_at_first_invalid(monkeypatch):
+    from twopidgeons.storage import InMemoryBackend
+    monkeypatch.setattr(Blockchain, "difficulty", 1)
+    peer = Blockchain(storage=InMemoryBackend())
+    for i in range(3):
+        peer.add_new_transaction({"data": i})
+        peer.mine()
+
+    ours = Blockchain(storage=InMemoryBackend())
+    ours.chain = peer.chain[:1]
+    received = [Block(b.index, b.transactions, b.timestamp, b.previous_hash, nonce=b.nonce)
+                for b in peer.chain[1:]]
+    received[1].nonce += 1  # Breaks the proof of work of the second block
+
+    assert ours.append_blocks(received) == 1
+    assert ours.last_block.hash == peer.chain[1].hash
+    assert len(ours.storage.load_chain()) == 2  # Genesis plus the accepted block
+
+def test_is_plausible_chain_data(monkeypatch):
+    from twopidgeons.storage import InMemoryBackend
+    monkeypatch.setattr(Blockchain, "difficulty", 1)
+    bc = Blockchain(storage=InMemoryBackend())
+    for i in range(3):
+        bc.add_new_transaction({"data": i})
+        bc.mine()
+
+    chain_data = json.loads(json.dumps([block.to_dict() for block in bc.chain]))
+    assert Blockchain.is_plausible_chain_data(chain_data)
+    assert not Blockchain.is_plausible_chain_data([])
+
+    broken = json.loads(json.dumps(chain_data))
+    broken[2]['previous_hash'] = "f" * 64
+    assert not Blockchain.is_plausible_chain_data(broken)
+
+    skipped = chain_data[:2] + chain_data[3:]
+    assert not Blockchain.is_plausible_chain_data(skipped)
@@ -70,3 +70,192 @@ def test_invalid_public_key(blockchain):
     tx['signature'] = signature
     
     assert blockchain.add_new_transaction(tx) is False
+
+def test_batch_verification_keeps_order(monkeypatch):
+    import twopidgeons.blockchain as blockchain_module
+    from twopidgeons.storage import InMemoryBackend
+    # Force the thread pool even on a single-CPU machine
+    monkeypatch.setattr(blockchain_module, "VERIFY_THREADS", 4)
+    bc = Blockchain(storage=InMemoryBackend())
+    private_key, public_key = generate_keys()
+    public_key_pem = serialize_public_key(public_key)
+
+    txs = []
+    for i in range(6):
+        tx = {"sender": "Alice", "amount": i, "public_key": public_key_pem}
+        tx['signature'] = sign_data(private_key, json.dumps(tx, sort_keys=True).encode())
+        txs.append(tx)
+    txs[2]['amount'] = 1000  # Tampered
+    txs.append({"sender": "Dave", "amount": 7})  # Unsigned
+
+    assert bc.add_new_transactions_batch(txs) == [True, True, False, True, True, True, True]
+    assert bc.unconfirmed_transactions == [tx for i, tx in enumerate(txs) if i != 2]
+
+def test_stream_decryption_matches_in_memory():
+    import io
+    from cryptography.exceptions import InvalidTag
+    from twopidgeons.crypto_utils import encrypt_data_hybrid, decrypt_data_hybrid, decrypt_stream_hybrid
+    private_key, public_key = generate_keys()
+    data = bytes(range(256)) * 1000 + b"tail"
+    encrypted = encrypt_data_hybrid(data, public_key)
+
+    assert decrypt_data_hybrid(encrypted, private_key) == data
+    out = io.BytesIO()
+    assert decrypt_stream_hybrid(io.BytesIO(encrypted), out, private_key, chunk_size=4096) == len(data)
+    assert out.getvalue() == data
+
+    tampered = bytearray(encrypted)
+    tampered[-1] ^= 1
+    with pytest.raises(InvalidTag):
+        decrypt_stream_hybrid(io.BytesIO(bytes(tampered)), io.BytesIO(), private_key)
+    with pytest.raises(ValueError):
+        decrypt_stream_hybrid(io.BytesIO(encrypted[:10]), io.BytesIO(), private_key)
+    with pytest.raises(ValueError):
+        decrypt_data_hybrid(encrypted[:10], private_key)
+
+def test_x25519_hybrid_round_trip():
+    import io
+    from twopidgeons.crypto_utils import (
+        generate_x25519_keys, encrypt_data_hybrid, decrypt_data_hybrid,
+        decrypt_stream_hybrid, is_x25519_payload
+    )
+    private_key, public_key = generate_x25519_keys()
+    data = b"image bytes" * 5000
+    encrypted = encrypt_data_hybrid(data, public_key)
+
+    assert is_x25519_payload(encrypted)
+    assert len(encrypted) == 4 + 32 + 12 + 16 + len(data)
+    assert decrypt_data_hybrid(encrypted, private_key) == data
+    out = io.BytesIO()
+    decrypt_stream_hybrid(io.BytesIO(encrypted), out, private_key, chunk_size=1000)
+    assert out.getvalue() == data
+
+    # RSA-wrapped payloads keep their format
+    rsa_private, rsa_public = generate_keys()
+    assert not is_x25519_payload(encrypt_data_hybrid(data, rsa_public))
+
+def test_key_file_cache_invalidates_on_rewrite(tmp_path):
+    from twopidgeons.crypto_utils import save_key_to_file, load_private_key_from_file, load_public_key_from_file
+    key_file = tmp_path / "private_key.pem"
+    pub_file = tmp_path / "public_key.pem"
+    private_key, public_key = generate_keys()
+    save_key_to_file(private_key, str(key_file), is_private=True)
+    save_key_to_file(public_key, str(pub_file))
+
+    assert load_private_key_from_file(str(key_file)) is load_private_key_from_file(str(key_file))
+    assert load_public_key_from_file(str(pub_file)) is load_public_key_from_file(str(pub_file))
+
+    # Rotating the key must not serve the cached one
+    new_private, _ = generate_keys()
+    save_key_to_file(new_private, str(key_file), is_private=True)
+    loaded = load_private_key_from_file(str(key_file))
+    assert loaded.private_numbers() == new_private.private_numbers()
+
+def test_raw_and_base64_signatures_verify():
+    import binascii
+    from twopidgeons.crypto_utils import verify_signature
+    private_key, public_key = generate_keys()
+    data = b"payload"
+
+    raw = sign_data(private_key, data, raw=True)
+    text = sign_data(private_key, data)
+    assert isinstance(raw, bytes) and len(raw) == 256
+    assert binascii.a2b_base64(text) != raw  # PSS is randomized
+    assert verify_signature(public_key, data, raw)
+    assert verify_signature(public_key, data, text)
+    assert not verify_signature(public_key, b"other", raw)
+
+def test_verify_signatures_batch():
+    import asyncio
+    from twopidgeons.crypto_utils import verify_signatures_batch, verify_signatures_batch_async
+    private_key, public_key = generate_keys()
+    items = [(public_key, b"msg%d" % i, sign_data(private_key, b"msg%d" % i)) for i in range(5)]
+    items[3] = (public_key, b"tampered", items[3][2])
+    expected = [True, True, True, False, True]
+
+    assert verify_signatures_batch(items, max_workers=4) == expected
+    assert verify_signatures_batch(items, max_workers=1) == expected
+    assert verify_signatures_batch([]) == []
+    assert asyncio.run(verify_signatures_batch_async(items)) == expected
+
+def test_ed25519_signed_transaction():
+    from twopidgeons.crypto_utils import generate_ed25519_keys, verify_signature, sign_key_binding
+    from twopidgeons.storage import InMemoryBackend
+    bc = Blockchain(storage=InMemoryBackend())
+    signing_key, verify_key = generate_ed25519_keys()
+    rsa_private, rsa_public = generate_keys()
+
+    raw = sign_data(signing_key, b"data", raw=True)
+    assert len(raw) == 64
+    assert verify_signature(verify_key, b"data", raw)
+    assert not verify_signature(verify_key, b"other", raw)
+
+    tx = {
+        "sender": "Alice",
+        "public_key": serialize_public_key(rsa_public),  # Owner identity
+        "signing_key": serialize_public_key(verify_key),
+        "signing_key_proof": sign_key_binding(rsa_private, serialize_public_key(verify_key))
+    }
+    tx['signature'] = sign_data(signing_key, json.dumps(tx, sort_keys=True).encode())
+    assert bc.verify_transaction(tx) is True
+    tx['sender'] = "Mallory"
+    assert bc.verify_transaction(tx) is False
+
+def test_signing_key_must_be_authorized_by_public_key():
+    from twopidgeons.crypto_utils import generate_ed25519_keys, sign_key_binding
+    from twopidgeons.storage import InMemoryBackend
+    bc = Blockchain(storage=InMemoryBackend())
+    _, victim_public = generate_keys()
+    attacker_private, _ = generate_keys()
+    attacker_signing, attacker_verify = generate_ed25519_keys()
+    attacker_verify_pem = serialize_public_key(attacker_verify)
+
+    def forged(**extra):
+        # Claims the victim's identity, signed with the attacker's Ed25519 key
+        tx = {"filename": "abcde.2pg", "public_key": serialize_public_key(victim_public),
+              "signing_key": attacker_verify_pem, **extra}
+        tx['signature'] = sign_data(attacker_signing, json.dumps(tx, sort_keys=True).encode())
+        return tx
+
+    assert bc.verify_transaction(forged()) is False
+    # A proof from the attacker's own RSA key doesn't vouch for the victim's
+    assert bc.verify_transaction(forged(
+        signing_key_proof=sign_key_binding(attacker_private, attacker_verify_pem))) is False
+    assert bc.verify_transaction(forged(signing_key_proof="not base64!")) is False
+
+def test_chacha_hybrid_round_trip(monkeypatch):
+    import io
+    import twopidgeons.crypto_utils as crypto_utils
+    from cryptography.exceptions import InvalidTag
+    monkeypatch.setattr(crypto_utils, "PREFER_CHACHA", True)
+    private_key, public_key = crypto_utils.generate_x25519_keys()
+    data = b"image bytes" * 5000
+    encrypted = crypto_utils.encrypt_data_hybrid(data, public_key)
+
+    assert encrypted[:4] == crypto_utils.CHACHA_MAGIC
+    assert crypto_utils.is_x25519_payload(encrypted)
+    assert len(encrypted) == 4 + 32 + 12 + len(data) + 16
+    assert crypto_utils.decrypt_data_hybrid(encrypted, private_key) == data
+    out = io.BytesIO()
+    assert crypto_utils.decrypt_stream_hybrid(io.BytesIO(encrypted), out, private_key) == len(data)
+    assert out.getvalue() == data
+
+    tampered = bytearray(encrypted)
+    tampered[-1] ^= 1
+    with pytest.raises(InvalidTag):
+        crypto_utils.decrypt_data_hybrid(bytes(tampered), private_key)
+    with pytest.raises(ValueError):
+        crypto_utils.decrypt_data_hybrid(encrypted[:40], private_key)
+
+def test_zk_challenge_round_trip():
+    from twopidgeons.crypto_utils import serialize_public_key
+    from twopidgeons.zkp import ZKProof
+    private_key, public_key = generate_keys()
+    pem = serialize_public_key(public_key)
+
+    challenge, expected = ZKProof.create_challenge(pem)
+    assert ZKProof.solve_challenge(private_key, challenge) == expected
+
+    raw, expected = ZKProof.create_challenge_raw(pem)
+    assert ZKProof.solve_challenge_raw(private_key, raw) == expected
+    assert ZKProof.solve_challenge(private_key, "not base64!") is None
@@ -72,3 +72,55 @@ def test_spv_concept(tmp_path):
     header_hash = hashlib.sha256(header_string.encode()).hexdigest()
     
     assert header_hash == last_block.hash
+
+def _reference_root(txs):
+    import hashlib
+    hashes = [MerkleTree.hash_transaction(tx) for tx in txs]
+    while len(hashes) > 1:
+        if len(hashes) % 2:
+            hashes.append(hashes[-1])
+        hashes = [hashlib.sha256((hashes[i] + hashes[i + 1]).encode()).hexdigest()
+                  for i in range(0, len(hashes), 2)]
+    return hashes[0]
+
+@pytest.mark.parametrize("count", [1, 2, 3, 7, 8, 9, 16, 17, 33, 100])
+def test_merkle_c_extension_matches_reference(count):
+    merkle_module = pytest.importorskip("twopidgeons.merkle_module")
+    import json
+    txs = [{"data": f"tx{i}"} for i in range(count)]
+    expected = _reference_root(txs)
+
+    assert merkle_module.compute_root([json.dumps(tx, sort_keys=True) for tx in txs]) == expected
+    leaves = "".join(MerkleTree.hash_transaction(tx) for tx in txs).encode()
+    assert merkle_module.compute_root_from_hashes(leaves) == expected
+
+@pytest.mark.parametrize("count", [1, 2, 3, 8, 9])
+def test_python_merkle_matches_reference(count):
+    txs = [{"data": f"tx{i}"} for i in range(count)]
+    assert MerkleTree._compute_root_bytes(txs).decode() == _reference_root(txs)
+
+def test_merkle_accumulator_matches_compute_root():
+    from twopidgeons.merkle_tree import MerkleAccumulator
+    acc = MerkleAccumulator()
+    assert acc.root() == MerkleTree.compute_root([])
+
+    txs = []
+    for i in range(70):
+        tx = {"data": f"tx{i}"}
+        txs.append(tx)
+        acc.add(tx)
+        assert acc.root() == _reference_root(txs)
+
+def test_mine_uses_pending_merkle_root():
+    from twopidgeons.storage import InMemoryBackend
+    original_difficulty = Blockchain.difficulty
+    Blockchain.difficulty = 1
+    try:
+        bc = Blockchain(storage=InMemoryBackend())
+        txs = [{"data": f"tx{i}"} for i in range(5)]
+        for tx in txs:
+            bc.add_new_transaction(tx)
+        bc.mine()
+        assert bc.last_block.merkle_root == MerkleTree.compute_root(txs)
+    finally:
+        Blockchain.difficulty = original_difficulty
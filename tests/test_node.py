@@ -1,6 +1,9 @@
 import pytest
 import os
+import json
+import requests
 from PIL import Image
+from twopidgeons.config import Config
 from twopidgeons.node import Node
 
 @pytest.fixture
@@ -15,6 +18,47 @@ def sample_image(tmp_path):
     img.save(img_path)
     return str(img_path)
 
+@pytest.fixture
+def make_node(tmp_path):
+    """Factory for in-memory nodes (difficulty 1) with `blocks` mined blocks."""
+    def make(name, blocks=0):
+        n = Node(config=Config(storage_dir=str(tmp_path / name), storage_backend="memory", difficulty=1))
+        for i in range(blocks):
+            n.add_transaction({"data": name, "i": i})
+            n.mine_block()
+        return n
+    return make
+
+class FakeResponse:
+    """Stand-in for a requests response; an exception in `lines` is raised mid-stream."""
+    def __init__(self, content=b"", status_code=200, headers=None, lines=()):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.content = content
+        self.lines = lines
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def iter_lines(self):
+        for line in self.lines:
+            if isinstance(line, Exception):
+                raise line
+            yield line
+
+class FakeSession:
+    """Answers GETs with `handler(url, **kwargs)` and records each call."""
+    def __init__(self, handler):
+        self.handler = handler
+        self.requests = []
+
+    def get(self, url, **kwargs):
+        self.requests.append((url, kwargs))
+        return self.handler(url, **kwargs)
+
 def test_store_image_valid(node, sample_image):
     target_name = "abcde.2pg"
     success = node.store_image(sample_image, target_name)
@@ -57,3 +101,200 @@ def test_validate_local_image(node, sample_image):
 
 def test_validate_missing_file(node):
     assert node.validate_local_image("missi.2pg") is False
+
+def test_validate_chain_parallel(tmp_path, monkeypatch):
+    import twopidgeons.node as node_module
+    from twopidgeons.crypto_utils import sign_data
+    config_node = Node(config=Config(storage_dir=str(tmp_path / "n"), storage_backend="memory"))
+
+    for i in range(4):
+        tx = {"sender": "cli", "amount": i, "public_key": config_node.public_key_pem,
+              "signing_key": config_node.signing_key_pem, "signing_key_proof": config_node.signing_key_proof}
+        tx['signature'] = sign_data(config_node.signing_key, json.dumps(tx, sort_keys=True).encode())
+        config_node.add_transaction(tx)
+    config_node.mine_block()
+
+    # Force the process pool for a handful of transactions
+    monkeypatch.setattr(node_module, "PARALLEL_VALIDATION_MIN", 1)
+    assert config_node.validate_chain_parallel(workers=2) is True
+    assert config_node.validate_chain_parallel(workers=1) is True
+
+    config_node.blockchain.last_block.transactions[1]['amount'] = 1000
+    assert config_node.validate_chain_parallel(workers=2) is False
+
+def test_broadcast_block_reaches_every_peer(tmp_path):
+    peers = ["http://peer%d:5000" % i for i in range(5)]
+    config_node = Node(config=Config(storage_dir=str(tmp_path / "n"), storage_backend="memory", peers=peers))
+
+    class Session:
+        def __init__(self):
+            self.posted = []
+
+        def post(self, url, **kwargs):
+            self.posted.append(url)
+            if url.startswith(peers[0]):
+                raise requests.ConnectionError("down")
+
+    config_node.http = Session()
+    config_node.broadcast_block(config_node.blockchain.last_block)
+    assert sorted(config_node.http.posted) == [p + "/block/receive" for p in peers]
+
+def test_receive_block_appends_to_log(tmp_path, monkeypatch):
+    miner = Node(config=Config(storage_dir=str(tmp_path / "m"), storage_backend="memory", difficulty=1))
+    config = Config(storage_dir=str(tmp_path / "r"), storage_backend="log", difficulty=1)
+    receiver = Node(config=config)
+    receiver.blockchain.chain = list(miner.blockchain.chain)
+
+    miner.add_transaction({"data": 1})
+    miner.mine_block()
+    block_data = json.loads(json.dumps(miner.blockchain.last_block.to_dict()))
+    assert receiver.receive_block(block_data) is True
+    assert receiver.blockchain.last_block.hash == block_data['hash']
+
+    stored = receiver.blockchain.storage.load_chain()
+    assert stored[-1]['hash'] == block_data['hash']
+
+    # A re-broadcast of the same block is dropped without being rebuilt
+    monkeypatch.setattr("twopidgeons.node.Block", None)
+    assert receiver.receive_block(block_data) is False
+
+def test_receive_blocks_skips_known_and_stops_at_malformed(make_node, monkeypatch):
+    from twopidgeons.merkle_tree import MerkleTree
+    peer, ours = make_node("p", 4), make_node("o")
+    blocks = [b.to_dict() for b in peer.blockchain.chain]
+    ours.receive_blocks(blocks[:2])
+    assert len(ours.blockchain.chain) == 2
+
+    # Genesis and block 1 are already ours: only the new blocks are hashed
+    hashed = []
+    original = MerkleTree.compute_root
+    monkeypatch.setattr(MerkleTree, "compute_root", staticmethod(lambda txs: hashed.append(txs) or original(txs)))
+    malformed = {k: v for k, v in blocks[4].items() if k != 'transactions'}
+    assert ours.receive_blocks(blocks[:4] + [malformed]) == 2
+    assert hashed == [blocks[2]['transactions'], blocks[3]['transactions']]
+    assert ours.blockchain.last_block.hash == blocks[3]['hash']
+
+def test_resolve_conflicts_takes_longest_valid_chain(make_node):
+    ours = make_node("ours", 1)
+    short, good, forged = make_node("short", 2), make_node("good", 3), make_node("forged", 4)
+    forged_chain = [b.to_dict() for b in forged.blockchain.chain]
+    forged_chain[2]['transactions'] = [{"data": "tampered"}]
+
+    responses = {
+        "http://short": [b.to_dict() for b in short.blockchain.chain],
+        "http://good": [b.to_dict() for b in good.blockchain.chain],
+        "http://forged": forged_chain,
+    }
+    ours.nodes = set(responses)
+    downloads = []
+
+    def serve(url, headers=None, stream=False, **kwargs):
+        peer, _, route = url.partition("/chain")
+        chain = responses[peer]
+        if route == "/head":
+            return FakeResponse(json.dumps({"length": len(chain), "tip_hash": chain[-1]['hash']}).encode())
+        etag = f'"{len(chain)}-{chain[-1]["hash"]}"'
+        if (headers or {}).get("If-None-Match") == etag:
+            return FakeResponse(status_code=304, headers={'ETag': etag})
+        downloads.append(peer)
+        if route == "/stream":
+            assert stream is True
+            return FakeResponse(headers={'ETag': etag}, lines=[json.dumps(block).encode() for block in chain])
+        return FakeResponse(json.dumps({"length": len(chain), "chain": chain}).encode(), headers={'ETag': etag})
+
+    ours.http = FakeSession(serve)
+    assert ours.resolve_conflicts() is True
+    assert ours.blockchain.last_block.hash == good.blockchain.last_block.hash
+    assert sorted(downloads) == ["http://forged", "http://good", "http://short"]
+
+    # Next round: the shorter chains and the rejected forged tip aren't downloaded again
+    downloads.clear()
+    assert ours.resolve_conflicts() is False
+    assert downloads == []
+
+    # An unchanged chain is answered with 304 instead of being sent again
+    assert ours._fetch_chain("http://good", ndjson=True) is None
+    assert downloads == []
+
+def test_resolve_conflicts_skips_malformed_peers(make_node):
+    ours, good = make_node("ours", 1), make_node("good", 3)
+    good_chain = [b.to_dict() for b in good.blockchain.chain]
+    # Raw bodies per peer and route; a missing /head falls back to /chain
+    bodies = {
+        "http://good": {"": json.dumps({"chain": good_chain})},
+        "http://html": {"/head": "<html>", "": "<html>"},
+        "http://nochain": {"": json.dumps({"length": 9})},
+        "http://notalist": {"": json.dumps({"chain": 5})},
+        "http://badhead": {"/head": json.dumps({"tip_hash": "x"}), "": json.dumps({"chain": [1, 2]})},
+        # Longer than the good chain, so they are tried first
+        "http://missingkeys": {"": json.dumps({"chain": [{"index": 0, "previous_hash": "0", "hash": "0"}]
+                                                        + [{"foo": i} for i in range(5)]})},
+        "http://badtypes": {"": json.dumps({"chain": [dict(b, transactions="x") for b in good_chain * 2]})},
+    }
+    ours.nodes = set(bodies)
+
+    def serve(url, **kwargs):
+        peer, _, route = url.partition("/chain")
+        body = bodies[peer].get(route)
+        return FakeResponse(body.encode()) if body is not None else FakeResponse(status_code=404)
+
+    ours.http = FakeSession(serve)
+    assert ours.resolve_conflicts() is True
+    assert ours.blockchain.last_block.hash == good.blockchain.last_block.hash
+
+def test_fetch_chain_keeps_etag_until_body_is_read(make_node):
+    ours = make_node("ours")
+    chain = [b.to_dict() for b in ours.blockchain.chain]
+    lines = [json.dumps(chain[0]).encode()]
+
+    def serve(url, **kwargs):
+        # The first download is cut short after one block
+        cut_short = len(ours.http.requests) == 1
+        reset = [requests.exceptions.ChunkedEncodingError("connection reset")] if cut_short else []
+        return FakeResponse(headers={'ETag': '"1-tip"'}, lines=lines + reset)
+
+    ours.http = FakeSession(serve)
+    assert ours._fetch_chain("http://peer", ndjson=True) is None
+    # The interrupted download is retried in full, not answered with a 304
+    assert ours._fetch_chain("http://peer", ndjson=True) == chain
+    assert [(kwargs.get("headers") or {}).get("If-None-Match") for _, kwargs in ours.http.requests] == [None, None]
+    assert ours._chain_etags["http://peer/chain/stream"] == '"1-tip"'
+
+def test_store_images_batch(tmp_path):
+    from twopidgeons.utils import calculate_hash_file
+    batch_node = Node(config=Config(storage_dir=str(tmp_path / "b"), storage_backend="memory", difficulty=1))
+
+    class FakeIPFS:
+        def __init__(self):
+            self.objects = []
+        def add(self, data):
+            self.objects.append(data)
+            return f"cid{len(self.objects)}"
+    batch_node.ipfs = FakeIPFS()
+
+    paths = []
+    for i, color in enumerate(["red", "green"]):
+        path = tmp_path / f"src{i}.jpg"
+        Image.new('RGB', (16, 16), color=color).save(path)
+        paths.append(str(path))
+
+    items = [(paths[0], "abcde.2pg"), (paths[1], "fghij.2pg"), (paths[0], "klmno.2pg"),
+             (str(tmp_path / "missing.jpg"), "pqrst.2pg")]
+    assert batch_node.store_images_batch(items) == [True, True, False, False]
+    assert [b.transactions[0]['source_hash'] for b in batch_node.blockchain.chain[1:]] == \
+        [calculate_hash_file(p) for p in paths]
+    assert len(batch_node.ipfs.objects) == 2  # The duplicate wasn't re-encoded or uploaded
+    for block in batch_node.blockchain.chain[1:]:
+        tx = block.transactions[0]
+        assert tx['hidden_data'] == f"Origin: {batch_node.node_id} | Time: {tx['timestamp']}"
+
+def test_rebuild_chain_parallel_roots(make_node, monkeypatch):
+    import twopidgeons.node as node_module
+    peer, ours = make_node("p", 3), make_node("o")
+    chain_data = [b.to_dict() for b in peer.blockchain.chain]
+
+    # Force the process pool for a handful of blocks
+    monkeypatch.setattr(node_module, "PARALLEL_REBUILD_MIN", 1)
+    rebuilt = ours._rebuild_chain(chain_data, workers=2)
+    assert [b.hash for b in rebuilt] == [b.hash for b in peer.blockchain.chain]
+    assert [b.hash for b in ours._rebuild_chain(chain_data, workers=1)] == [b.hash for b in rebuilt]
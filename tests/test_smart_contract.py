@@ -0,0 +1,32 @@
+from twopidgeons.smart_contract import SmartContract
+
+def test_compiled_conditions():
+    sc = SmartContract()
+    script = "amount >= 5 and recipient == 'bob'"
+    assert sc._python_code(script) is not None
+    assert sc.validate(script, {"amount": 6, "recipient": "bob"}) is True
+    assert sc.validate(script, {"amount": 6, "recipient": "eve"}) is False
+    assert sc.validate(script, {"amount": 6}) is False  # Missing variable
+
+    # Every operand is evaluated, so an error in the second one still fails
+    assert sc.validate("recipient == 'bob' or 1 / 0 > 0", {"recipient": "bob"}) is False
+
+def test_unsupported_syntax_is_not_compiled():
+    import pytest
+    sc = SmartContract()
+    for script in ("__import__('os')", "recipient.upper() == 'BOB'", "[x for x in amount]", "not recipient"):
+        with pytest.raises(ValueError):
+            sc._python_code(script)
+        assert sc.validate(script, {"amount": 1, "recipient": "bob"}) is False
+    assert sc.validate("amount >", {"amount": 1}) is False
+
+def test_scripts_are_compiled_once():
+    from twopidgeons.smart_contract import _compile_script
+    sc = SmartContract()
+    script = "amount > 5 and amount < 100"
+    assert sc._python_code(script) is sc._python_code(script)
+    program = _compile_script(script)
+    if program is not None:  # C VM built
+        assert _compile_script(script) is program
+        assert program[1] == ("amount",)
+    assert sc.validate(script, {"amount": 50}) is True
@@ -0,0 +1,186 @@
+import os
+import pytest
+from twopidgeons.blockchain import Blockchain
+import sqlite3
+from twopidgeons.storage import LogBackend, InMemoryBackend, SQLiteBackend, RawTransactions
+
+@pytest.fixture
+def low_difficulty():
+    original_difficulty = Blockchain.difficulty
+    Blockchain.difficulty = 1
+    yield
+    Blockchain.difficulty = original_difficulty
+
+@pytest.mark.parametrize("fsync", [False, True])
+def test_log_backend_round_trip(tmp_path, low_difficulty, fsync):
+    log_path = str(tmp_path / "chain.log")
+    bc = Blockchain(storage=LogBackend(log_path, fsync=fsync))
+    bc.add_new_transaction({"image_hash": "abc", "owner": "A"})
+    bc.mine()
+    bc.add_new_transaction({"image_hash": "def", "owner": "B", "amount": 1.5})
+    bc.mine()
+
+    reloaded = Blockchain(storage=LogBackend(log_path))
+    assert [b.to_dict() for b in reloaded.chain] == [b.to_dict() for b in bc.chain]
+    assert reloaded.is_chain_valid()
+    assert reloaded.find_transaction("def") == {"image_hash": "def", "owner": "B", "amount": 1.5}
+    assert reloaded.find_transaction("missing") is None
+
+def test_log_backend_drops_truncated_record(tmp_path, low_difficulty):
+    log_path = str(tmp_path / "chain.log")
+    bc = Blockchain(storage=LogBackend(log_path))
+    bc.add_new_transaction({"data": "tx"})
+    bc.mine()
+    complete_size = os.path.getsize(log_path)
+
+    # Simulate a crash in the middle of appending the next record
+    with open(log_path, "ab") as f:
+        f.write(b"\x00\x00\x01\x00\x00partial")
+
+    reloaded = Blockchain(storage=LogBackend(log_path))
+    assert len(reloaded.chain) == 2
+    assert os.path.getsize(log_path) == complete_size
+
+def test_sqlite_backend_round_trip(tmp_path, low_difficulty):
+    db_path = str(tmp_path / "chain.db")
+    bc = Blockchain(storage=db_path)
+    tx = {"image_hash": "abc", "note": "café", "amount": 0.1, "big": 2 ** 70}
+    bc.add_new_transaction(tx)
+    bc.mine()
+
+    reloaded = Blockchain(storage=db_path)
+    # Rows stay unparsed until the transactions are read
+    assert type(reloaded.last_block._transactions) is RawTransactions
+    assert reloaded.is_chain_valid()
+    assert type(reloaded.last_block._transactions) is RawTransactions
+    assert reloaded.last_block.transactions == [tx]
+    assert reloaded.find_transaction("abc") == tx
+    assert reloaded.is_chain_valid()
+
+def test_log_backend_checksum_gates_trusted_hashes(tmp_path, low_difficulty):
+    log_path = str(tmp_path / "chain.log")
+    bc = Blockchain(storage=LogBackend(log_path))
+    bc.add_new_transaction({"data": "tx"})
+    bc.mine()
+
+    backend = LogBackend(log_path)
+    Blockchain(storage=backend)
+    assert backend.chain_verified()
+
+    # A stale or missing header means the hashes get recomputed
+    os.remove(log_path + ".head")
+    backend = LogBackend(log_path)
+    reloaded = Blockchain(storage=backend)
+    assert not backend.chain_verified()
+    assert reloaded.is_chain_valid()
+
+    # Saving again re-establishes the checksum
+    reloaded.add_new_transaction({"data": "tx2"})
+    reloaded.mine()
+    backend = LogBackend(log_path)
+    Blockchain(storage=backend)
+    assert backend.chain_verified()
+
+@pytest.mark.parametrize("make_storage", [
+    lambda tmp_path: str(tmp_path / "chain.db"),
+    lambda tmp_path: LogBackend(str(tmp_path / "chain.log")),
+])
+def test_replace_chain_persists_whole_chain(tmp_path, low_difficulty, make_storage):
+    longer = Blockchain(storage=InMemoryBackend())
+    for i in range(3):
+        longer.add_new_transaction({"image_hash": "img%d" % i})
+        longer.add_new_transaction({"data": i})
+        longer.mine()
+
+    storage = make_storage(tmp_path)
+    bc = Blockchain(storage=storage)
+    bc.chain = [longer.chain[0]]  # Same genesis, shorter chain
+    assert bc.replace_chain(longer.chain)
+
+    if isinstance(storage, LogBackend):
+        storage = LogBackend(storage.log_path)
+    reloaded = Blockchain(storage=storage)
+    assert [b.to_dict() for b in reloaded.chain] == [b.to_dict() for b in longer.chain]
+    assert reloaded.find_transaction("img2") == {"image_hash": "img2"}
+
+@pytest.mark.parametrize("make_storage", [
+    lambda tmp_path: SQLiteBackend(str(tmp_path / "chain.db")),
+    lambda tmp_path: LogBackend(str(tmp_path / "chain.log")),
+])
+def test_failed_replace_keeps_old_chain(tmp_path, low_difficulty, make_storage):
+    longer = Blockchain(storage=InMemoryBackend())
+    for i in range(2):
+        longer.add_new_transaction({"image_hash": "img%d" % i})
+        longer.mine()
+    # Valid chain whose last block can't be serialized
+    longer.chain[-1].transactions[0]["unserializable"] = object()
+
+    storage = make_storage(tmp_path)
+    bc = Blockchain(storage=storage)
+    old_chain = bc.chain
+    with pytest.raises(TypeError):
+        bc.replace_chain(longer.chain)
+    assert bc.chain is old_chain
+
+    if isinstance(storage, LogBackend):
+        storage = LogBackend(storage.log_path)
+    reloaded = Blockchain(storage=storage)
+    assert [b.to_dict() for b in reloaded.chain] == [b.to_dict() for b in old_chain]
+
+@pytest.mark.parametrize("make_storage", [
+    lambda tmp_path: str(tmp_path / "chain.db"),
+    lambda tmp_path: LogBackend(str(tmp_path / "chain.log")),
+    lambda tmp_path: InMemoryBackend(),
+])
+def test_find_transaction_by_image_or_source_hash(tmp_path, low_difficulty, make_storage):
+    bc = Blockchain(storage=make_storage(tmp_path))
+    tx = {"image_hash": "enc", "source_hash": "src"}
+    bc.add_new_transaction(tx)
+    bc.mine()
+
+    assert bc.find_transaction("enc") == tx
+    assert bc.find_transaction("src") == tx
+    assert bc.find_transaction("other") is None
+
+def test_sqlite_groups_commits(tmp_path):
+    db_path = str(tmp_path / "chain.db")
+    backend = SQLiteBackend(db_path, commit_every=3)
+
+    def block(i):
+        return {'index': i, 'timestamp': 1.0, 'previous_hash': 'p', 'hash': 'h%d' % i,
+                'nonce': 0, 'merkle_root': 'm'}, [{'image_hash': 'img%d' % i}]
+
+    def committed_blocks():
+        with sqlite3.connect(db_path) as other:
+            return other.execute("SELECT COUNT(*) FROM blocks").fetchone()[0]
+
+    backend.save_block(*block(0))
+    backend.save_block(*block(1))
+    assert committed_blocks() == 0
+    assert len(backend.load_chain()) == 2  # Visible on the writing connection
+
+    # A failed insert only undoes itself, not the blocks already pending
+    with pytest.raises(sqlite3.IntegrityError):
+        backend.save_block(*block(1))
+    backend.save_block(*block(2))
+    assert committed_blocks() == 3
+
+    backend.save_block(*block(3))
+    backend.flush()
+    assert committed_blocks() == 4
+    assert SQLiteBackend(db_path).find_transaction_by_hash('img3') == {'image_hash': 'img3'}
+
+def test_untrusted_stored_hash_is_checked_on_validation(tmp_path, low_difficulty):
+    db_path = str(tmp_path / "chain.db")
+    bc = Blockchain(storage=db_path)
+    bc.add_new_transaction({"data": "tx"})
+    bc.mine()
+    del bc
+
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("UPDATE blocks SET timestamp = timestamp + 1 WHERE idx = 1")
+
+    reloaded = Blockchain(storage=db_path)
+    # The stored hash is kept as-is, and the edited header no longer matches it
+    assert reloaded.last_block._hash_cache is None
+    assert not reloaded.is_chain_valid()
@@ -1,5 +1,5 @@
 import pytest
-from twopidgeons.utils import is_valid_filename, calculate_hash
+from twopidgeons.utils import is_valid_filename, calculate_hash, calculate_hash_file
 
 def test_is_valid_filename():
     assert is_valid_filename("abcde.2pg") is True
@@ -13,8 +13,76 @@ def test_is_valid_filename():
     assert is_valid_filename("12345.2pg") is False # Numbers
     assert is_valid_filename(".2pg") is False # No name
 
+def test_is_valid_filename_python_fallback(monkeypatch):
+    import twopidgeons.utils as utils
+    monkeypatch.setattr(utils, "is_valid_filename_c", None)
+    assert is_valid_filename("abcde.2pg") is True
+    for name in ("abcdef.2pg", "ABCDE.2pg", "abcde.jpg", "abcde.2pg\n", "àbcde.2pg"):
+        assert is_valid_filename(name) is False
+
 def test_calculate_hash():
     data = b"test data"
     # SHA256 of "test data"
     expected_hash = "916f0027a575074ce72a331777c3478d6513f786a591bd892da1a577bf2335f9"
     assert calculate_hash(data) == expected_hash
+
+def test_calculate_hash_file(tmp_path):
+    data = bytes(range(256)) * 1000  # Spans several read chunks
+    path = tmp_path / "blob.bin"
+    path.write_bytes(data)
+    assert calculate_hash_file(str(path)) == calculate_hash(data)
+
+@pytest.mark.parametrize("use_c", [True, False])
+def test_is_jpeg_file_fast(tmp_path, monkeypatch, use_c):
+    from PIL import Image
+    import twopidgeons.utils as utils
+    if not use_c:
+        monkeypatch.setattr(utils, "is_jpeg_file_c", None)
+    elif utils.is_jpeg_file_c is None:
+        pytest.skip("C extension not built")
+
+    Image.new('RGB', (4, 4)).save(tmp_path / "a.jpg")
+    Image.new('RGB', (4, 4)).save(tmp_path / "a.png")
+    (tmp_path / "short").write_bytes(b"\xff\xd8")
+    assert utils.is_jpeg_file_fast(str(tmp_path / "a.jpg")) is True
+    for name in ("a.png", "short", "missing"):
+        assert utils.is_jpeg_file_fast(str(tmp_path / name)) is False
+
+def test_steganography_extract_from_bytes(tmp_path):
+    from PIL import Image
+    from twopidgeons.steganography import Steganography
+
+    img_path = tmp_path / "hidden.jpg"
+    Image.new('RGB', (8, 8), color='blue').save(img_path)
+    assert Steganography.embed(str(img_path), "node:abc") is True
+
+    data = img_path.read_bytes()
+    assert Steganography.extract(data) == "node:abc"
+    assert Steganography.extract(str(img_path)) == "node:abc"
+
+def test_steganography_embed_keeps_jpeg_scan(tmp_path):
+    from PIL import Image
+    from twopidgeons.steganography import Steganography
+
+    img_path = tmp_path / "photo.jpg"
+    exif = Image.Exif()
+    exif[0x010f] = "Maker"
+    Image.new('RGB', (16, 16), color='red').save(img_path, exif=exif)
+    before = img_path.read_bytes()
+
+    assert Steganography.embed(str(img_path), "node:abc") is True
+    assert Steganography.embed(str(img_path), "node:def") is True
+    after = img_path.read_bytes()
+    # Only the EXIF segment changed: the compressed image data is identical
+    assert after[after.index(b"\xff\xda"):] == before[before.index(b"\xff\xda"):]
+    assert after.count(b"Exif\x00\x00") == 1
+    assert Steganography.extract(str(img_path)) == "node:def"
+    assert Image.open(img_path).getexif()[0x010f] == "Maker"
+
+@pytest.mark.parametrize("fmt", ["JPEG", "WEBP"])
+def test_steganography_embed_to_bytes(fmt):
+    from PIL import Image
+    from twopidgeons.steganography import Steganography
+
+    data = Steganography.embed_to_bytes(Image.new('RGB', (8, 8), color='green'), "node:xyz", format=fmt)
+    assert Steganography.extract(data) == "node:xyz"
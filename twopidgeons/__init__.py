@@ -1,3 +1,16 @@
-from .node import Node
-from .blockchain import Blockchain
 from .utils import is_valid_filename
+
+# Node and Blockchain pull in cryptography, PIL and pydantic; resolve them on
+# first access so that importing the package (e.g. for the CLI) stays cheap.
+_LAZY = {
+    "Node": ".node",
+    "Blockchain": ".blockchain",
+}
+
+def __getattr__(name):
+    if name in _LAZY:
+        import importlib
+        value = getattr(importlib.import_module(_LAZY[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,14 +1,62 @@
 import time
 import json
+import math
 import hashlib
 import os
-from typing import List, Dict, Any, Union
-from .crypto_utils import verify_signature, deserialize_public_key
-from .merkle_tree import MerkleTree
-from .storage import StorageBackend, SQLiteBackend
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from json.encoder import encode_basestring_ascii
+from typing import List, Dict, Any, Optional, Union, Tuple
+from .crypto_utils import (
+    verify_signature, verify_key_binding_cached,
+    deserialize_public_key_cached as _public_key
+)
+from .merkle_tree import MerkleTree, MerkleAccumulator, _canonical_json
+from .storage import StorageBackend, SQLiteBackend, RawTransactions, _dumps
+
+# Try to import the C PoW module (SHA-NI accelerated SHA-256 and nonce search)
+try:
+    from . import pow_module
+    sha256_hex = pow_module.sha256_hex
+except ImportError:
+    pow_module = None
+    sha256_hex = None
+
+# Worker threads for the C nonce search (the result doesn't depend on it)
+POW_THREADS = min(os.cpu_count() or 1, 256)
+
+# Threads for batch signature checks (the RSA work happens in OpenSSL)
+VERIFY_THREADS = os.cpu_count() or 1
+
+# Canonical block header: the output of json.dumps(header, sort_keys=True),
+# split around the nonce so the PoW search can keep both parts fixed
+HEADER_PREFIX = '{"index": %s, "merkle_root": %s, "nonce": '
+HEADER_SUFFIX = ', "previous_hash": %s, "timestamp": %s}'
+
+# Fields that feed the header; reassigning one invalidates the cached hash
+HEADER_FIELDS = frozenset(('index', 'merkle_root', 'nonce', 'previous_hash', 'timestamp'))
+
+# Fields of to_dict(); reassigning one invalidates the cached encoding
+PUBLIC_FIELDS = HEADER_FIELDS | {'transactions', 'hash'}
+
+def _json_scalar(value) -> str:
+    """Encodes a header field exactly as json.dumps does."""
+    value_type = type(value)
+    if value_type is str:
+        return encode_basestring_ascii(value)
+    if value_type is int:
+        return int.__repr__(value)
+    if value_type is float and math.isfinite(value):
+        return float.__repr__(value)
+    return json.dumps(value)
 
 class Block:
-    def __init__(self, index: int, transactions: List[Dict], timestamp: float, previous_hash: str, nonce: int = 0, merkle_root: str = None):
+    # No per-instance __dict__: smaller blocks and faster attribute access
+    __slots__ = ('index', '_transactions', 'timestamp', 'previous_hash', 'nonce',
+                 'merkle_root', 'hash', '_hash_cache', '_encoded')
+
+    def __init__(self, index: int, transactions: List[Dict], timestamp: float, previous_hash: str, nonce: int = 0, merkle_root: str = None, block_hash: str = None):
+        self._hash_cache = None
         self.index = index
         self.transactions = transactions
         self.timestamp = timestamp
@@ -19,27 +67,116 @@ class Block:
             self.merkle_root = merkle_root
         else:
             self.merkle_root = MerkleTree.compute_root(self.transactions)
-            
-        self.hash = self.compute_hash()
 
-    def compute_hash(self) -> str:
-        """Calculates the block hash based on header (including Merkle Root)."""
-        block_header = {
+        if block_hash is not None:
+            # Trusted hash (e.g. from checksummed storage): adopt it without rehashing
+            self.hash = self._hash_cache = block_hash
+        else:
+            self.hash = self.compute_hash()
+
+    @classmethod
+    def from_stored(cls, index: int, transactions: List[Dict], timestamp: float, previous_hash: str,
+                    nonce: int, merkle_root: str, stored_hash: str, trusted: bool = False) -> 'Block':
+        """
+        Rebuilds a saved block, taking the stored hash as its hash without
+        recomputing it. Unless `trusted`, the header is only hashed when
+        validation first asks for it, so a tampered record is still caught.
+        """
+        block = cls.__new__(cls)
+        block.index = index
+        block.transactions = transactions
+        block.timestamp = timestamp
+        block.previous_hash = previous_hash
+        block.nonce = nonce
+        # Databases from before the merkle_root column have no stored root
+        block.merkle_root = merkle_root or MerkleTree.compute_root(block.transactions)
+        block.hash = stored_hash
+        block._hash_cache = stored_hash if trusted else None
+        return block
+
+    def __setattr__(self, name, value):
+        if name in PUBLIC_FIELDS:
+            if name in HEADER_FIELDS:
+                object.__setattr__(self, '_hash_cache', None)
+            object.__setattr__(self, '_encoded', None)
+        object.__setattr__(self, name, value)
+
+    @property
+    def transactions(self) -> List[Dict]:
+        # Blocks loaded from storage may hold unparsed rows until first read
+        transactions = self._transactions
+        if type(transactions) is RawTransactions:
+            transactions = self._transactions = transactions.load()
+        return transactions
+
+    @transactions.setter
+    def transactions(self, value):
+        self._transactions = value
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Public block fields, as sent to peers."""
+        return {
             'index': self.index,
+            'transactions': self.transactions,
             'timestamp': self.timestamp,
             'previous_hash': self.previous_hash,
             'nonce': self.nonce,
-            'merkle_root': self.merkle_root
+            'merkle_root': self.merkle_root,
+            'hash': self.hash
         }
-        block_string = json.dumps(block_header, sort_keys=True)
-        return hashlib.sha256(block_string.encode()).hexdigest()
+
+    def to_json_bytes(self) -> bytes:
+        """
+        to_dict() encoded as JSON, cached: a block is encoded once however
+        many peers or /chain/stream responses it is sent to.
+        """
+        if self._encoded is None:
+            self._encoded = _dumps(self.to_dict())
+        return self._encoded
+
+    def header_parts(self) -> Tuple[str, str]:
+        """Returns the serialized header before and after the nonce."""
+        prefix = HEADER_PREFIX % (_json_scalar(self.index), _json_scalar(self.merkle_root))
+        suffix = HEADER_SUFFIX % (_json_scalar(self.previous_hash), _json_scalar(self.timestamp))
+        return prefix, suffix
+
+    def header_string(self) -> str:
+        """Serializes the block header (fixed key order, no dict or sorting)."""
+        prefix, suffix = self.header_parts()
+        return prefix + _json_scalar(self.nonce) + suffix
+
+    def compute_hash(self) -> str:
+        """
+        Calculates the block hash based on header (including Merkle Root).
+        The result is cached until a header field is reassigned.
+        """
+        if self._hash_cache is None:
+            block_string = self.header_string()
+            if sha256_hex:
+                self._hash_cache = sha256_hex(block_string.encode())
+            else:
+                self._hash_cache = hashlib.sha256(block_string.encode()).hexdigest()
+        return self._hash_cache
+
+    def verify_hash(self) -> bool:
+        """
+        True if the stored hash matches the header. Hashes at most once per
+        header state; blocks loaded from trusted storage compare directly.
+        """
+        return self.hash == self.compute_hash()
 
 class Blockchain:
     difficulty = 4
 
     def __init__(self, storage: Union[StorageBackend, str] = "blockchain.db"):
         self.unconfirmed_transactions: List[Dict] = []
+        # Merkle Root of the pending transactions, built as they arrive
+        self._pending_merkle = MerkleAccumulator()
         self.chain: List[Block] = []
+        # filename -> latest transaction, covering chain[:_filename_indexed]
+        self._filename_index: Dict[str, Dict] = {}
+        self._filename_indexed = 0
+        self._filename_chain: Optional[List[Block]] = None
         
         # Initialize storage backend
         if isinstance(storage, str):
@@ -68,81 +205,107 @@ class Blockchain:
     def last_block(self) -> Block:
         return self.chain[-1]
 
-    def add_new_transaction(self, transaction: Dict) -> bool:
-        """Adds a transaction to the list of unconfirmed transactions."""
-        # Verify signature if present
-        if 'signature' in transaction and 'public_key' in transaction:
+    @staticmethod
+    def verify_transaction(transaction: Dict) -> bool:
+        """
+        Checks the transaction signature, if present (unsigned ones pass).
+        Transactions carrying a 'signing_key' (Ed25519) are verified with it,
+        and only if their 'signing_key_proof' shows the RSA 'public_key' (the
+        owner identity) authorized that key; older ones with 'public_key'.
+        """
+        signing_key_pem = transaction.get('signing_key')
+        public_key_pem = signing_key_pem or transaction.get('public_key')
+        if 'signature' in transaction and public_key_pem:
             signature = transaction['signature']
-            public_key_pem = transaction['public_key']
+
+            if signing_key_pem:
+                owner_key_pem = transaction.get('public_key')
+                proof = transaction.get('signing_key_proof')
+                if not (isinstance(owner_key_pem, str) and isinstance(proof, str)
+                        and verify_key_binding_cached(owner_key_pem, signing_key_pem, proof)):
+                    print("Signing key not authorized by the transaction's public key!")
+                    return False
             
             # Reconstruct signed data
             tx_copy = transaction.copy()
             del tx_copy['signature']
             
-            tx_bytes = json.dumps(tx_copy, sort_keys=True).encode()
+            tx_bytes = _canonical_json(tx_copy).encode()
             
             try:
-                public_key = deserialize_public_key(public_key_pem)
+                public_key = _public_key(public_key_pem)
                 if not verify_signature(public_key, tx_bytes, signature):
                     print("Invalid transaction signature!")
                     return False
             except Exception as e:
                 print(f"Error verifying signature: {e}")
                 return False
+        return True
+
+    def add_new_transaction(self, transaction: Dict) -> bool:
+        """Adds a transaction to the list of unconfirmed transactions."""
+        if not self.verify_transaction(transaction):
+            return False
 
         self.unconfirmed_transactions.append(transaction)
+        self._pending_merkle.add(transaction)
         return True
 
+    def add_new_transactions_batch(self, transactions: List[Dict]) -> List[bool]:
+        """
+        Adds several transactions, verifying their signatures on a thread pool.
+        Valid ones are appended in their original order; returns one flag per
+        transaction.
+        """
+        workers = min(VERIFY_THREADS, len(transactions))
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(self.verify_transaction, transactions))
+        else:
+            results = [self.verify_transaction(tx) for tx in transactions]
+
+        for transaction, valid in zip(transactions, results):
+            if valid:
+                self.unconfirmed_transactions.append(transaction)
+                self._pending_merkle.add(transaction)
+        return results
+
     def proof_of_work(self, block: Block) -> str:
         """
         Proof of Work algorithm.
         Increments the nonce until the hash starts with 'difficulty' zeros.
         """
         # Try to use C extension for performance
-        try:
-            from . import pow_module
-            
-            # Construct the block header dict with a placeholder nonce
-            block_header = {
-                'index': block.index,
-                'timestamp': block.timestamp,
-                'previous_hash': block.previous_hash,
-                'nonce': 0, 
-                'merkle_root': block.merkle_root
-            }
-            
-            # Serialize to JSON to get the exact format
-            full_str = json.dumps(block_header, sort_keys=True)
-            
-            # We look for the pattern '"nonce": 0'
-            split_pattern = '"nonce": 0'
-            
-            if split_pattern in full_str:
-                parts = full_str.split(split_pattern)
-                if len(parts) == 2:
-                    # Reconstruct parts for C module
-                    # Part 1 ends with '"nonce": '
-                    part1 = parts[0] + '"nonce": '
-                    part2 = parts[1]
-                    
-                    # Call C module
-                    nonce, hash_val = pow_module.find_proof(part1, part2, Blockchain.difficulty)
-                    
-                    if nonce is not None:
-                        block.nonce = nonce
-                        block.hash = hash_val
-                        return hash_val
-        except ImportError:
-            pass
-        except Exception as e:
-            print(f"Warning: C extension failed ({e}), falling back to Python.")
-
-        block.nonce = 0
-        computed_hash = block.compute_hash()
-        while not computed_hash.startswith('0' * Blockchain.difficulty):
-            block.nonce += 1
-            computed_hash = block.compute_hash()
-        block.hash = computed_hash
+        if pow_module:
+            try:
+                prefix, suffix = block.header_parts()
+                result = pow_module.pow_search(prefix.encode(), suffix.encode(), Blockchain.difficulty,
+                                               threads=POW_THREADS)
+                if result is not None:
+                    block.nonce, block.hash = result
+                    block._hash_cache = block.hash
+                    return block.hash
+            except Exception as e:
+                print(f"Warning: C extension failed ({e}), falling back to Python.")
+
+        # The header is fixed apart from the nonce: serialize it once and only
+        # format the integer per attempt
+        prefix, suffix = block.header_parts()
+        prefix, suffix = prefix.encode(), suffix.encode()
+        # Compare raw digest bytes: difficulty hex zeros are difficulty // 2
+        # zero bytes plus, for odd difficulty, a high nibble of zero
+        zero_bytes, half = divmod(Blockchain.difficulty, 2)
+        zeros = bytes(zero_bytes)
+        sha256 = hashlib.sha256
+        nonce = 0
+        while True:
+            digest = sha256(prefix + b"%d" % nonce + suffix).digest()
+            if digest[:zero_bytes] == zeros and (not half or digest[zero_bytes] < 0x10):
+                break
+            nonce += 1
+        computed_hash = digest.hex()
+        block.nonce = nonce
+        block.hash = block._hash_cache = computed_hash
         return computed_hash
 
     def mine(self) -> int:
@@ -153,22 +316,30 @@ class Blockchain:
         if not self.unconfirmed_transactions:
             return -1
 
+        # Only trust the accumulator if every pending tx went through it
+        merkle_root = None
+        if self._pending_merkle.count == len(self.unconfirmed_transactions):
+            merkle_root = self._pending_merkle.root()
+
         last_block = self.last_block
         new_block = Block(index=last_block.index + 1,
                           transactions=self.unconfirmed_transactions,
                           timestamp=time.time(),
-                          previous_hash=last_block.hash)
+                          previous_hash=last_block.hash,
+                          merkle_root=merkle_root)
 
         self.proof_of_work(new_block)
         
         self.chain.append(new_block)
         self.unconfirmed_transactions = []
+        self._pending_merkle = MerkleAccumulator()
         self.save_block(new_block)
         return new_block.index
 
-    def save_block(self, block: Block):
-        """Saves a single block to the storage backend."""
-        block_data = {
+    @staticmethod
+    def _block_data(block: Block) -> Dict[str, Any]:
+        """Header fields of a block, as handed to the storage backend."""
+        return {
             'index': block.index,
             'timestamp': block.timestamp,
             'previous_hash': block.previous_hash,
@@ -176,46 +347,73 @@ class Blockchain:
             'nonce': block.nonce,
             'merkle_root': block.merkle_root
         }
-        self.storage.save_block(block_data, block.transactions)
+
+    def save_block(self, block: Block):
+        """Saves a single block to the storage backend."""
+        self.storage.save_block(self._block_data(block), block.transactions)
 
     def load_chain(self):
         """Loads the chain from the storage backend."""
         chain_data = self.storage.load_chain()
-        self.chain = []
-        for b_data in chain_data:
-            block = Block(
-                index=b_data['index'],
-                transactions=b_data['transactions'],
-                timestamp=b_data['timestamp'],
-                previous_hash=b_data['previous_hash'],
-                nonce=b_data['nonce'],
-                merkle_root=b_data['merkle_root']
-            )
-            # Ensure hash matches loaded hash
-            block.hash = b_data['hash']
-            self.chain.append(block)
-            # Genesis block will be created in __init__ if chain is empty
+        # Storage that matched its own checksum vouches for the stored hashes
+        trusted = self.storage.chain_verified()
+        self.chain = [
+            Block.from_stored(b_data['index'], b_data['transactions'], b_data['timestamp'],
+                              b_data['previous_hash'], b_data['nonce'], b_data['merkle_root'],
+                              b_data['hash'], trusted=trusted)
+            for b_data in chain_data
+        ]
+        # Genesis block will be created in __init__ if chain is empty
 
     @staticmethod
-    def is_valid_chain(chain: List[Block]) -> bool:
+    def is_valid_chain(chain: List[Block], trusted_prefix: int = 0) -> bool:
         """
-        Verifies if a given chain is valid.
+        Verifies if a given chain is valid. The first `trusted_prefix` blocks
+        are taken as already verified (e.g. the part shared with our chain).
         """
         if not chain:
             return False
             
         # Verify genesis block (simplified, checking only index and prev_hash)
         first_block = chain[0]
-        if first_block.index != 0 or first_block.previous_hash != "0":
+        if trusted_prefix <= 0 and (first_block.index != 0 or first_block.previous_hash != "0"):
             return False
 
-        for i in range(1, len(chain)):
-            current = chain[i]
-            previous = chain[i - 1]
-            
-            if not Blockchain.is_valid_block(current, previous):
+        # Hashes are cached per block, so this is a single pass of comparisons
+        target = '0' * Blockchain.difficulty
+        start = max(trusted_prefix, 1)
+        for previous, current in zip(islice(chain, start - 1, None), islice(chain, start, None)):
+            if (current.previous_hash != previous.hash
+                    or current.index != previous.index + 1
+                    or not current.verify_hash()
+                    or not current.hash.startswith(target)):
+                return False
+
+        return True
+
+    @staticmethod
+    def is_plausible_chain_data(chain_data: List[Dict[str, Any]]) -> bool:
+        """
+        Cheap check of a peer's serialized chain before any Block is built:
+        consecutive indices from a genesis block, each block linking to the
+        hash claimed for the one before it, and claimed hashes meeting the
+        difficulty. Passing proves nothing (is_valid_chain still recomputes
+        the hashes); failing rejects the chain without hashing anything.
+        """
+        if not chain_data:
+            return False
+        first = chain_data[0]
+        if first['index'] != 0 or first['previous_hash'] != "0":
+            return False
+
+        target = '0' * Blockchain.difficulty
+        for previous, current in zip(chain_data, islice(chain_data, 1, None)):
+            claimed = current.get('hash')
+            if (current['index'] != previous['index'] + 1
+                    or current['previous_hash'] != previous.get('hash')
+                    or not isinstance(claimed, str)
+                    or not claimed.startswith(target)):
                 return False
-                
         return True
 
     @staticmethod
@@ -225,40 +423,91 @@ class Blockchain:
             return False
         if block.index != previous_block.index + 1:
             return False
-        if block.hash != block.compute_hash():
+        if not block.verify_hash():
             return False
         # Check Proof of Work
         if not block.hash.startswith('0' * Blockchain.difficulty):
             return False
         return True
 
+    def shared_prefix(self, chain: List[Block]) -> int:
+        """Number of leading blocks of `chain` identical to ours (header and hash)."""
+        shared = 0
+        for ours, theirs in zip(self.chain, chain):
+            if ours is not theirs and (
+                    ours.hash != theirs.hash
+                    or ours.index != theirs.index
+                    or ours.previous_hash != theirs.previous_hash
+                    or ours.merkle_root != theirs.merkle_root
+                    or ours.nonce != theirs.nonce
+                    or ours.timestamp != theirs.timestamp):
+                break
+            shared += 1
+        return shared
+
     def replace_chain(self, new_chain: List[Block]) -> bool:
         """
         Replaces the current chain with a new one if it is valid and longer.
+        Only the blocks after the fork point with our chain are verified.
         """
-        if len(new_chain) > len(self.chain) and self.is_valid_chain(new_chain):
+        if len(new_chain) > len(self.chain) and self.is_valid_chain(new_chain, self.shared_prefix(new_chain)):
+            # Storage is swapped first: if the write fails, both it and
+            # self.chain still hold the old chain
+            self.storage.replace_blocks([(self._block_data(block), block.transactions)
+                                         for block in new_chain])
             self.chain = new_chain
-            
-            # Wipe storage and save new chain
-            self.storage.clear_chain()
-            
-            for block in new_chain:
-                self.save_block(block)
             return True
         return False
 
+    def append_blocks(self, blocks: List[Block]) -> int:
+        """
+        Appends consecutive blocks that extend our chain, stopping at the
+        first invalid one. The accepted blocks are saved in a single storage
+        write. Returns how many were appended.
+        """
+        accepted = []
+        previous = self.last_block
+        for block in blocks:
+            if not self.is_valid_block(block, previous):
+                break
+            accepted.append(block)
+            previous = block
+
+        if accepted:
+            self.chain.extend(accepted)
+            self.storage.save_blocks([(self._block_data(block), block.transactions)
+                                      for block in accepted])
+        return len(accepted)
+
     def is_chain_valid(self) -> bool:
         """Verifies the integrity of the blockchain."""
-        for i in range(1, len(self.chain)):
-            current = self.chain[i]
-            previous = self.chain[i - 1]
-
-            if current.hash != current.compute_hash():
-                return False
-            if current.previous_hash != previous.hash:
+        chain = self.chain
+        for previous, current in zip(chain, islice(chain, 1, None)):
+            if not current.verify_hash() or current.previous_hash != previous.hash:
                 return False
         return True
 
     def find_transaction(self, image_hash: str) -> Dict:
         """Searches for a transaction based on the image hash or source hash."""
         return self.storage.find_transaction_by_hash(image_hash)
+
+    def find_transaction_by_filename(self, filename: str) -> Optional[Dict]:
+        """
+        Latest transaction for a filename (creation or transfer). Each lookup
+        only indexes the blocks appended since the previous one; a replaced
+        chain is re-indexed from scratch.
+        """
+        chain = self.chain
+        if self._filename_chain is not chain:
+            self._filename_index = {}
+            self._filename_indexed = 0
+            self._filename_chain = chain
+
+        index = self._filename_index
+        for block in islice(chain, self._filename_indexed, None):
+            for tx in block.transactions:
+                name = tx.get('filename')
+                if name is not None:
+                    index[name] = tx
+        self._filename_indexed = len(chain)
+        return index.get(filename)
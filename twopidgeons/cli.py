@@ -1,78 +1,129 @@
 import argparse
+import functools
 import os
-from .node import Node
+import sys
 
-def main():
-    parser = argparse.ArgumentParser(description="TwoPidgeons: Blockchain Image Manager")
-    subparsers = parser.add_subparsers(dest="command", help="Available commands")
-
-    # Command: store
-    parser_store = subparsers.add_parser("store", help="Stores an image in the node")
-    parser_store.add_argument("source", help="Source image path")
-    parser_store.add_argument("name", help="Destination name (e.g. abcde.2pg)")
-    parser_store.add_argument("--node-dir", default="./node_storage", help="Node directory")
-    parser_store.add_argument("--node-id", default="cli_node", help="Node ID")
-    parser_store.add_argument("--condition", help="Smart Contract condition (e.g. \"amount > 5\")")
-
-    # Command: transfer
-    parser_transfer = subparsers.add_parser("transfer", help="Transfers an image to another node")
-    parser_transfer.add_argument("name", help="Filename to transfer (e.g. abcde.2pg)")
-    parser_transfer.add_argument("recipient", help="Recipient Node ID")
-    parser_transfer.add_argument("--amount", type=float, default=0, help="Payment amount")
-    parser_transfer.add_argument("--node-dir", default="./node_storage", help="Node directory")
-    parser_transfer.add_argument("--node-id", default="cli_node", help="Node ID")
-
-    # Command: validate
-    parser_validate = subparsers.add_parser("validate", help="Validates a local image")
-    parser_validate.add_argument("name", help="Filename to validate (e.g. abcde.2pg)")
-    parser_validate.add_argument("--node-dir", default="./node_storage", help="Node directory")
-
-    # Command: zk-challenge (Verifier)
-    parser_zk_challenge = subparsers.add_parser("zk-challenge", help="Generates a ZK challenge for an image owner")
-    parser_zk_challenge.add_argument("filename", help="Filename to challenge ownership of")
-    parser_zk_challenge.add_argument("--node-dir", default="./node_storage", help="Node directory")
-
-    # Command: zk-prove (Prover)
-    parser_zk_prove = subparsers.add_parser("zk-prove", help="Solves a ZK challenge")
-    parser_zk_prove.add_argument("challenge", help="Encrypted challenge string")
-    parser_zk_prove.add_argument("--node-dir", default="./node_storage", help="Node directory")
-    parser_zk_prove.add_argument("--node-id", default="prover", help="Node ID")
-
-    # Command: inspect
-    parser_inspect = subparsers.add_parser("inspect", help="Inspects hidden steganographic data")
-    parser_inspect.add_argument("name", help="Filename to inspect")
-    parser_inspect.add_argument("--node-dir", default="./node_storage", help="Node directory")
-
-    # Command: serve
-    parser_serve = subparsers.add_parser("serve", help="Starts the P2P server")
-    parser_serve.add_argument("--port", type=int, default=5000, help="Server port")
-    parser_serve.add_argument("--node-dir", default="./node_storage", help="Node directory")
-    parser_serve.add_argument("--node-id", default="server_node", help="Node ID")
-
-    args = parser.parse_args()
-    
+@functools.lru_cache(maxsize=None)
+def _config_for(node_dir=None, node_id=None, port=None):
+    """Builds (once per argument tuple) the Config for a CLI invocation."""
     from .config import Config
-    
-    # Helper to create config from args
-    def get_config(args):
-        c = Config()
-        if hasattr(args, 'node_dir') and args.node_dir:
-            c.storage_dir = args.node_dir
-        if hasattr(args, 'node_id') and args.node_id:
-            c.node_id = args.node_id
-        if hasattr(args, 'port') and args.port:
-            c.port = args.port
-        return c
-
+    c = Config()
+    if node_dir:
+        c.storage_dir = node_dir
+    if node_id:
+        c.node_id = node_id
+    if port:
+        c.port = port
+    return c
+
+def get_config(args, node_id=None):
+    """Returns the memoized Config for the parsed CLI arguments.
+
+    `node_id` overrides the --node-id flag for commands that run under a
+    fixed identity. The result is shared between calls with the same
+    arguments, so callers must not mutate it.
+    """
+    return _config_for(
+        getattr(args, 'node_dir', None),
+        node_id or getattr(args, 'node_id', None),
+        getattr(args, 'port', None),
+    )
+
+# --- Per-command arguments ---
+def _store_args(p):
+    p.add_argument("source", help="Source image path")
+    p.add_argument("name", help="Destination name (e.g. abcde.2pg)")
+    p.add_argument("--node-dir", default="./node_storage", help="Node directory")
+    p.add_argument("--node-id", default="cli_node", help="Node ID")
+    p.add_argument("--condition", help="Smart Contract condition (e.g. \"amount > 5\")")
+
+def _transfer_args(p):
+    p.add_argument("name", help="Filename to transfer (e.g. abcde.2pg)")
+    p.add_argument("recipient", help="Recipient Node ID")
+    p.add_argument("--amount", type=float, default=0, help="Payment amount")
+    p.add_argument("--node-dir", default="./node_storage", help="Node directory")
+    p.add_argument("--node-id", default="cli_node", help="Node ID")
+
+def _validate_args(p):
+    p.add_argument("name", help="Filename to validate (e.g. abcde.2pg)")
+    p.add_argument("--node-dir", default="./node_storage", help="Node directory")
+
+def _zk_challenge_args(p):
+    # Verifier side
+    p.add_argument("filename", help="Filename to challenge ownership of")
+    p.add_argument("--node-dir", default="./node_storage", help="Node directory")
+
+def _zk_prove_args(p):
+    # Prover side
+    p.add_argument("challenge", help="Encrypted challenge string")
+    p.add_argument("--node-dir", default="./node_storage", help="Node directory")
+    p.add_argument("--node-id", default="prover", help="Node ID")
+
+def _inspect_args(p):
+    p.add_argument("name", help="Filename to inspect")
+    p.add_argument("--node-dir", default="./node_storage", help="Node directory")
+
+def _serve_args(p):
+    p.add_argument("--port", type=int, default=5000, help="Server port")
+    p.add_argument("--node-dir", default="./node_storage", help="Node directory")
+    p.add_argument("--node-id", default="server_node", help="Node ID")
+
+# Command name -> (help, argument builder)
+COMMANDS = {
+    "store": ("Stores an image in the node", _store_args),
+    "transfer": ("Transfers an image to another node", _transfer_args),
+    "validate": ("Validates a local image", _validate_args),
+    "zk-challenge": ("Generates a ZK challenge for an image owner", _zk_challenge_args),
+    "zk-prove": ("Solves a ZK challenge", _zk_prove_args),
+    "inspect": ("Inspects hidden steganographic data", _inspect_args),
+    "serve": ("Starts the P2P server", _serve_args),
+}
+
+DESCRIPTION = "TwoPidgeons: Blockchain Image Manager"
+
+def _full_parser():
+    """Parser with every subcommand, used for --help and unknown input."""
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    subparsers = parser.add_subparsers(dest="command", help="Available commands")
+    for name, (help_text, add_args) in COMMANDS.items():
+        add_args(subparsers.add_parser(name, help=help_text))
+    return parser
+
+def parse_args(argv=None):
+    """
+    Parses CLI arguments. A known command name in first position only
+    builds that command's parser; anything else goes through the full tree.
+    """
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv and argv[0] in COMMANDS:
+        name = argv[0]
+        help_text, add_args = COMMANDS[name]
+        parser = argparse.ArgumentParser(prog=f"{os.path.basename(sys.argv[0])} {name}", description=help_text)
+        add_args(parser)
+        args = parser.parse_args(argv[1:])
+        args.command = name
+        return args, parser
+    parser = _full_parser()
+    return parser.parse_args(argv), parser
+
+def main(argv=None):
+    args, parser = parse_args(argv)
+
+    # Heavy modules (cryptography, PIL, pydantic) are imported per command
+    # so that `--help` and argument errors stay fast.
     if args.command == "store":
+        from .node import Node
         node = Node(config=get_config(args))
         node.store_image(args.source, args.name, conditions=args.condition)
     
     elif args.command == "transfer":
+        from .node import Node
         node = Node(config=get_config(args))
         node.transfer_image(args.name, args.recipient, args.amount)
 
     elif args.command == "zk-challenge":
+        from .node import Node
         from .zkp import ZKProof
         node = Node(config=get_config(args))
         
@@ -92,6 +143,7 @@ def main():
         print("------------------------------------------\n")
 
     elif args.command == "zk-prove":
+        from .node import Node
         from .zkp import ZKProof
         node = Node(config=get_config(args))
         
@@ -107,9 +159,10 @@ def main():
 
     elif args.command == "validate":
         # Validator needs a temporary ID if not provided, but needs correct storage dir
-        cfg = get_config(args)
-        cfg.node_id = "validator"
-        node = Node(config=cfg)
+        from .node import Node
+        node = Node(config=get_config(args, node_id="validator"))
+        if not node.validate_chain_parallel():
+            print("Warning: the local blockchain failed validation.")
         
         cid = args.name
         # Try to resolve filename to CID if it doesn't look like a CID
@@ -125,9 +178,8 @@ def main():
 
     elif args.command == "inspect":
         # Inspect now needs to decrypt the file first
-        cfg = get_config(args)
-        cfg.node_id = "inspector"
-        node = Node(config=cfg)
+        from .node import Node
+        node = Node(config=get_config(args, node_id="inspector"))
         
         cid = args.name
         if not (cid.startswith("Qm") or cid.startswith("bafy")):
@@ -147,22 +199,17 @@ def main():
                 from .steganography import Steganography
                 
                 print("Decrypting file...")
-                decrypted_data = decrypt_data_hybrid(encrypted_data, node.private_key)
-                
-                temp_path = os.path.join(cfg.storage_dir, f"temp_inspect_{cid}.jpg")
-                with open(temp_path, "wb") as f:
-                    f.write(decrypted_data)
+                decrypted_data = decrypt_data_hybrid(encrypted_data, node.decryption_key_for(encrypted_data))
                 
-                data = Steganography.extract(temp_path)
+                data = Steganography.extract(decrypted_data)
                 print(f"Hidden Data: {data}")
-                
-                os.remove(temp_path)
             except Exception as e:
                 print(f"Error inspecting file (Decryption failed?): {e}")
         else:
             print("File not found on IPFS.")
 
     elif args.command == "serve":
+        from .node import Node
         from .server import P2PServer
         cfg = get_config(args)
         node = Node(config=cfg)
@@ -1,37 +1,43 @@
-from pydantic import BaseModel, Field
+from dataclasses import dataclass, field
 from typing import Optional
 import os
 
-class Config(BaseModel):
+# Plain dataclass: nothing here comes from untrusted input, and importing
+# pydantic would dominate CLI startup
+@dataclass(slots=True)
+class Config:
     """Global configuration for the TwoPidgeons node."""
     
     # Node Identity
-    node_id: str = Field(default_factory=lambda: os.getenv("TP_NODE_ID", "default_node"))
+    node_id: str = field(default_factory=lambda: os.getenv("TP_NODE_ID", "default_node"))
     
     # Network
-    host: str = Field(default_factory=lambda: os.getenv("TP_HOST", "0.0.0.0"))
-    port: int = Field(default_factory=lambda: int(os.getenv("TP_PORT", "5000")))
-    peers: list[str] = Field(default_factory=list)
+    host: str = field(default_factory=lambda: os.getenv("TP_HOST", "0.0.0.0"))
+    port: int = field(default_factory=lambda: int(os.getenv("TP_PORT", "5000")))
+    peers: list[str] = field(default_factory=list)
     
     # Storage
-    storage_dir: str = Field(default_factory=lambda: os.getenv("TP_STORAGE_DIR", "node_storage"))
-    storage_backend: str = Field(default_factory=lambda: os.getenv("TP_STORAGE_BACKEND", "sqlite")) # 'sqlite', 'memory'
-    db_filename: str = Field(default_factory=lambda: os.getenv("TP_DB_FILENAME", "blockchain.db"))
+    storage_dir: str = field(default_factory=lambda: os.getenv("TP_STORAGE_DIR", "node_storage"))
+    storage_backend: str = field(default_factory=lambda: os.getenv("TP_STORAGE_BACKEND", "sqlite")) # 'sqlite', 'memory', 'log'
+    db_filename: str = field(default_factory=lambda: os.getenv("TP_DB_FILENAME", "blockchain.db"))
+    sqlite_commit_every: int = field(default_factory=lambda: int(os.getenv("TP_SQLITE_COMMIT_EVERY", "1"))) # Blocks per SQLite commit
+    log_filename: str = field(default_factory=lambda: os.getenv("TP_LOG_FILENAME", "chain.log"))
+    log_fsync: bool = field(default_factory=lambda: os.getenv("TP_LOG_FSYNC", "0") == "1")
     
     # Cryptography
-    key_size: int = Field(default_factory=lambda: int(os.getenv("TP_KEY_SIZE", "2048")))
+    key_size: int = field(default_factory=lambda: int(os.getenv("TP_KEY_SIZE", "2048")))
     public_exponent: int = 65537
     
     # Blockchain
-    difficulty: int = Field(default_factory=lambda: int(os.getenv("TP_DIFFICULTY", "4")))
+    difficulty: int = field(default_factory=lambda: int(os.getenv("TP_DIFFICULTY", "4")))
 
     # IPFS
-    ipfs_api_url: str = Field(default_factory=lambda: os.getenv("TP_IPFS_API_URL", "http://127.0.0.1:5001/api/v0"))
-    ipfs_gateway_url: str = Field(default_factory=lambda: os.getenv("TP_IPFS_GATEWAY_URL", "http://127.0.0.1:8080/ipfs"))
+    ipfs_api_url: str = field(default_factory=lambda: os.getenv("TP_IPFS_API_URL", "http://127.0.0.1:5001/api/v0"))
+    ipfs_gateway_url: str = field(default_factory=lambda: os.getenv("TP_IPFS_GATEWAY_URL", "http://127.0.0.1:8080/ipfs"))
 
     # Compression
-    image_format: str = Field(default_factory=lambda: os.getenv("TP_IMAGE_FORMAT", "WEBP")) # 'JPEG' or 'WEBP'
-    image_quality: int = Field(default_factory=lambda: int(os.getenv("TP_IMAGE_QUALITY", "85")))
+    image_format: str = field(default_factory=lambda: os.getenv("TP_IMAGE_FORMAT", "WEBP")) # 'JPEG' or 'WEBP'
+    image_quality: int = field(default_factory=lambda: int(os.getenv("TP_IMAGE_QUALITY", "85")))
 
 # Global instance (can be overridden)
 settings = Config()
@@ -1,20 +1,77 @@
 import os
-from cryptography.hazmat.primitives.asymmetric import rsa, padding
+import asyncio
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from cryptography.hazmat.primitives.asymmetric import rsa, padding, x25519, ed25519
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from cryptography.hazmat.primitives import hashes, serialization
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
-from cryptography.hazmat.backends import default_backend
-import base64
+from cryptography.hazmat.primitives.ciphers.aead import ChaCha20Poly1305
+import binascii
+
+# Leading bytes of X25519-wrapped payloads. The legacy RSA format starts with
+# the wrapped key's length instead (e.g. 00 00 01 00), which never looks like this.
+X25519_MAGIC = b"2PX1"
+# X25519-wrapped payloads sealed with ChaCha20-Poly1305 instead of AES-GCM
+CHACHA_MAGIC = b"2PC1"
+HKDF_INFO = b"2pg-hybrid"
+CHACHA_HKDF_INFO = b"2pg-hybrid-chacha"
+# Big-endian length of the RSA-wrapped key that starts legacy payloads
+# (packed and parsed in C rather than through int.to_bytes/from_bytes)
+_KEY_LEN = struct.Struct(">I")
+
+# Prefix of the message an owner's RSA key signs to vouch for its Ed25519
+# signing key, so the proof can't be replayed as any other signature
+KEY_BINDING_PREFIX = b"2pg-signing-key:"
+
+# Immutable padding descriptors, shared by every RSA operation
+_SHA256 = hashes.SHA256()
+_PSS = padding.PSS(mgf=padding.MGF1(_SHA256), salt_length=padding.PSS.MAX_LENGTH)
+_OAEP = padding.OAEP(mgf=padding.MGF1(algorithm=_SHA256), algorithm=_SHA256, label=None)
+
+def _cpu_has_aes() -> bool:
+    """
+    True unless the CPU is known to lack AES instructions (the 'aes' flag
+    in /proc/cpuinfo covers both x86 AES-NI and the ARMv8 extension).
+    Hosts without /proc are assumed to have them.
+    """
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key.strip() in ("flags", "Features"):
+                    return "aes" in value.split()
+    except OSError:
+        pass
+    return True
+
+# Without hardware AES, OpenSSL's constant-time software AES-GCM is several
+# times slower than ChaCha20-Poly1305, so new X25519 payloads use the latter
+PREFER_CHACHA = not _cpu_has_aes()
 
 def generate_keys():
     """Generates a new RSA key pair."""
     private_key = rsa.generate_private_key(
         public_exponent=65537,
-        key_size=2048,
-        backend=default_backend()
+        key_size=2048
     )
     public_key = private_key.public_key()
     return private_key, public_key
 
+def generate_x25519_keys():
+    """Generates a new X25519 key pair (used to wrap image encryption keys)."""
+    private_key = x25519.X25519PrivateKey.generate()
+    return private_key, private_key.public_key()
+
+def generate_ed25519_keys():
+    """Generates a new Ed25519 key pair (used to sign transactions)."""
+    private_key = ed25519.Ed25519PrivateKey.generate()
+    return private_key, private_key.public_key()
+
+def _x25519_aes_key(shared: bytes, info: bytes = HKDF_INFO) -> bytes:
+    return HKDF(algorithm=_SHA256, length=32, salt=None, info=info).derive(shared)
+
 def save_key_to_file(key, filename, is_private=False):
     """Saves a key to a file."""
     if is_private:
@@ -31,24 +88,38 @@ def save_key_to_file(key, filename, is_private=False):
     
     with open(filename, 'wb') as f:
         f.write(pem)
+    # A rewrite within the mtime granularity must not serve the old key
+    _load_private_key.cache_clear()
+    _load_public_key.cache_clear()
 
-def load_private_key_from_file(filename):
-    """Loads a private key from a file."""
-    with open(filename, 'rb') as f:
+def _file_version(filename):
+    """Cache key for a key file; changes whenever the file is rewritten."""
+    st = os.stat(filename)
+    return (os.path.abspath(filename), st.st_ino, st.st_size, st.st_mtime_ns)
+
+@lru_cache(maxsize=8)
+def _load_private_key(path, ino, size, mtime_ns):
+    with open(path, 'rb') as f:
         return serialization.load_pem_private_key(
             f.read(),
-            password=None,
-            backend=default_backend()
+            password=None
         )
 
-def load_public_key_from_file(filename):
-    """Loads a public key from a file."""
-    with open(filename, 'rb') as f:
+@lru_cache(maxsize=8)
+def _load_public_key(path, ino, size, mtime_ns):
+    with open(path, 'rb') as f:
         return serialization.load_pem_public_key(
-            f.read(),
-            backend=default_backend()
+            f.read()
         )
 
+def load_private_key_from_file(filename):
+    """Loads a private key from a file (cached until the file changes)."""
+    return _load_private_key(*_file_version(filename))
+
+def load_public_key_from_file(filename):
+    """Loads a public key from a file (cached until the file changes)."""
+    return _load_public_key(*_file_version(filename))
+
 def serialize_public_key(public_key) -> str:
     """Converts a public key object to a PEM string."""
     pem = public_key.public_bytes(
@@ -60,90 +131,235 @@ def serialize_public_key(public_key) -> str:
 def deserialize_public_key(pem_string: str):
     """Converts a PEM string back to a public key object."""
     return serialization.load_pem_public_key(
-        pem_string.encode('utf-8'),
-        backend=default_backend()
+        pem_string.encode('utf-8')
     )
 
-def sign_data(private_key, data: bytes) -> str:
-    """Signs data with the private key and returns the signature in base64."""
-    signature = private_key.sign(
-        data,
-        padding.PSS(
-            mgf=padding.MGF1(hashes.SHA256()),
-            salt_length=padding.PSS.MAX_LENGTH
-        ),
-        hashes.SHA256()
-    )
-    return base64.b64encode(signature).decode('utf-8')
+@lru_cache(maxsize=4096)
+def deserialize_public_key_cached(pem_string: str):
+    """deserialize_public_key memoized by PEM: the same keys recur across many transactions."""
+    return deserialize_public_key(pem_string)
 
-def verify_signature(public_key, data: bytes, signature_b64: str) -> bool:
-    """Verifies the signature of the data using the public key."""
-    try:
-        signature = base64.b64decode(signature_b64)
-        public_key.verify(
-            signature,
+def sign_data(private_key, data: bytes, raw: bool = False):
+    """
+    Signs data with the private key (Ed25519, or RSA-PSS-SHA256 for RSA
+    keys) and returns the signature in base64 (the text form stored in
+    transactions), or as raw bytes if `raw`.
+    """
+    if isinstance(private_key, ed25519.Ed25519PrivateKey):
+        signature = private_key.sign(data)
+    else:
+        signature = private_key.sign(
             data,
-            padding.PSS(
-                mgf=padding.MGF1(hashes.SHA256()),
-                salt_length=padding.PSS.MAX_LENGTH
-            ),
-            hashes.SHA256()
+            _PSS,
+            _SHA256
         )
+    if raw:
+        return signature
+    return binascii.b2a_base64(signature, newline=False).decode('ascii')
+
+def verify_signature(public_key, data: bytes, signature) -> bool:
+    """
+    Verifies the signature of the data using the public key. `signature`
+    is either the base64 text from a transaction or the raw bytes. The
+    scheme follows the key type, so RSA-signed history keeps verifying.
+    """
+    try:
+        if isinstance(signature, str):
+            signature = binascii.a2b_base64(signature)
+        if isinstance(public_key, ed25519.Ed25519PublicKey):
+            public_key.verify(signature, data)
+        else:
+            public_key.verify(
+                signature,
+                data,
+                _PSS,
+                _SHA256
+            )
         return True
     except Exception:
         return False
 
+def sign_key_binding(owner_private_key, signing_key_pem: str) -> str:
+    """
+    The owner key's base64 signature over an Ed25519 signing key's PEM,
+    published as a transaction's 'signing_key_proof'.
+    """
+    return sign_data(owner_private_key, KEY_BINDING_PREFIX + signing_key_pem.encode('utf-8'))
+
+@lru_cache(maxsize=4096)
+def verify_key_binding_cached(owner_key_pem: str, signing_key_pem: str, proof: str) -> bool:
+    """
+    True if `proof` is the owner key's signature over `signing_key_pem`,
+    i.e. the holder of the owner key authorized that signing key. Memoized:
+    one RSA verification per key pair rather than per transaction.
+    """
+    try:
+        owner_key = deserialize_public_key_cached(owner_key_pem)
+    except Exception:
+        return False
+    return verify_signature(owner_key, KEY_BINDING_PREFIX + signing_key_pem.encode('utf-8'), proof)
+
+def verify_signatures_batch(items, max_workers: int = None) -> list:
+    """
+    Verifies (public_key, data, signature) triples on a thread pool and
+    returns one flag per item, in order. OpenSSL releases the GIL while
+    verifying, so this scales with the number of cores.
+    """
+    items = list(items)
+    workers = min(max_workers or os.cpu_count() or 1, len(items))
+    if workers <= 1:
+        return [verify_signature(*item) for item in items]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(lambda item: verify_signature(*item), items))
+
+async def verify_signatures_batch_async(items, max_workers: int = None) -> list:
+    """Awaitable verify_signatures_batch that keeps the event loop free."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, verify_signatures_batch, list(items), max_workers)
+
 def encrypt_data_hybrid(data: bytes, public_key) -> bytes:
-    """Encrypts data using AES-GCM and encrypts the AES key with RSA."""
+    """
+    Encrypts data using AES-GCM. The AES key is wrapped with RSA-OAEP, or,
+    for an X25519 public key, derived from an ephemeral key exchange
+    (ECIES; a scalar multiplication instead of an RSA operation). X25519
+    payloads use ChaCha20-Poly1305 instead on CPUs without AES instructions.
+    """
+    iv = os.urandom(12) # GCM nonce
+
+    if isinstance(public_key, x25519.X25519PublicKey):
+        ephemeral = x25519.X25519PrivateKey.generate()
+        ephemeral_pub = ephemeral.public_key().public_bytes(
+            encoding=serialization.Encoding.Raw,
+            format=serialization.PublicFormat.Raw
+        )
+        if PREFER_CHACHA:
+            key = _x25519_aes_key(ephemeral.exchange(public_key), CHACHA_HKDF_INFO)
+            # Format: [Magic (4 bytes)][Ephemeral Public Key (32 bytes)][Nonce (12 bytes)][Ciphertext][Tag (16 bytes)]
+            return CHACHA_MAGIC + ephemeral_pub + iv + ChaCha20Poly1305(key).encrypt(iv, data, None)
+
+        aes_key = _x25519_aes_key(ephemeral.exchange(public_key))
+        encryptor = Cipher(
+            algorithms.AES(aes_key),
+            modes.GCM(iv)
+        ).encryptor()
+        ciphertext = encryptor.update(data)
+        encryptor.finalize()
+        # Format: [Magic (4 bytes)][Ephemeral Public Key (32 bytes)][IV (12 bytes)][Tag (16 bytes)][Ciphertext]
+        return X25519_MAGIC + ephemeral_pub + iv + encryptor.tag + ciphertext
+
     # 1. Generate AES Key (32 bytes for AES-256)
     aes_key = os.urandom(32)
-    iv = os.urandom(12) # GCM nonce
 
     # 2. Encrypt data with AES-GCM
     encryptor = Cipher(
         algorithms.AES(aes_key),
-        modes.GCM(iv),
-        backend=default_backend()
+        modes.GCM(iv)
     ).encryptor()
-    ciphertext = encryptor.update(data) + encryptor.finalize()
+    ciphertext = encryptor.update(data)
+    encryptor.finalize()  # GCM emits no further output; sets the tag
     
     # 3. Encrypt AES Key with RSA Public Key
     encrypted_key = public_key.encrypt(
         aes_key,
-        padding.OAEP(
-            mgf=padding.MGF1(algorithm=hashes.SHA256()),
-            algorithm=hashes.SHA256(),
-            label=None
-        )
+        _OAEP
     )
     
     # Format: [Key Length (4 bytes)][Encrypted Key][IV (12 bytes)][Tag (16 bytes)][Ciphertext]
-    return len(encrypted_key).to_bytes(4, 'big') + encrypted_key + iv + encryptor.tag + ciphertext
+    return _KEY_LEN.pack(len(encrypted_key)) + encrypted_key + iv + encryptor.tag + ciphertext
 
-def decrypt_data_hybrid(data: bytes, private_key) -> bytes:
-    """Decrypts data using Hybrid Encryption (RSA + AES-GCM)."""
-    # Parse format
-    key_len = int.from_bytes(data[:4], 'big')
-    encrypted_key = data[4:4+key_len]
-    iv = data[4+key_len:4+key_len+12]
-    tag = data[4+key_len+12:4+key_len+12+16]
-    ciphertext = data[4+key_len+12+16:]
-    
-    # Decrypt AES Key
-    aes_key = private_key.decrypt(
-        encrypted_key,
-        padding.OAEP(
-            mgf=padding.MGF1(algorithm=hashes.SHA256()),
-            algorithm=hashes.SHA256(),
-            label=None
+def is_x25519_payload(data: bytes) -> bool:
+    """True if hybrid-encrypted data was wrapped for an X25519 key."""
+    return bytes(data[:4]) in (X25519_MAGIC, CHACHA_MAGIC)
+
+def _decrypt_chacha(private_key, body) -> bytes:
+    """Opens a CHACHA_MAGIC payload (`body` is everything after the magic)."""
+    if len(body) < 32 + 12 + 16:
+        raise ValueError("Truncated hybrid-encrypted data")
+    ephemeral_pub = x25519.X25519PublicKey.from_public_bytes(bytes(body[:32]))
+    key = _x25519_aes_key(private_key.exchange(ephemeral_pub), CHACHA_HKDF_INFO)
+    return ChaCha20Poly1305(key).decrypt(bytes(body[32:44]), body[44:], None)
+
+def _hybrid_decryptor(private_key, encrypted_key, iv, tag):
+    """
+    Recovers the AES key (RSA unwrap, or X25519 exchange with the
+    ephemeral public key) and returns an AES-GCM decryptor.
+    """
+    if isinstance(private_key, x25519.X25519PrivateKey):
+        ephemeral_pub = x25519.X25519PublicKey.from_public_bytes(bytes(encrypted_key))
+        aes_key = _x25519_aes_key(private_key.exchange(ephemeral_pub))
+    else:
+        aes_key = private_key.decrypt(
+            bytes(encrypted_key),
+            _OAEP
         )
-    )
-    
-    # Decrypt Data
-    decryptor = Cipher(
+    return Cipher(
         algorithms.AES(aes_key),
-        modes.GCM(iv, tag),
-        backend=default_backend()
+        modes.GCM(bytes(iv), bytes(tag))
     ).decryptor()
+
+def decrypt_data_hybrid(data: bytes, private_key) -> bytes:
+    """Decrypts data using Hybrid Encryption (RSA + AES-GCM)."""
+    # Parse format in one pass over a memoryview: no copies of the ciphertext
+    view = memoryview(data)
+    if len(view) < 4:
+        raise ValueError("Truncated hybrid-encrypted data")
+    if view[:4] == CHACHA_MAGIC:
+        return _decrypt_chacha(private_key, view[4:])
+    if is_x25519_payload(view):
+        key_len = 32  # Ephemeral public key in place of the wrapped key
+    else:
+        (key_len,) = _KEY_LEN.unpack_from(view)
+    offset = 4
+    encrypted_key = view[offset:offset + key_len]
+    offset += key_len
+    iv = view[offset:offset + 12]
+    offset += 12
+    tag = view[offset:offset + 16]
+    offset += 16
+    if offset > len(view):
+        raise ValueError("Truncated hybrid-encrypted data")
+    ciphertext = view[offset:]
     
-    return decryptor.update(ciphertext) + decryptor.finalize()
+    decryptor = _hybrid_decryptor(private_key, encrypted_key, iv, tag)
+    plaintext = decryptor.update(ciphertext)
+    decryptor.finalize()  # Checks the tag; GCM emits no further output
+    return plaintext
+
+def _read_exact(fp, size: int) -> bytes:
+    data = fp.read(size)
+    if len(data) != size:
+        raise ValueError("Truncated hybrid-encrypted data")
+    return data
+
+def decrypt_stream_hybrid(fp_in, fp_out, private_key, chunk_size: int = 1 << 20) -> int:
+    """
+    Decrypts hybrid-encrypted data from fp_in into fp_out one chunk at a
+    time and returns the plaintext size. The GCM tag is only checked at the
+    end, so if this raises, whatever reached fp_out must be discarded.
+    ChaCha20-Poly1305 payloads have no streaming API and are opened whole.
+    """
+    head = _read_exact(fp_in, 4)
+    if head == CHACHA_MAGIC:
+        plaintext = _decrypt_chacha(private_key, memoryview(fp_in.read()))
+        fp_out.write(plaintext)
+        return len(plaintext)
+    key_len = 32 if head == X25519_MAGIC else _KEY_LEN.unpack(head)[0]
+    encrypted_key = _read_exact(fp_in, key_len)
+    iv = _read_exact(fp_in, 12)
+    tag = _read_exact(fp_in, 16)
+    decryptor = _hybrid_decryptor(private_key, encrypted_key, iv, tag)
+
+    # Reused buffers; update_into needs block size - 1 bytes of slack
+    in_buf = bytearray(chunk_size)
+    out_buf = bytearray(chunk_size + 15)
+    in_view, out_view = memoryview(in_buf), memoryview(out_buf)
+    total = 0
+    while True:
+        n = fp_in.readinto(in_buf)
+        if not n:
+            break
+        written = decryptor.update_into(in_view[:n], out_buf)
+        fp_out.write(out_view[:written])
+        total += written
+    decryptor.finalize()
+    return total
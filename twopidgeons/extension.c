@@ -2,50 +2,105 @@
 #include <Python.h>
 #include <string.h>
 
-/*
- * External Assembly function declaration.
- * Defined in validator.s
- */
-extern int check_lowercase_5(const char* str);
+#include <stdint.h>
+#include <fcntl.h>
+#ifdef _WIN32
+#include <io.h>
+#define open _open
+#define read _read
+#define close _close
+#else
+#include <unistd.h>
+#endif
+#ifndef O_BINARY
+#define O_BINARY 0
+#endif
+
+/* Defined in validator.c (inline assembly) */
+extern int check_jpeg_magic(const unsigned char* buf);
+
+/* Every byte of a 64-bit word set to b */
+#define BYTES8(b) (0x0101010101010101ULL * (uint8_t)(b))
 
 /*
  * C implementation of is_valid_filename
- * Checks if the string is exactly 9 chars long:
- * - First 5 chars must be lowercase letters [a-z] (Checked via ASM)
+ * Checks if the string is exactly 9 bytes long:
+ * - First 5 chars must be lowercase letters [a-z] (one SWAR range test)
  * - Last 4 chars must be ".2pg"
  */
 static PyObject* is_valid_filename_c(PyObject* self, PyObject* args) {
     const char* filename;
-    
-    // Parse arguments: expect a string ("s")
-    if (!PyArg_ParseTuple(args, "s", &filename)) {
+    Py_ssize_t len;
+
+    // Parse arguments: a string, as UTF-8 bytes with their length
+    if (!PyArg_ParseTuple(args, "s#", &filename, &len)) {
         return NULL;
     }
 
-    // 1. Length check: 5 chars + ".2pg" (4 chars) = 9 chars
-    size_t len = strlen(filename);
+    // 1. Length check: 5 chars + ".2pg" (4 chars) = 9 bytes
     if (len != 9) {
         Py_RETURN_FALSE;
     }
 
-    // 2. Check first 5 chars using optimized Assembly function
-    if (check_lowercase_5(filename) == 0) {
+    // 2. The 5 name bytes in one word; the 3 unused lanes stay 'a' so they
+    // pass. memcpy fills the lowest addresses, so this holds on any endianness
+    uint64_t w = BYTES8('a');
+    memcpy(&w, filename, 5);
+
+    // Per byte x: (x | 0x80) - 'a' keeps the top bit iff x >= 'a', and
+    // (0x80 | 'z') - x keeps it iff x <= 'z' (x < 0x80: no borrow between
+    // lanes). Bytes >= 0x80 (non-ASCII UTF-8) are rejected by ~w.
+    const uint64_t high = BYTES8(0x80);
+    uint64_t in_range = ((w | high) - BYTES8('a')) & ((high | BYTES8('z')) - (w & ~high)) & ~w & high;
+    if (in_range != high) {
         Py_RETURN_FALSE;
     }
 
-    // 3. Check suffix ".2pg"
-    // We compare starting from index 5
-    if (strcmp(filename + 5, ".2pg") != 0) {
+    // 3. Check suffix ".2pg" (a single 4-byte compare)
+    if (memcmp(filename + 5, ".2pg", 4) != 0) {
         Py_RETURN_FALSE;
     }
 
     Py_RETURN_TRUE;
 }
 
+/*
+ * C implementation of is_jpeg_file_fast
+ * Reads the first 3 bytes with plain open/read (no Python file object) and
+ * checks the JPEG magic number FF D8 FF. Unreadable files are not JPEGs.
+ */
+static PyObject* is_jpeg_file_c(PyObject* self, PyObject* args) {
+    PyObject* path_bytes;
+
+    // Parse arguments: str, bytes or os.PathLike, encoded as the OS expects
+    if (!PyArg_ParseTuple(args, "O&", PyUnicode_FSConverter, &path_bytes)) {
+        return NULL;
+    }
+
+    unsigned char header[3];
+    Py_ssize_t got = -1;
+    const char* path = PyBytes_AS_STRING(path_bytes);
+
+    Py_BEGIN_ALLOW_THREADS
+    int fd = open(path, O_RDONLY | O_BINARY);
+    if (fd >= 0) {
+        got = read(fd, header, sizeof(header));
+        close(fd);
+    }
+    Py_END_ALLOW_THREADS
+    Py_DECREF(path_bytes);
+
+    if (got == (Py_ssize_t)sizeof(header) && check_jpeg_magic(header)) {
+        Py_RETURN_TRUE;
+    }
+    Py_RETURN_FALSE;
+}
+
 
 // Method definition table
 static PyMethodDef Methods[] = {
     {"is_valid_filename_c", is_valid_filename_c, METH_VARARGS, "Fast validation of filename format."},
+    {"is_jpeg_file_c", is_jpeg_file_c, METH_VARARGS, "Fast check of a file's JPEG magic number."},
     {NULL, NULL, 0, NULL}
 };
 
@@ -5,6 +5,8 @@ class IPFSClient:
     def __init__(self, api_url: str, gateway_url: str):
         self.api_url = api_url.rstrip('/')
         self.gateway_url = gateway_url.rstrip('/')
+        # One session: the API and gateway connections are reused across calls
+        self.http = requests.Session()
 
     def add(self, data: bytes) -> str:
         """
@@ -12,7 +14,7 @@ class IPFSClient:
         """
         try:
             files = {'file': data}
-            response = requests.post(f"{self.api_url}/add", files=files)
+            response = self.http.post(f"{self.api_url}/add", files=files)
             response.raise_for_status()
             return response.json()['Hash']
         except requests.RequestException as e:
@@ -26,14 +28,14 @@ class IPFSClient:
         try:
             # Use the API 'cat' endpoint to get the raw data
             params = {'arg': cid}
-            response = requests.post(f"{self.api_url}/cat", params=params)
+            response = self.http.post(f"{self.api_url}/cat", params=params)
             response.raise_for_status()
             return response.content
         except requests.RequestException as e:
             print(f"IPFS Download Error (API): {e}")
             # Fallback to gateway if API fails
             try:
-                response = requests.get(f"{self.gateway_url}/{cid}")
+                response = self.http.get(f"{self.gateway_url}/{cid}")
                 response.raise_for_status()
                 return response.content
             except requests.RequestException as e2:
@@ -1,117 +1,287 @@
 #define PY_SSIZE_T_CLEAN
 #include <Python.h>
-#include <openssl/sha.h>
+#include <pthread.h>
 #include <stdlib.h>
 #include <string.h>
+#include <unistd.h>
+#include "sha256.h"
 
-// Helper to compute SHA256 of a string and return hex string
-static void sha256_string(const char *str, size_t len, char *outputBuffer) {
-    unsigned char hash[SHA256_DIGEST_LENGTH];
-    SHA256_CTX sha256;
-    SHA256_Init(&sha256);
-    SHA256_Update(&sha256, str, len);
-    SHA256_Final(hash, &sha256);
-    
-    for(int i = 0; i < SHA256_DIGEST_LENGTH; i++) {
-        sprintf(outputBuffer + (i * 2), "%02x", hash[i]);
+#define HEX_LEN (TP_SHA256_DIGEST_LENGTH * 2)
+#define PAIR_LEN (HEX_LEN * 2)  // Internal node input: hex(left) + hex(right), exactly two blocks
+
+// A level is split across threads only when every thread gets at least this
+// many pairs (128 KiB of input each); below that, thread start-up dominates
+#define MERKLE_THREAD_MIN_PAIRS 1024
+#define MERKLE_MAX_THREADS 16
+
+// SHA-256 state before any input, and the padding block of every 128-byte pair
+// together with its K + W schedule, which is the same for every pair
+static uint32_t sha256_iv[8];
+static uint8_t pair_padding[TP_SHA256_BLOCK_LENGTH];
+static uint32_t pair_padding_kw[64];
+
+static void init_constants(void) {
+    tp_sha256_ctx ctx;
+    tp_sha256_init(&ctx);
+    memcpy(sha256_iv, ctx.state, sizeof(sha256_iv));
+
+    uint64_t bits = (uint64_t)PAIR_LEN * 8;
+    memset(pair_padding, 0, sizeof(pair_padding));
+    pair_padding[0] = 0x80;
+    for (int i = 0; i < 8; i++)
+        pair_padding[TP_SHA256_BLOCK_LENGTH - 1 - i] = (uint8_t)(bits >> (8 * i));
+    tp_sha256_schedule_kw(pair_padding, pair_padding_kw);
+}
+
+static void emit_hex(const uint32_t words[8], uint8_t *out) {
+    uint8_t digest[TP_SHA256_DIGEST_LENGTH];
+    tp_sha256_words_to_bytes(words, digest);
+    tp_hex_encode(digest, TP_SHA256_DIGEST_LENGTH, (char *)out);
+}
+
+/*
+ * Hashes one tree level: `in` holds 2 * n_pairs hex digests back to back, so
+ * pair i is the contiguous 128 bytes at i * PAIR_LEN, and parent i is written
+ * to out + i * HEX_LEN. `out` may equal `in`: a parent never overlaps a pair
+ * that is still unread. Pairs are independent, so they go through the
+ * multi-lane compression; the shared padding block skips its message
+ * schedule via pair_padding_kw.
+ */
+static void hash_level(const uint8_t *in, uint8_t *out, size_t n_pairs) {
+    int lanes = tp_sha256_preferred_lanes();
+    size_t i = 0;
+
+    if (lanes == 8) {
+        for (; i + 8 <= n_pairs; i += 8) {
+            uint32_t st[8][8];
+            const uint8_t *data[8];
+            for (int l = 0; l < 8; l++) {
+                memcpy(st[l], sha256_iv, sizeof(sha256_iv));
+                data[l] = in + (i + (size_t)l) * PAIR_LEN;
+            }
+            tp_sha256_transform_8way(st, data, 2);
+            tp_sha256_rounds_kw_8way(st, pair_padding_kw);
+            for (int l = 0; l < 8; l++)
+                emit_hex(st[l], out + (i + (size_t)l) * HEX_LEN);
+        }
+    }
+
+    // 4-way SSE2 on its own, or for the tail of an 8-way level
+    if ((lanes == 4 || lanes == 8) && tp_sha256_has_4way()) {
+        for (; i + 4 <= n_pairs; i += 4) {
+            uint32_t st[4][8];
+            const uint8_t *data[4];
+            for (int l = 0; l < 4; l++) {
+                memcpy(st[l], sha256_iv, sizeof(sha256_iv));
+                data[l] = in + (i + (size_t)l) * PAIR_LEN;
+            }
+            tp_sha256_transform_4way(st, data, 2);
+            tp_sha256_rounds_kw_4way(st, pair_padding_kw);
+            for (int l = 0; l < 4; l++)
+                emit_hex(st[l], out + (i + (size_t)l) * HEX_LEN);
+        }
+    } else if (lanes == 2) {
+        for (; i + 2 <= n_pairs; i += 2) {
+            uint32_t s0[8], s1[8];
+            memcpy(s0, sha256_iv, sizeof(sha256_iv));
+            memcpy(s1, sha256_iv, sizeof(sha256_iv));
+            tp_sha256_transform_2way(s0, s1, in + i * PAIR_LEN, in + (i + 1) * PAIR_LEN, 2);
+            tp_sha256_rounds_kw_2way(s0, s1, pair_padding_kw);
+            emit_hex(s0, out + i * HEX_LEN);
+            emit_hex(s1, out + (i + 1) * HEX_LEN);
+        }
+    }
+
+    // Remaining pairs one at a time
+    for (; i < n_pairs; i++) {
+        tp_sha256_ctx ctx;
+        uint32_t words[8];
+        tp_sha256_init(&ctx);
+        tp_sha256_update(&ctx, in + i * PAIR_LEN, PAIR_LEN);
+        tp_sha256_final_words(&ctx, words);
+        emit_hex(words, out + i * HEX_LEN);
+    }
+}
+
+typedef struct {
+    const uint8_t *in;
+    uint8_t *out;
+    size_t n_pairs;
+} level_chunk;
+
+static void *hash_chunk(void *arg) {
+    level_chunk *c = arg;
+    hash_level(c->in, c->out, c->n_pairs);
+    return NULL;
+}
+
+static int online_cpus(void) {
+    long n = sysconf(_SC_NPROCESSORS_ONLN);
+    if (n < 1)
+        return 1;
+    return n > MERKLE_MAX_THREADS ? MERKLE_MAX_THREADS : (int)n;
+}
+
+/*
+ * Hashes a level from `in` into a separate `out` buffer with pairs split into
+ * contiguous runs, one per thread; the calling thread takes the first run.
+ * Threads that fail to start leave their run to the calling thread.
+ */
+static void hash_level_parallel(const uint8_t *in, uint8_t *out, size_t n_pairs, int threads) {
+    level_chunk chunks[MERKLE_MAX_THREADS];
+    pthread_t tids[MERKLE_MAX_THREADS];
+    int started[MERKLE_MAX_THREADS] = {0};
+    size_t per = n_pairs / (size_t)threads, extra = n_pairs % (size_t)threads, first = 0;
+
+    for (int t = 0; t < threads; t++) {
+        size_t n = per + ((size_t)t < extra);
+        chunks[t].in = in + first * PAIR_LEN;
+        chunks[t].out = out + first * HEX_LEN;
+        chunks[t].n_pairs = n;
+        first += n;
+    }
+
+    for (int t = 1; t < threads; t++)
+        started[t] = pthread_create(&tids[t], NULL, hash_chunk, &chunks[t]) == 0;
+
+    hash_chunk(&chunks[0]);
+    for (int t = 1; t < threads; t++) {
+        if (started[t])
+            pthread_join(tids[t], NULL);
+        else
+            hash_chunk(&chunks[t]);
+    }
+}
+
+/*
+ * Reduces n leaf digests (hex, contiguous) to the root in nodes[0..HEX_LEN).
+ * The buffer must have room for n + 1 digests: an odd level duplicates its
+ * last node. Large levels are hashed on several threads into a scratch
+ * buffer; once a level is small enough, the rest is folded in place.
+ * Touches no Python objects, so it runs without the GIL.
+ */
+static void fold_tree(uint8_t *nodes, size_t n) {
+    int cpus = online_cpus();
+    uint8_t *scratch = NULL;
+
+    if (cpus > 1 && n / 2 >= 2 * MERKLE_THREAD_MIN_PAIRS)
+        scratch = PyMem_RawMalloc((n / 2 + 2) * HEX_LEN);
+
+    while (n > 1) {
+        if (n & 1) {
+            memcpy(nodes + n * HEX_LEN, nodes + (n - 1) * HEX_LEN, HEX_LEN);
+            n++;
+        }
+        size_t n_pairs = n / 2;
+        size_t threads = n_pairs / MERKLE_THREAD_MIN_PAIRS;
+        if (threads > (size_t)cpus)
+            threads = (size_t)cpus;
+
+        if (scratch && threads > 1) {
+            hash_level_parallel(nodes, scratch, n_pairs, (int)threads);
+            memcpy(nodes, scratch, n_pairs * HEX_LEN);
+        } else {
+            hash_level(nodes, nodes, n_pairs);
+        }
+        n = n_pairs;
     }
-    outputBuffer[64] = 0;
+    PyMem_RawFree(scratch);
+}
+
+static PyObject* empty_root(void) {
+    uint8_t hash[TP_SHA256_DIGEST_LENGTH];
+    char hex[HEX_LEN];
+    tp_sha256((const uint8_t *)"", 0, hash);
+    tp_hex_encode(hash, TP_SHA256_DIGEST_LENGTH, hex);
+    return PyUnicode_FromStringAndSize(hex, HEX_LEN);
 }
 
 static PyObject* compute_root(PyObject* self, PyObject* args) {
     PyObject *listObj;
-    
+
     if (!PyArg_ParseTuple(args, "O!", &PyList_Type, &listObj)) {
         return NULL;
     }
-    
+
     Py_ssize_t num_tx = PyList_Size(listObj);
     if (num_tx == 0) {
-        // Hash of empty string
-        char empty_hash[65];
-        sha256_string("", 0, empty_hash);
-        return PyUnicode_FromString(empty_hash);
+        return empty_root();
     }
-    
-    // 1. Hash all transactions (Leaves)
-    // We allocate an array of strings (char buffers) to hold the hashes
-    char **hashes = malloc(num_tx * sizeof(char*));
-    if (!hashes) return PyErr_NoMemory();
 
-    for (Py_ssize_t i = 0; i < num_tx; i++) {
-        hashes[i] = malloc(65);
-        if (!hashes[i]) {
-            // Cleanup previous
-            for (Py_ssize_t j=0; j<i; j++) free(hashes[j]);
-            free(hashes);
-            return PyErr_NoMemory();
-        }
+    uint8_t *nodes = malloc(((size_t)num_tx + 1) * HEX_LEN);
+    if (!nodes) return PyErr_NoMemory();
 
+    // 1. Hash all transactions (Leaves)
+    for (Py_ssize_t i = 0; i < num_tx; i++) {
         PyObject *item = PyList_GetItem(listObj, i); // Borrowed ref
-        
+        uint8_t hash[TP_SHA256_DIGEST_LENGTH];
+
         if (!PyUnicode_Check(item)) {
-            for (Py_ssize_t j=0; j<=i; j++) free(hashes[j]);
-            free(hashes);
+            free(nodes);
             PyErr_SetString(PyExc_TypeError, "List items must be strings");
             return NULL;
         }
-        
+
         Py_ssize_t len;
         const char *tx_str = PyUnicode_AsUTF8AndSize(item, &len);
-        sha256_string(tx_str, len, hashes[i]);
+        if (!tx_str) {
+            free(nodes);
+            return NULL;
+        }
+        tp_sha256((const uint8_t *)tx_str, (size_t)len, hash);
+        tp_hex_encode(hash, TP_SHA256_DIGEST_LENGTH, (char *)nodes + (size_t)i * HEX_LEN);
     }
-    
-    Py_ssize_t current_len = num_tx;
-    
+
     // 2. Tree Reduction
-    while (current_len > 1) {
-        Py_ssize_t new_len = (current_len + 1) / 2;
-        char **new_hashes = malloc(new_len * sizeof(char*));
-        if (!new_hashes) {
-             // Cleanup
-             for(Py_ssize_t i=0; i<current_len; i++) free(hashes[i]);
-             free(hashes);
-             return PyErr_NoMemory();
-        }
-        
-        for (Py_ssize_t i = 0; i < new_len; i++) {
-            new_hashes[i] = malloc(65);
-            // Check null... (omitted for brevity but good practice)
-            
-            char *left = hashes[2*i];
-            char *right;
-            
-            if (2*i + 1 < current_len) {
-                right = hashes[2*i + 1];
-            } else {
-                right = left; // Duplicate last
-            }
-            
-            // Combine left + right
-            char combined[129]; // 64 + 64 + 1
-            strcpy(combined, left);
-            strcat(combined, right);
-            
-            sha256_string(combined, strlen(combined), new_hashes[i]);
-        }
-        
-        // Free old hashes
-        for(Py_ssize_t i=0; i<current_len; i++) free(hashes[i]);
-        free(hashes);
-        
-        hashes = new_hashes;
-        current_len = new_len;
+    Py_BEGIN_ALLOW_THREADS
+    fold_tree(nodes, (size_t)num_tx);
+    Py_END_ALLOW_THREADS
+
+    PyObject *result = PyUnicode_FromStringAndSize((const char *)nodes, HEX_LEN);
+    free(nodes);
+    return result;
+}
+
+// compute_root_from_hashes(leaf_hashes: bytes) - leaf hex digests concatenated
+static PyObject* compute_root_from_hashes(PyObject* self, PyObject* args) {
+    Py_buffer leaves;
+
+    if (!PyArg_ParseTuple(args, "y*", &leaves)) {
+        return NULL;
     }
-    
-    PyObject *result = PyUnicode_FromString(hashes[0]);
-    free(hashes[0]);
-    free(hashes);
-    
+
+    if (leaves.len % HEX_LEN != 0) {
+        PyBuffer_Release(&leaves);
+        PyErr_SetString(PyExc_ValueError, "leaf_hashes length must be a multiple of 64");
+        return NULL;
+    }
+
+    size_t n = (size_t)leaves.len / HEX_LEN;
+    if (n == 0) {
+        PyBuffer_Release(&leaves);
+        return empty_root();
+    }
+
+    uint8_t *nodes = malloc((n + 1) * HEX_LEN);
+    if (!nodes) {
+        PyBuffer_Release(&leaves);
+        return PyErr_NoMemory();
+    }
+    memcpy(nodes, leaves.buf, (size_t)leaves.len);
+    PyBuffer_Release(&leaves);
+
+    Py_BEGIN_ALLOW_THREADS
+    fold_tree(nodes, n);
+    Py_END_ALLOW_THREADS
+
+    PyObject *result = PyUnicode_FromStringAndSize((const char *)nodes, HEX_LEN);
+    free(nodes);
     return result;
 }
 
 static PyMethodDef MerkleMethods[] = {
     {"compute_root", compute_root, METH_VARARGS, "Compute Merkle Root in C"},
+    {"compute_root_from_hashes", compute_root_from_hashes, METH_VARARGS, "Compute Merkle Root from concatenated hex leaf hashes"},
     {NULL, NULL, 0, NULL}
 };
 
@@ -124,5 +294,6 @@ static struct PyModuleDef merklemodule = {
 };
 
 PyMODINIT_FUNC PyInit_merkle_module(void) {
+    init_constants();
     return PyModule_Create(&merklemodule);
 }
@@ -1,12 +1,18 @@
 import hashlib
 import json
+from binascii import hexlify
 from typing import List, Dict
 
+# Leaf and signed-transaction serialization: same output as
+# json.dumps(tx, sort_keys=True), but one encoder is reused instead of
+# json.dumps building a new one for every call
+_canonical_json = json.JSONEncoder(sort_keys=True).encode
+
 class MerkleTree:
     @staticmethod
     def hash_transaction(transaction: Dict) -> str:
         """Hashes a transaction dictionary."""
-        tx_string = json.dumps(transaction, sort_keys=True)
+        tx_string = _canonical_json(transaction)
         return hashlib.sha256(tx_string.encode()).hexdigest()
 
     @staticmethod
@@ -20,26 +26,90 @@ class MerkleTree:
         try:
             from . import merkle_module
             # Serialize transactions to strings for C module
-            tx_strings = [json.dumps(tx, sort_keys=True) for tx in transactions]
+            tx_strings = [_canonical_json(tx) for tx in transactions]
             return merkle_module.compute_root(tx_strings)
         except ImportError:
             pass
         except Exception as e:
             print(f"Warning: Merkle C extension failed ({e}), falling back to Python.")
 
-        hashes = [MerkleTree.hash_transaction(tx) for tx in transactions]
+        return MerkleTree._compute_root_bytes(transactions).decode('ascii')
+
+    @staticmethod
+    def _compute_root_bytes(transactions: List[Dict]) -> bytes:
+        """Pure-Python Merkle Root as ASCII hex bytes.
+
+        Internal nodes hash hex(left) + hex(right), so each level is kept as
+        hex ``bytes`` and concatenated directly instead of going through
+        ``str`` and ``.encode()`` at every node.
+        """
+        sha256 = hashlib.sha256
+        if not transactions:
+            return hexlify(sha256(b"").digest())
+
+        hashes = [hexlify(sha256(_canonical_json(tx).encode()).digest()) for tx in transactions]
 
         while len(hashes) > 1:
-            temp_hashes = []
-            for i in range(0, len(hashes), 2):
-                node1 = hashes[i]
-                if i + 1 < len(hashes):
-                    node2 = hashes[i + 1]
-                else:
-                    node2 = node1  # Duplicate last node if odd number
-
-                combined = node1 + node2
-                temp_hashes.append(hashlib.sha256(combined.encode()).hexdigest())
-            hashes = temp_hashes
+            if len(hashes) % 2:
+                hashes.append(hashes[-1])  # Duplicate last node if odd number
+            hashes = [hexlify(sha256(hashes[i] + hashes[i + 1]).digest())
+                      for i in range(0, len(hashes), 2)]
 
         return hashes[0]
+
+
+def _hash_pair(left: bytes, right: bytes) -> bytes:
+    return hexlify(hashlib.sha256(left + right).digest())
+
+
+class MerkleAccumulator:
+    """
+    Incremental Merkle Root over an append-only list of transactions.
+
+    Keeps one node per tree level (the roots of the complete subtrees added
+    so far), so adding a transaction hashes at most log2(n) nodes and root()
+    only folds the pending levels. The result equals
+    MerkleTree.compute_root over the same transactions.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self._inner: List[bytes] = []
+
+    def add(self, transaction: Dict):
+        tx_string = _canonical_json(transaction)
+        self.add_hash(hexlify(hashlib.sha256(tx_string.encode()).digest()))
+
+    def add_hash(self, node: bytes):
+        """Appends a leaf given as its ASCII hex hash."""
+        self.count += 1
+        level = 0
+        # Every trailing zero bit of the new count closes a complete subtree
+        while not self.count & (1 << level):
+            node = _hash_pair(self._inner[level], node)
+            level += 1
+        if level == len(self._inner):
+            self._inner.append(node)
+        else:
+            self._inner[level] = node
+
+    def root(self) -> str:
+        if not self.count:
+            return hashlib.sha256(b"").hexdigest()
+
+        count = self.count
+        level = 0
+        while not count & (1 << level):
+            level += 1
+        node = self._inner[level]
+
+        while count != 1 << level:
+            # An odd level pairs its last node with itself
+            node = _hash_pair(node, node)
+            count += 1 << level
+            level += 1
+            while not count & (1 << level):
+                node = _hash_pair(self._inner[level], node)
+                level += 1
+
+        return node.decode('ascii')
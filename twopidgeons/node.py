@@ -1,26 +1,60 @@
 import os
 import shutil
 import requests
+from requests.adapters import HTTPAdapter
 from urllib.parse import urlparse
 from PIL import Image
-import json
 from .blockchain import Blockchain, Block
-from .storage import SQLiteBackend, InMemoryBackend, StorageBackend
-from .utils import is_valid_filename, calculate_hash
+from .merkle_tree import MerkleTree, _canonical_json
+from .storage import SQLiteBackend, InMemoryBackend, LogBackend, StorageBackend, _loads
+from .utils import is_valid_filename, calculate_hash, calculate_hash_file
 from .steganography import Steganography
 from .crypto_utils import (
-    generate_keys, save_key_to_file, load_private_key_from_file, 
-    load_public_key_from_file, serialize_public_key, sign_data,
-    encrypt_data_hybrid, decrypt_data_hybrid
+    generate_keys, generate_x25519_keys, generate_ed25519_keys, save_key_to_file, load_private_key_from_file, 
+    load_public_key_from_file, serialize_public_key, sign_data, sign_key_binding,
+    encrypt_data_hybrid, decrypt_data_hybrid, is_x25519_payload
 )
 import time
-from collections import defaultdict
-from typing import Callable, List, Any, Optional
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, List, Any, Optional, Tuple
 
 from .config import Config, settings
 from .ipfs import IPFSClient
 from .smart_contract import SmartContract
 
+# Below this many signed transactions, process pool start-up costs more
+# than verifying them in this process
+PARALLEL_VALIDATION_MIN = 64
+
+# Below this many Merkle roots to recompute for a peer's chain, process
+# pool start-up and pickling cost more than computing them in this process
+PARALLEL_REBUILD_MIN = 256
+
+# Concurrent requests when broadcasting to or polling peers (pure I/O), so
+# one slow peer no longer delays all the others
+PEER_THREADS = 32
+
+# (peer, tip hash) pairs whose chain failed validation, remembered so an
+# unchanged invalid chain isn't downloaded and rebuilt every round
+REJECTED_TIPS_MAX = 256
+
+# Fields a peer's serialized block must carry, with their expected types
+BLOCK_DATA_FIELDS = (('index', int), ('timestamp', (int, float)), ('previous_hash', str),
+                     ('hash', str), ('transactions', list))
+
+def _is_block_data(b_data: Any) -> bool:
+    """True if a peer's block dict can be rebuilt into a Block (no missing or mistyped fields)."""
+    return (isinstance(b_data, dict)
+            and all(isinstance(b_data.get(field), kind) for field, kind in BLOCK_DATA_FIELDS)
+            and isinstance(b_data.get('nonce', 0), int))
+
+def _try_hash_file(path: str) -> Optional[str]:
+    try:
+        return calculate_hash_file(path)
+    except OSError:
+        return None  # store_image reports the unreadable source
+
 class Node:
     def __init__(self, config: Config = settings):
         self.config = config
@@ -29,6 +63,16 @@ class Node:
 
         self.storage_dir = config.storage_dir
         self.nodes = set(config.peers) 
+        self._rejected_tips: "OrderedDict[tuple, None]" = OrderedDict()
+        # Last ETag per chain URL, so an unchanged peer chain comes back as a 304
+        self._chain_etags: Dict[str, str] = {}
+
+        # One pooled session for all peer RPC: broadcasts and chain requests
+        # reuse keep-alive connections instead of a new handshake each time
+        self.http = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max(2 * len(self.nodes), 10))
+        self.http.mount("http://", adapter)
+        self.http.mount("https://", adapter)
         
         # Initialize IPFS Client
         self.ipfs = IPFSClient(config.ipfs_api_url, config.ipfs_gateway_url)
@@ -42,9 +86,11 @@ class Node:
         # Initialize Storage Backend
         if config.storage_backend == "sqlite":
             chain_path = os.path.join(self.storage_dir, config.db_filename)
-            backend = SQLiteBackend(chain_path)
+            backend = SQLiteBackend(chain_path, commit_every=config.sqlite_commit_every)
         elif config.storage_backend == "memory":
             backend = InMemoryBackend()
+        elif config.storage_backend == "log":
+            backend = LogBackend(os.path.join(self.storage_dir, config.log_filename), fsync=config.log_fsync)
         else:
             raise ValueError(f"Unknown storage backend: {config.storage_backend}")
 
@@ -67,6 +113,31 @@ class Node:
             
         self.public_key_pem = serialize_public_key(self.public_key)
 
+        # X25519 key for wrapping image encryption keys (the RSA pair above
+        # still signs transactions and decrypts images stored before it existed)
+        self.encryption_key_path = os.path.join(self.storage_dir, "encryption_key.pem")
+        if os.path.exists(self.encryption_key_path):
+            self.encryption_key = load_private_key_from_file(self.encryption_key_path)
+        else:
+            self.encryption_key, _ = generate_x25519_keys()
+            save_key_to_file(self.encryption_key, self.encryption_key_path, is_private=True)
+
+        # Ed25519 key for signing transactions. The RSA public key is still
+        # published in each transaction as the owner identity for ZK proofs,
+        # together with its signature over this key (signing_key_proof).
+        self.signing_key_path = os.path.join(self.storage_dir, "signing_key.pem")
+        if os.path.exists(self.signing_key_path):
+            self.signing_key = load_private_key_from_file(self.signing_key_path)
+        else:
+            self.signing_key, _ = generate_ed25519_keys()
+            save_key_to_file(self.signing_key, self.signing_key_path, is_private=True)
+        self.signing_key_pem = serialize_public_key(self.signing_key.public_key())
+        self.signing_key_proof = sign_key_binding(self.private_key, self.signing_key_pem)
+
+    def decryption_key_for(self, encrypted_data: bytes):
+        """Private key matching the format of hybrid-encrypted data."""
+        return self.encryption_key if is_x25519_payload(encrypted_data) else self.private_key
+
     # --- Event System ---
     def on(self, event_name: str):
         """Decorator to register an event listener."""
@@ -98,6 +169,14 @@ class Node:
             self.emit("transaction_received", transaction_data)
         return success
 
+    def add_transactions(self, transactions: List[dict]) -> List[bool]:
+        """Adds a batch of transactions (signatures checked concurrently)."""
+        results = self.blockchain.add_new_transactions_batch(transactions)
+        for transaction_data, success in zip(transactions, results):
+            if success:
+                self.emit("transaction_received", transaction_data)
+        return results
+
     def register_node(self, address: str):
         """Adds a new node to the list of peers."""
         parsed_url = urlparse(address)
@@ -110,33 +189,101 @@ class Node:
     def broadcast_block(self, block: Block):
         """Sends a new block to all known nodes."""
         print(f"Broadcasting block #{block.index} to peers...")
-        block_data = block.__dict__
-        for node in self.nodes:
+        # Serialize once for all peers (orjson when available)
+        body = block.to_json_bytes()
+        headers = {'Content-Type': 'application/json'}
+
+        def post(node):
             try:
-                requests.post(f"{node}/block/receive", json=block_data, timeout=2)
+                self.http.post(f"{node}/block/receive", data=body, headers=headers, timeout=2)
             except requests.RequestException:
                 print(f"Unable to contact node {node}")
 
+        nodes = list(self.nodes)
+        if nodes:
+            with ThreadPoolExecutor(max_workers=min(PEER_THREADS, len(nodes))) as pool:
+                list(pool.map(post, nodes))
+
+    def _fetch_head(self, node: str) -> Optional[dict]:
+        """A peer's {'length', 'tip_hash'}, or None if it doesn't answer /chain/head."""
+        try:
+            response = self.http.get(f'{node}/chain/head', timeout=2)
+            if response.status_code != 200:
+                return None
+            head = _loads(response.content)
+        except (requests.RequestException, ValueError):
+            return None  # Unreachable, or a body that isn't JSON
+        if not isinstance(head, dict) or not isinstance(head.get('length'), int) or 'tip_hash' not in head:
+            return None
+        return head
+
+    def _reject_tip(self, node: str, chain_data: List[dict]):
+        tip = (node, chain_data[-1].get('hash') if chain_data else None)
+        self._rejected_tips[tip] = None
+        self._rejected_tips.move_to_end(tip)
+        if len(self._rejected_tips) > REJECTED_TIPS_MAX:
+            self._rejected_tips.popitem(last=False)
+
+    def _fetch_chain(self, node: str, ndjson: bool = False) -> Optional[List[dict]]:
+        """
+        A peer's serialized blocks, or None if they can't be fetched or are
+        unchanged since the last download (the chain was then already
+        considered). With `ndjson`, /chain/stream is parsed one block per
+        line as it arrives instead of buffering the whole /chain document.
+        A malformed body counts as unreachable, so one bad peer can't abort
+        the round for the others.
+        """
+        url = f'{node}/chain/stream' if ndjson else f'{node}/chain'
+        etag = self._chain_etags.get(url)
+        headers = {'If-None-Match': etag} if etag else None
+        try:
+            with self.http.get(url, headers=headers, stream=ndjson) as response:
+                if response.status_code != 200:
+                    return None
+                if ndjson:
+                    chain_data = [_loads(line) for line in response.iter_lines() if line]
+                else:
+                    chain_data = _loads(response.content)['chain']
+                new_etag = response.headers.get('ETag')
+        except (requests.RequestException, ValueError, KeyError, TypeError):
+            return None
+        if not isinstance(chain_data, list) or not all(map(_is_block_data, chain_data)):
+            return None
+        # Only remembered once the whole body was read and parsed: a cut-short
+        # download must not turn the next request into a 304
+        if new_etag:
+            self._chain_etags[url] = new_etag
+        return chain_data
+
     def receive_block(self, block_data: dict) -> bool:
         """
         Handles the reception of a block from another node.
         Returns True if the block was accepted.
         """
+        last_block = self.blockchain.last_block
+
+        # Re-broadcasts of blocks we already have, and next blocks that don't
+        # extend our tip, are dropped before any hashing
+        index = block_data['index']
+        if index <= last_block.index:
+            return False
+        if index == last_block.index + 1 and block_data['previous_hash'] != last_block.hash:
+            return False
+
         # Reconstruct the Block object
         new_block = Block(
-            index=block_data['index'],
+            index=index,
             transactions=block_data['transactions'],
             timestamp=block_data['timestamp'],
-            previous_hash=block_data['previous_hash']
+            previous_hash=block_data['previous_hash'],
+            nonce=block_data.get('nonce', 0)
         )
         
-        last_block = self.blockchain.last_block
-        
         # Case 1: The block is the exact next one in our chain
         if new_block.index == last_block.index + 1:
             if Blockchain.is_valid_block(new_block, last_block):
                 self.blockchain.chain.append(new_block)
-                self.blockchain.save_chain()
+                self.blockchain.save_block(new_block)
                 print(f"Block #{new_block.index} received and added to the chain.")
                 return True
         
@@ -147,41 +294,109 @@ class Node:
             
         return False
 
+    def receive_blocks(self, blocks_data: List[dict]) -> int:
+        """
+        Handles a run of consecutive blocks from another node (as sent by
+        Block.to_dict), e.g. to catch up several blocks in one request.
+        Returns the number of blocks accepted. Blocks we already have are
+        skipped before any hashing, and the run ends at the first malformed
+        block (missing or mistyped fields).
+        """
+        last_index = self.blockchain.last_block.index
+        blocks = []
+        for b_data in blocks_data:
+            if not _is_block_data(b_data):
+                break
+            if b_data['index'] <= last_index:
+                continue
+            blocks.append(Block(index=b_data['index'],
+                                transactions=b_data['transactions'],
+                                timestamp=b_data['timestamp'],
+                                previous_hash=b_data['previous_hash'],
+                                nonce=b_data.get('nonce', 0)))
+        accepted = self.blockchain.append_blocks(blocks)
+        if accepted:
+            print(f"{accepted} of {len(blocks)} received blocks added to the chain.")
+        return accepted
+
+    def _rebuild_chain(self, chain_data: List[dict], workers: Optional[int] = None) -> List[Block]:
+        """
+        Block objects for a peer's serialized chain. Blocks whose
+        transactions equal ours at the same height reuse our Merkle root:
+        comparing the dicts is much cheaper than serializing and hashing
+        every transaction again. The remaining roots depend only on their
+        own block, so long runs of them are computed across `workers`
+        processes (default: one per CPU).
+        """
+        ours = self.blockchain.chain
+        roots = [ours[i].merkle_root if i < len(ours) and ours[i].transactions == b_data['transactions'] else None
+                 for i, b_data in enumerate(chain_data)]
+
+        missing = [i for i, root in enumerate(roots) if root is None]
+        workers = workers or os.cpu_count() or 1
+        if workers > 1 and len(missing) >= PARALLEL_REBUILD_MIN:
+            chunksize = max(1, len(missing) // (workers * 4))
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                computed = pool.map(MerkleTree.compute_root,
+                                    [chain_data[i]['transactions'] for i in missing], chunksize=chunksize)
+                for i, root in zip(missing, computed):
+                    roots[i] = root
+
+        return [Block(index=b_data['index'],
+                      transactions=b_data['transactions'],
+                      timestamp=b_data['timestamp'],
+                      previous_hash=b_data['previous_hash'],
+                      # /chain reports the nonce as 'proof'; Block.to_dict as 'nonce'
+                      nonce=b_data.get('nonce', b_data.get('proof', 0)),
+                      merkle_root=root)
+                for b_data, root in zip(chain_data, roots)]
+
     def resolve_conflicts(self) -> bool:
         """
         Consensus Algorithm: resolves conflicts by replacing the chain
         with the longest valid one in the network.
         Returns True if the chain was replaced, False otherwise.
+        Peers are first asked for their chain head; a full chain is only
+        downloaded if it is longer than ours and its tip isn't one already
+        rejected (peers without /chain/head are always downloaded, from
+        /chain rather than /chain/stream). The downloads run concurrently,
+        then chains are checked longest first until one is valid.
         """
-        neighbours = self.nodes
+        neighbours = list(self.nodes)
         new_chain = None
         max_length = len(self.blockchain.chain)
+        if not neighbours:
+            return False
 
-        for node in neighbours:
-            try:
-                response = requests.get(f'{node}/chain')
-                if response.status_code == 200:
-                    length = response.json()['length']
-                    chain_data = response.json()['chain']
-
-                    # If we find a longer chain, verify its validity
-                    if length > max_length:
-                        # Reconstruct the chain of Block objects
-                        temp_chain = []
-                        for b_data in chain_data:
-                            block = Block(
-                                index=b_data['index'],
-                                transactions=b_data['transactions'],
-                                timestamp=b_data['timestamp'],
-                                previous_hash=b_data['previous_hash']
-                            )
-                            temp_chain.append(block)
-                        
-                        if Blockchain.is_valid_chain(temp_chain):
-                            max_length = length
-                            new_chain = temp_chain
-            except requests.RequestException:
+        with ThreadPoolExecutor(max_workers=min(PEER_THREADS, len(neighbours))) as pool:
+            heads = list(pool.map(self._fetch_head, neighbours))
+            to_fetch = [(node, head is not None) for node, head in zip(neighbours, heads)
+                        if head is None or (head['length'] > max_length
+                                            and (node, head['tip_hash']) not in self._rejected_tips)]
+            chains = list(pool.map(lambda peer: self._fetch_chain(*peer), to_fetch))
+
+        # Only chains longer than ours are candidates
+        candidates = [(len(chain_data), node, chain_data)
+                      for (node, _), chain_data in zip(to_fetch, chains)
+                      if chain_data is not None and len(chain_data) > max_length]
+
+        # Longest first (the sort is stable, so ties keep peer order): the
+        # first valid candidate wins and the shorter ones are never rebuilt
+        candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+        for length, node, chain_data in candidates:
+            # A chain whose links don't even match is dropped before any Block is built
+            if not Blockchain.is_plausible_chain_data(chain_data):
+                self._reject_tip(node, chain_data)
                 continue
+            temp_chain = self._rebuild_chain(chain_data)
+
+            # Blocks identical to ours up to the fork point were already
+            # validated, so only the peer's suffix is checked
+            trusted = self.blockchain.shared_prefix(temp_chain)
+            if Blockchain.is_valid_chain(temp_chain, trusted):
+                new_chain = temp_chain
+                break
+            self._reject_tip(node, chain_data)
 
         if new_chain:
             self.blockchain.replace_chain(new_chain)
@@ -189,67 +404,82 @@ class Node:
 
         return False
 
-    def store_image(self, source_path: str, target_filename: str, conditions: str = None) -> bool:
+    def validate_chain_parallel(self, workers: Optional[int] = None) -> bool:
+        """
+        Re-validates the local chain: links and proof of work in this
+        process, transaction signatures on a process pool (one worker per
+        core by default). The dicts are pickled to the workers with their
+        PEM keys, which each worker parses once.
+        """
+        chain = self.blockchain.chain
+        if not Blockchain.is_valid_chain(chain):
+            return False
+
+        transactions = [tx for block in chain for tx in block.transactions if 'signature' in tx]
+        workers = workers or os.cpu_count() or 1
+        if workers <= 1 or len(transactions) < PARALLEL_VALIDATION_MIN:
+            return all(map(Blockchain.verify_transaction, transactions))
+
+        chunksize = max(1, len(transactions) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return all(pool.map(Blockchain.verify_transaction, transactions, chunksize=chunksize))
+
+    def _encode_image(self, img: Image.Image) -> Tuple[bytes, str, float]:
+        """
+        Re-encodes an opened source image with the steganography tag; returns
+        (bytes, tag, timestamp), the timestamp being the one in the tag.
+        """
+        timestamp = time.time()
+        hidden_data = f"Origin: {self.node_id} | Time: {timestamp}"
+        # Convert to RGB to ensure compatibility
+        clear_data = Steganography.embed_to_bytes(img.convert('RGB'), hidden_data,
+                                                  format=self.config.image_format,
+                                                  quality=self.config.image_quality)
+        return clear_data, hidden_data, timestamp
+
+    def _encode_file(self, source_path: str) -> Tuple[bytes, str, float]:
+        with Image.open(source_path) as img:
+            return self._encode_image(img)
+
+    def store_image(self, source_path: str, target_filename: str, conditions: str = None,
+                    source_hash: Optional[str] = None, encoded: Optional[Tuple[bytes, str, float]] = None) -> bool:
         """
         Uploads an image, validates it, saves it as .2pg, and registers it on the blockchain.
+        `source_hash` is the SHA-256 of the source file and `encoded` the
+        _encode_image result, when already computed.
         """
         # 1. Filename validation
         if not is_valid_filename(target_filename):
             print(f"Error: Filename '{target_filename}' is invalid. Must be 5 lowercase letters + .2pg")
             return False
 
-        # 2. Image format validation (must be compatible with JPEG/WebP)
+        # 2. Image format validation (must be compatible with JPEG/WebP).
+        # The image stays open (header parsed, pixels not yet decoded) for step 5
         try:
-            with Image.open(source_path) as img:
-                # We accept any format that PIL can open, as we convert it later
-                pass
+            # We accept any format that PIL can open, as we convert it later
+            img = Image.open(source_path)
         except Exception as e:
             print(f"Error: Source file is not a valid image. {e}")
             return False
 
-        # 3. Content Hash Calculation
-        with open(source_path, "rb") as f:
-            file_data = f.read()
-        
-        img_hash = calculate_hash(file_data)
+        with img:
+            # 3. Content Hash Calculation (streamed; the source is never held in memory)
+            img_hash = source_hash or calculate_hash_file(source_path)
 
-        # 4. Check if already exists
-        if self.blockchain.find_transaction(img_hash):
-            print("Error: This image is already registered in the blockchain.")
-            return False
+            # 4. Check if already exists
+            if self.blockchain.find_transaction(img_hash):
+                print("Error: This image is already registered in the blockchain.")
+                return False
 
-        # 5. Physical file saving (Temp) with Intelligent Compression
-        temp_path = os.path.join(self.storage_dir, "temp_" + target_filename)
-        
-        # Use configured format and quality
-        fmt = self.config.image_format
-        quality = self.config.image_quality
-        
-        print(f"Compressing image (Format: {fmt}, Quality: {quality})...")
-        
-        with Image.open(source_path) as img:
-            # Convert to RGB to ensure compatibility
-            img = img.convert('RGB')
-            # Save with optimization
-            img.save(temp_path, format=fmt, quality=quality, optimize=True)
-            
-        # 6. Steganography: Embed Node ID and Timestamp into the image
-        hidden_data = f"Origin: {self.node_id} | Time: {time.time()}"
-        # Pass format and quality to ensure they are preserved during embedding save
-        Steganography.embed(temp_path, hidden_data, format=fmt, quality=quality)
-        
-        # 7. Encryption
-        # Read the cleartext image data (with steganography)
-        with open(temp_path, "rb") as f:
-            clear_data = f.read()
-            
-        # Encrypt the data using the node's public key (Hybrid Encryption)
-        encrypted_data = encrypt_data_hybrid(clear_data, self.public_key)
-        
-        # Remove temp file
-        os.remove(temp_path)
+            # 5. Intelligent Compression with the Steganography tag (Node ID and
+            # Timestamp) embedded in the same encode, straight to memory
+            print(f"Compressing image (Format: {self.config.image_format}, Quality: {self.config.image_quality})...")
+            clear_data, hidden_data, timestamp = encoded or self._encode_image(img)
+
+        # 6. Encryption for this node (Hybrid Encryption, X25519 key wrap)
+        encrypted_data = encrypt_data_hybrid(clear_data, self.encryption_key.public_key())
 
-        # 8. IPFS Storage (Replaces local disk storage)
+        # 7. IPFS Storage (Replaces local disk storage)
         print("Uploading encrypted image to IPFS...")
         ipfs_cid = self.ipfs.add(encrypted_data)
         if not ipfs_cid:
@@ -258,25 +488,27 @@ class Node:
             
         print(f"Image uploaded to IPFS. CID: {ipfs_cid}")
         
-        # 9. Calculate hash of the ENCRYPTED file (Proof of Storage)
+        # 8. Calculate hash of the ENCRYPTED file (Proof of Storage)
         final_hash = calculate_hash(encrypted_data)
 
-        # 10. Blockchain Transaction Creation
+        # 9. Blockchain Transaction Creation
         transaction_data = {
             'node_id': self.node_id,
             'filename': target_filename,
             'ipfs_cid': ipfs_cid,
             'image_hash': final_hash,
             'source_hash': img_hash,
-            'timestamp': time.time(),
+            'timestamp': timestamp,  # Same instant as in hidden_data
             'hidden_data': hidden_data, # Optional: store what we hid
             'public_key': self.public_key_pem,
+            'signing_key': self.signing_key_pem,
+            'signing_key_proof': self.signing_key_proof,
             'conditions': conditions # Smart Contract Logic
         }
         
         # Sign the transaction
-        tx_bytes = json.dumps(transaction_data, sort_keys=True).encode()
-        signature = sign_data(self.private_key, tx_bytes)
+        tx_bytes = _canonical_json(transaction_data).encode()
+        signature = sign_data(self.signing_key, tx_bytes)
         
         transaction_data['signature'] = signature
         
@@ -290,6 +522,35 @@ class Node:
         print(f"Image stored on IPFS (CID: {ipfs_cid}) and registered in block #{self.blockchain.last_block.index}")
         return True
 
+    def store_images_batch(self, items: List[tuple], conditions: str = None) -> List[bool]:
+        """
+        Stores several (source_path, target_filename) pairs. The sources are
+        hashed concurrently up front, then the new ones are re-encoded on the
+        same pool while earlier images go through store_image in order
+        (hashlib and PIL's encoders release the GIL).
+        """
+        items = list(items)
+        if not items:
+            return []
+        with ThreadPoolExecutor(max_workers=min(os.cpu_count() or 1, len(items))) as pool:
+            hashes = list(pool.map(_try_hash_file, [path for path, _ in items]))
+
+            # Skip the encode for images store_image is going to reject anyway
+            seen = set()
+            encodes = []
+            for (path, name), img_hash in zip(items, hashes):
+                fresh = (img_hash is not None and img_hash not in seen and is_valid_filename(name)
+                         and not self.blockchain.find_transaction(img_hash))
+                seen.add(img_hash)
+                encodes.append(pool.submit(self._encode_file, path) if fresh else None)
+
+            results = []
+            for (path, name), img_hash, future in zip(items, hashes, encodes):
+                # A failed encode is redone (and reported) by store_image
+                encoded = future.result() if future is not None and future.exception() is None else None
+                results.append(self.store_image(path, name, conditions, source_hash=img_hash, encoded=encoded))
+        return results
+
     def validate_image(self, cid: str) -> bool:
         """
         Verifies if an image on IPFS is valid by checking the blockchain.
@@ -313,21 +574,15 @@ class Node:
         print(f"Validation OK: Authentic image registered by node {tx['node_id']}.")
 
         # 2. Decrypt and Check Steganography
+        # Decrypt in memory; the GCM tag is checked before EXIF is parsed
         try:
-            decrypted_data = decrypt_data_hybrid(encrypted_data, self.private_key)
-            
-            # Save to temp file to read EXIF
-            temp_path = os.path.join(self.storage_dir, f"temp_validate_{cid}.jpg")
-            with open(temp_path, "wb") as f:
-                f.write(decrypted_data)
+            decrypted_data = decrypt_data_hybrid(encrypted_data, self.decryption_key_for(encrypted_data))
                 
-            hidden_msg = Steganography.extract(temp_path)
+            hidden_msg = Steganography.extract(decrypted_data)
             if hidden_msg:
                 print(f"Steganography found (Decrypted): {hidden_msg}")
             else:
                 print("Warning: No steganographic data found in decrypted image.")
-                
-            os.remove(temp_path)
         except Exception as e:
             print(f"Decryption/Steganography check failed: {e}")
             # We return True because the file IS valid on blockchain, just maybe we can't read it
@@ -338,11 +593,8 @@ class Node:
 
     def get_cid_by_filename(self, filename: str) -> Optional[str]:
         """Searches the blockchain for a transaction with the given filename."""
-        for block in reversed(self.blockchain.chain):
-            for tx in block.transactions:
-                if tx.get('filename') == filename:
-                    return tx.get('ipfs_cid')
-        return None
+        tx = self.blockchain.find_transaction_by_filename(filename)
+        return tx.get('ipfs_cid') if tx else None
 
     def transfer_image(self, filename: str, recipient_id: str, payment_amount: float = 0) -> bool:
         """
@@ -355,14 +607,7 @@ class Node:
             return False
             
         # Find the full transaction to check conditions
-        original_tx = None
-        for block in reversed(self.blockchain.chain):
-            for tx in block.transactions:
-                if tx.get('filename') == filename:
-                    original_tx = tx
-                    break
-            if original_tx: break
-            
+        original_tx = self.blockchain.find_transaction_by_filename(filename)
         if not original_tx:
             return False
             
@@ -370,7 +615,8 @@ class Node:
         # In a real system, we would check if self.public_key matches original_tx['public_key']
         # or the last transfer's recipient.
         
-        # 3. Validate Smart Contract Conditions
+        # 3. Validate Smart Contract Conditions (at the transfer's own timestamp)
+        now = time.time()
         conditions = original_tx.get('conditions')
         if conditions:
             print(f"Validating Smart Contract: '{conditions}'")
@@ -378,7 +624,7 @@ class Node:
                 "amount": payment_amount,
                 "recipient": recipient_id,
                 "sender": self.node_id,
-                "timestamp": time.time()
+                "timestamp": now
             }
             
             if not self.smart_contract.validate(conditions, context):
@@ -394,13 +640,15 @@ class Node:
             'from_node': self.node_id,
             'to_node': recipient_id,
             'amount': payment_amount,
-            'timestamp': time.time(),
-            'public_key': self.public_key_pem
+            'timestamp': now,
+            'public_key': self.public_key_pem,
+            'signing_key': self.signing_key_pem,
+            'signing_key_proof': self.signing_key_proof
         }
         
         # Sign
-        tx_bytes = json.dumps(transfer_tx, sort_keys=True).encode()
-        signature = sign_data(self.private_key, tx_bytes)
+        tx_bytes = _canonical_json(transfer_tx).encode()
+        signature = sign_data(self.signing_key, tx_bytes)
         transfer_tx['signature'] = signature
         
         self.add_transaction(transfer_tx)
@@ -415,17 +663,9 @@ class Node:
         # In our simplified model, the owner is the one who created the last transaction for this file.
         # (Ideally we should track transfers, but for now let's assume the creator or last transferrer)
         
-        # We scan backwards to find the latest transaction involving this filename
-        for block in reversed(self.blockchain.chain):
-            for tx in block.transactions:
-                if tx.get('filename') == filename:
-                    # Found the latest transaction (creation or transfer)
-                    pk_pem = tx.get('public_key')
-                    if pk_pem:
-                        return pk_pem.encode('utf-8') if isinstance(pk_pem, str) else pk_pem
+        # Latest transaction involving this filename (creation or transfer)
+        tx = self.blockchain.find_transaction_by_filename(filename)
+        pk_pem = tx.get('public_key') if tx else None
+        if pk_pem:
+            return pk_pem.encode('utf-8') if isinstance(pk_pem, str) else pk_pem
         return None
-
-
-
-
-import time
@@ -1,76 +1,431 @@
+#define PY_SSIZE_T_CLEAN
 #include <Python.h>
-#include <openssl/sha.h>
-#include <stdio.h>
+#include <pthread.h>
 #include <string.h>
+#include "sha256.h"
 
-static PyObject* find_proof(PyObject* self, PyObject* args) {
-    const char* part1;
-    const char* part2;
-    int difficulty;
-    long long nonce = 0;
-    char buffer[8192]; 
-    unsigned char hash[SHA256_DIGEST_LENGTH];
-    char hex_hash[SHA256_DIGEST_LENGTH * 2 + 1];
-    
-    if (!PyArg_ParseTuple(args, "ssi", &part1, &part2, &difficulty)) {
+// Same threshold as hashlib: below it, dropping the GIL costs more than the hash
+#define SHA256_GIL_MINSIZE 2048
+
+// SHA-256 of a bytes-like object, returned as a hex string
+static PyObject* sha256_hex(PyObject* self, PyObject* args) {
+    Py_buffer data;
+    unsigned char hash[TP_SHA256_DIGEST_LENGTH];
+    char hex_hash[TP_SHA256_DIGEST_LENGTH * 2];
+
+    if (!PyArg_ParseTuple(args, "y*", &data)) {
         return NULL;
     }
 
-    int len1 = strlen(part1);
-    int len2 = strlen(part2);
-    
-    // Pre-copy part1 since it never changes
-    memcpy(buffer, part1, len1);
-
-    while (1) {
-        // Append nonce
-        int len_nonce = sprintf(buffer + len1, "%lld", nonce);
-        
-        // Append part2
-        memcpy(buffer + len1 + len_nonce, part2, len2);
-        
-        int total_len = len1 + len_nonce + len2;
-        
-        // Compute SHA256
-        SHA256((unsigned char*)buffer, total_len, hash);
-
-        // Check difficulty (leading zeros)
-        int valid = 1;
-        for (int i = 0; i < difficulty; i++) {
-            int byte_index = i / 2;
-            int nibble_index = i % 2;
-            unsigned char byte = hash[byte_index];
-            unsigned char nibble = (nibble_index == 0) ? (byte >> 4) : (byte & 0x0F);
-            
-            if (nibble != 0) {
-                valid = 0;
-                break;
-            }
+    // The buffer stays exported (and so unchanged) until PyBuffer_Release
+    if (data.len >= SHA256_GIL_MINSIZE) {
+        Py_BEGIN_ALLOW_THREADS
+        tp_sha256((const uint8_t*)data.buf, (size_t)data.len, hash);
+        tp_hex_encode(hash, TP_SHA256_DIGEST_LENGTH, hex_hash);
+        Py_END_ALLOW_THREADS
+        PyBuffer_Release(&data);
+        return PyUnicode_FromStringAndSize(hex_hash, sizeof(hex_hash));
+    }
+
+    tp_sha256((const uint8_t*)data.buf, (size_t)data.len, hash);
+    PyBuffer_Release(&data);
+
+    tp_hex_encode(hash, TP_SHA256_DIGEST_LENGTH, hex_hash);
+    return PyUnicode_FromStringAndSize(hex_hash, sizeof(hex_hash));
+}
+
+static PyObject* sha256_impl(PyObject* self, PyObject* Py_UNUSED(args)) {
+    return PyUnicode_FromString(tp_sha256_impl());
+}
+
+/*
+ * Proof-of-Work search.
+ *
+ * The header is hashed as prefix + decimal nonce + suffix. The prefix never
+ * changes during a search, so its full 64-byte blocks are compressed once
+ * (the midstate) and each attempt only hashes the prefix remainder, the nonce
+ * digits and the suffix.
+ */
+#define POW_BATCH (1 << 16)
+#define POW_MAX_NONCE 0x7FFFFFFFFFFFFFFFULL
+#define POW_MAX_LANES 8
+#define POW_MAX_THREADS 256
+#define POW_THREAD_BATCH 4096   // Nonces a worker claims at a time
+
+typedef struct {
+    tp_sha256_ctx mid;      // State after absorbing the prefix
+    const uint8_t *suffix;
+    size_t suffix_len;
+    uint32_t masks[8];      // Bits of each digest word that must be zero
+
+    /*
+     * Multi-lane search: consecutive nonces with the same digit count give
+     * tails of identical length, so each lane keeps a pre-padded copy of
+     * remainder + digits + suffix and only the digits are rewritten.
+     */
+    int lanes;              // 1, 2 (SHA-NI interleave), 4 (SSE2) or 8 (AVX2)
+    int tail_digits;        // Digit count the tails are laid out for (0 = none yet)
+    size_t tail_blocks;
+    size_t tail_cap;        // Bytes reserved per lane
+    uint8_t *tails;
+} pow_job;
+
+static int format_nonce(unsigned long long n, char *out) {
+    char tmp[20];
+    int len = 0;
+    do {
+        tmp[len++] = (char)('0' + n % 10);
+        n /= 10;
+    } while (n);
+    for (int i = 0; i < len; i++)
+        out[i] = tmp[len - 1 - i];
+    return len;
+}
+
+/*
+ * Difficulty is a count of leading hex zeros, i.e. 4 * difficulty leading
+ * zero bits. Precompute which bits of each big-endian digest word must be
+ * clear so the test is a branchless AND/OR over the raw state words.
+ */
+static void difficulty_masks(int difficulty, uint32_t masks[8]) {
+    int bits = difficulty * 4;
+    for (int i = 0; i < 8; i++) {
+        if (bits >= 32) {
+            masks[i] = 0xFFFFFFFFu;
+            bits -= 32;
+        } else if (bits > 0) {
+            masks[i] = 0xFFFFFFFFu << (32 - bits);
+            bits = 0;
+        } else {
+            masks[i] = 0;
         }
+    }
+}
+
+static inline int meets_difficulty(const uint32_t words[8], const uint32_t masks[8]) {
+    uint32_t acc = 0;
+    for (int i = 0; i < 8; i++)
+        acc |= words[i] & masks[i];
+    return acc == 0;
+}
+
+static int digit_count(unsigned long long n) {
+    int len = 1;
+    while (n >= 10) {
+        n /= 10;
+        len++;
+    }
+    return len;
+}
 
-        if (valid) {
-            // Convert to hex string
-            for(int i = 0; i < SHA256_DIGEST_LENGTH; i++)
-                sprintf(hex_hash + (i * 2), "%02x", hash[i]);
-            
-            return Py_BuildValue("Ls", nonce, hex_hash);
+// Lays out every lane's tail (minus the nonce digits) with SHA-256 padding
+static void prepare_tails(pow_job *job, int ndigits) {
+    size_t rem = job->mid.buflen;
+    size_t tail_len = rem + (size_t)ndigits + job->suffix_len;
+    uint64_t bits = (job->mid.total + (uint64_t)ndigits + job->suffix_len) * 8;
+
+    job->tail_blocks = (tail_len + 9 + TP_SHA256_BLOCK_LENGTH - 1) / TP_SHA256_BLOCK_LENGTH;
+    size_t padded = job->tail_blocks * TP_SHA256_BLOCK_LENGTH;
+
+    for (int l = 0; l < job->lanes; l++) {
+        uint8_t *t = job->tails + (size_t)l * job->tail_cap;
+        memcpy(t, job->mid.buf, rem);
+        memcpy(t + rem + ndigits, job->suffix, job->suffix_len);
+        t[tail_len] = 0x80;
+        memset(t + tail_len + 1, 0, padded - 8 - tail_len - 1);
+        for (int i = 0; i < 8; i++)
+            t[padded - 1 - i] = (uint8_t)(bits >> (8 * i));
+    }
+    job->tail_digits = ndigits;
+}
+
+// Hashes nonce .. nonce + lanes - 1 (all with the same digit count) in parallel
+static int search_lanes(pow_job *job, unsigned long long nonce,
+                        unsigned long long *nonce_out, unsigned char *hash_out) {
+    uint32_t states[POW_MAX_LANES][8];
+    const uint8_t *data[POW_MAX_LANES];
+    int ndigits = digit_count(nonce);
+
+    if (ndigits != job->tail_digits)
+        prepare_tails(job, ndigits);
+
+    for (int l = 0; l < job->lanes; l++) {
+        uint8_t *t = job->tails + (size_t)l * job->tail_cap;
+        format_nonce(nonce + (unsigned long long)l, (char *)t + job->mid.buflen);
+        memcpy(states[l], job->mid.state, sizeof(states[l]));
+        data[l] = t;
+    }
+
+    if (job->lanes == 8)
+        tp_sha256_transform_8way(states, data, job->tail_blocks);
+    else if (job->lanes == 4)
+        tp_sha256_transform_4way(states, data, job->tail_blocks);
+    else
+        tp_sha256_transform_2way(states[0], states[1], data[0], data[1], job->tail_blocks);
+
+    // Lanes are checked in nonce order so the result matches the serial search
+    for (int l = 0; l < job->lanes; l++) {
+        if (meets_difficulty(states[l], job->masks)) {
+            tp_sha256_words_to_bytes(states[l], hash_out);
+            *nonce_out = nonce + (unsigned long long)l;
+            return 1;
         }
+    }
+    return 0;
+}
+
+// Scans [start, start + count); returns 1 and fills nonce/hash on success
+static int search_range(pow_job *job, unsigned long long start, unsigned long long count,
+                        unsigned long long *nonce_out, unsigned char *hash_out) {
+    char digits[20];
+    uint32_t words[8];
+    unsigned long long lanes = (unsigned long long)job->lanes;
+    unsigned long long nonce = start;
 
+    while (nonce - start < count) {
+        if (lanes > 1 && count - (nonce - start) >= lanes &&
+            digit_count(nonce) == digit_count(nonce + lanes - 1)) {
+            if (search_lanes(job, nonce, nonce_out, hash_out))
+                return 1;
+            nonce += lanes;
+            continue;
+        }
+
+        // Single lane: end of range or a group that crosses a digit boundary
+        tp_sha256_ctx ctx = job->mid;
+        int len = format_nonce(nonce, digits);
+        tp_sha256_update(&ctx, (const uint8_t*)digits, (size_t)len);
+        tp_sha256_update(&ctx, job->suffix, job->suffix_len);
+        tp_sha256_final_words(&ctx, words);
+
+        if (meets_difficulty(words, job->masks)) {
+            // Only the winning digest is converted to bytes/hex
+            tp_sha256_words_to_bytes(words, hash_out);
+            *nonce_out = nonce;
+            return 1;
+        }
         nonce++;
-        // Avoid infinite loop in case of overflow (very unlikely)
-        if (nonce < 0) break; 
-        
-        // Allow Python to interrupt (Ctrl+C) every 100k iterations
-        if (nonce % 100000 == 0) {
-            if (PyErr_CheckSignals() != 0) return NULL;
+    }
+    return 0;
+}
+
+// Allocates the per-lane tail buffers; without them the search stays serial
+static void job_alloc_tails(pow_job *job) {
+    job->tail_digits = 0;
+    job->tail_blocks = 0;
+    job->tails = NULL;
+    if (job->lanes > 1) {
+        job->tails = PyMem_RawMalloc((size_t)job->lanes * job->tail_cap);
+        if (!job->tails)
+            job->lanes = 1;
+    }
+}
+
+/*
+ * Multi-threaded search. Workers claim POW_THREAD_BATCH-sized batches in
+ * increasing order from a shared counter and record the smallest winning
+ * nonce. A worker stops once its next batch starts past the best nonce, so
+ * every batch below the winner is fully scanned and the result is the same
+ * nonce the serial search would return.
+ */
+typedef struct {
+    unsigned long long start;
+    unsigned long long count;
+    unsigned long long n_batches;
+    unsigned long long next_batch;  // Atomic
+    unsigned long long best;        // Atomic; written under lock
+    unsigned char best_hash[TP_SHA256_DIGEST_LENGTH];
+    pthread_mutex_t lock;
+} pow_shared;
+
+typedef struct {
+    pow_shared *shared;
+    pow_job job;                    // Private copy: the lane buffers are scratch space
+} pow_worker;
+
+static void *pow_worker_run(void *arg) {
+    pow_worker *w = arg;
+    pow_shared *sh = w->shared;
+    unsigned char hash[TP_SHA256_DIGEST_LENGTH];
+    unsigned long long nonce;
+
+    for (;;) {
+        unsigned long long b = __atomic_fetch_add(&sh->next_batch, 1, __ATOMIC_RELAXED);
+        if (b >= sh->n_batches)
+            break;
+        unsigned long long offset = b * POW_THREAD_BATCH;
+        unsigned long long first = sh->start + offset;
+        if (first >= __atomic_load_n(&sh->best, __ATOMIC_ACQUIRE))
+            break;
+
+        unsigned long long n = sh->count - offset < POW_THREAD_BATCH ? sh->count - offset : POW_THREAD_BATCH;
+        if (search_range(&w->job, first, n, &nonce, hash)) {
+            pthread_mutex_lock(&sh->lock);
+            if (nonce < sh->best) {
+                memcpy(sh->best_hash, hash, sizeof(hash));
+                __atomic_store_n(&sh->best, nonce, __ATOMIC_RELEASE);
+            }
+            pthread_mutex_unlock(&sh->lock);
+            break;
+        }
+    }
+    return NULL;
+}
+
+// Called without the GIL; the calling thread works as worker 0
+static int search_parallel(pow_job *job, int threads, unsigned long long start, unsigned long long count,
+                           unsigned long long *nonce_out, unsigned char *hash_out) {
+    pow_shared sh;
+    pow_worker workers[POW_MAX_THREADS];
+    pthread_t tids[POW_MAX_THREADS];
+    int started = 0;
+
+    sh.start = start;
+    sh.count = count;
+    sh.n_batches = (count + POW_THREAD_BATCH - 1) / POW_THREAD_BATCH;
+    sh.next_batch = 0;
+    sh.best = ~0ULL;
+    pthread_mutex_init(&sh.lock, NULL);
+
+    workers[0].shared = &sh;
+    workers[0].job = *job;
+    for (int t = 1; t < threads; t++) {
+        workers[t].shared = &sh;
+        workers[t].job = *job;
+        job_alloc_tails(&workers[t].job);
+        // A thread that fails to start just leaves its batches to the others
+        if (pthread_create(&tids[t], NULL, pow_worker_run, &workers[t]) != 0) {
+            PyMem_RawFree(workers[t].job.tails);
+            break;
+        }
+        started = t;
+    }
+
+    pow_worker_run(&workers[0]);
+    *job = workers[0].job;  // Keep the caller's tails layout in sync
+
+    for (int t = 1; t <= started; t++) {
+        pthread_join(tids[t], NULL);
+        PyMem_RawFree(workers[t].job.tails);
+    }
+    pthread_mutex_destroy(&sh.lock);
+
+    if (sh.best == ~0ULL)
+        return 0;
+    *nonce_out = sh.best;
+    memcpy(hash_out, sh.best_hash, TP_SHA256_DIGEST_LENGTH);
+    return 1;
+}
+
+static PyObject* run_search(const char *prefix, Py_ssize_t prefix_len, const char *suffix, Py_ssize_t suffix_len,
+                            int difficulty, unsigned long long start, unsigned long long max_iters, int threads) {
+    pow_job job;
+    unsigned char hash[TP_SHA256_DIGEST_LENGTH];
+    char hex_hash[TP_SHA256_DIGEST_LENGTH * 2];
+    unsigned long long nonce = start;
+    unsigned long long found_nonce = 0;
+    unsigned long long remaining = max_iters ? max_iters : POW_MAX_NONCE - start + 1;
+
+    if (difficulty < 0 || difficulty > TP_SHA256_DIGEST_LENGTH * 2) {
+        PyErr_SetString(PyExc_ValueError, "difficulty must be between 0 and 64");
+        return NULL;
+    }
+    if (threads < 1 || threads > POW_MAX_THREADS) {
+        PyErr_SetString(PyExc_ValueError, "threads must be between 1 and 256");
+        return NULL;
+    }
+    if (start > POW_MAX_NONCE) {
+        PyErr_SetString(PyExc_OverflowError, "start_nonce out of range");
+        return NULL;
+    }
+    if (remaining > POW_MAX_NONCE - start + 1)
+        remaining = POW_MAX_NONCE - start + 1;
+
+    tp_sha256_init(&job.mid);
+    tp_sha256_update(&job.mid, (const uint8_t*)prefix, (size_t)prefix_len);
+    job.suffix = (const uint8_t*)suffix;
+    job.suffix_len = (size_t)suffix_len;
+    difficulty_masks(difficulty, job.masks);
+
+    job.lanes = tp_sha256_preferred_lanes();
+    job.tail_cap = ((job.mid.buflen + 20 + job.suffix_len + 9 + TP_SHA256_BLOCK_LENGTH - 1)
+                    / TP_SHA256_BLOCK_LENGTH) * TP_SHA256_BLOCK_LENGTH;
+    job_alloc_tails(&job);
+
+    // Each round between signal checks gives every thread about POW_BATCH nonces
+    unsigned long long round = (unsigned long long)POW_BATCH * (unsigned long long)threads;
+
+    PyObject *result = NULL;
+    while (remaining) {
+        unsigned long long count = remaining < round ? remaining : round;
+        int found;
+
+        Py_BEGIN_ALLOW_THREADS
+        if (threads > 1 && count > POW_THREAD_BATCH)
+            found = search_parallel(&job, threads, nonce, count, &found_nonce, hash);
+        else
+            found = search_range(&job, nonce, count, &found_nonce, hash);
+        Py_END_ALLOW_THREADS
+
+        if (found) {
+            tp_hex_encode(hash, TP_SHA256_DIGEST_LENGTH, hex_hash);
+            result = Py_BuildValue("Ls#", (long long)found_nonce, hex_hash, (Py_ssize_t)sizeof(hex_hash));
+            goto done;
         }
+
+        nonce += count;
+        remaining -= count;
+
+        // Allow Python to interrupt (Ctrl+C) between batches
+        if (PyErr_CheckSignals() != 0) goto done;
+    }
+
+    result = Py_None;
+    Py_INCREF(result);
+
+done:
+    PyMem_RawFree(job.tails);
+    return result;
+}
+
+// pow_search(prefix: bytes, suffix: bytes, difficulty: int, start_nonce=0, max_iters=0, threads=1)
+static PyObject* pow_search(PyObject* self, PyObject* args, PyObject* kwargs) {
+    static char *kwlist[] = {"prefix", "suffix", "difficulty", "start_nonce", "max_iters", "threads", NULL};
+    Py_buffer prefix, suffix;
+    int difficulty;
+    unsigned long long start = 0, max_iters = 0;
+    int threads = 1;
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "y*y*i|KKi", kwlist,
+                                     &prefix, &suffix, &difficulty, &start, &max_iters, &threads)) {
+        return NULL;
+    }
+
+    PyObject *result = run_search(prefix.buf, prefix.len, suffix.buf, suffix.len, difficulty, start, max_iters, threads);
+    PyBuffer_Release(&prefix);
+    PyBuffer_Release(&suffix);
+    return result;
+}
+
+// Kept for compatibility: find_proof(part1: str, part2: str, difficulty: int)
+static PyObject* find_proof(PyObject* self, PyObject* args) {
+    const char* part1;
+    const char* part2;
+    Py_ssize_t len1, len2;
+    int difficulty;
+
+    if (!PyArg_ParseTuple(args, "s#s#i", &part1, &len1, &part2, &len2, &difficulty)) {
+        return NULL;
     }
 
-    Py_RETURN_NONE;
+    return run_search(part1, len1, part2, len2, difficulty, 0, 0, 1);
 }
 
 static PyMethodDef PowMethods[] = {
     {"find_proof", find_proof, METH_VARARGS, "Find PoW nonce efficiently in C"},
+    {"pow_search", (PyCFunction)(void(*)(void))pow_search, METH_VARARGS | METH_KEYWORDS, "Midstate-based PoW nonce search"},
+    {"sha256_hex", sha256_hex, METH_VARARGS, "SHA-256 hex digest (SHA-NI accelerated when available)"},
+    {"sha256_impl", sha256_impl, METH_NOARGS, "Name of the selected SHA-256 implementation"},
     {NULL, NULL, 0, NULL}
 };
 
@@ -1,14 +1,17 @@
 import uvicorn
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse, ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 import sys
 import os
 import time
-import uuid
-import threading
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Aggiungi la directory parent al path per importare i moduli locali
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -55,17 +58,49 @@ class RegisterNodesResponse(BaseModel):
     message: str
     total_nodes: List[str]
 
+class ReceiveBlocksResponse(BaseModel):
+    message: str
+    accepted: int
+
 class ResolveResponse(BaseModel):
     message: str
     chain: List[Dict[str, Any]]
 
+def _block_json(block) -> Dict[str, Any]:
+    """A block as served by /chain and /chain/stream."""
+    return {
+        'index': block.index,
+        'timestamp': block.timestamp,
+        'transactions': block.transactions,
+        'proof': block.nonce,
+        'previous_hash': block.previous_hash,
+        'merkle_root': block.merkle_root,
+        'hash': block.hash
+    }
+
+def _chain_etag(chain) -> str:
+    """Validator for /chain and /chain/stream: blocks are only ever appended or replaced."""
+    return f'"{len(chain)}-{chain[-1].hash}"'
+
 # --- Server Class ---
 class P2PServer:
+    """
+    HTTP API around a single long-lived Node.
+
+    The Node (keys, PEM strings, chain, storage connection) is built once
+    and shared by every request. The handlers, and the /chain/stream body
+    generator, are `async`, so all Node and Block access (including the
+    blocks' cached JSON encodings) happens on the event loop thread and
+    never concurrently; cryptography's key objects would also be safe to
+    share across threads.
+    """
     def __init__(self, node: Node, host: str = "0.0.0.0", port: int = 5000):
         self.node = node
         self.host = host
         self.port = port
-        self.app = FastAPI(title="TwoPidgeons Node API")
+        # /chain grows with the chain: encode responses with orjson when available
+        self.app = FastAPI(title="TwoPidgeons Node API",
+                           default_response_class=ORJSONResponse if orjson is not None else JSONResponse)
         self.templates = Jinja2Templates(directory=os.path.join(os.path.dirname(__file__), "templates"))
         
         # Register routes
@@ -135,28 +170,54 @@ class P2PServer:
             return response
 
         @self.app.get("/chain", response_model=ChainResponse)
-        async def full_chain():
-            """
-            Restituisce l'intera blockchain.
-            """
-            chain_data = []
-            for block in self.node.blockchain.chain:
-                block_dict = {
-                    'index': block.index,
-                    'timestamp': block.timestamp,
-                    'transactions': block.transactions,
-                    'proof': block.nonce,
-                    'previous_hash': block.previous_hash,
-                    'merkle_root': block.merkle_root,
-                    'hash': block.hash
-                }
-                chain_data.append(block_dict)
+        async def full_chain(request: Request, response: Response):
+            """
+            Restituisce l'intera blockchain (304 se invariata rispetto a If-None-Match).
+            """
+            chain = self.node.blockchain.chain
+            etag = _chain_etag(chain)
+            if request.headers.get('if-none-match') == etag:
+                return Response(status_code=304, headers={'ETag': etag})
+            response.headers['ETag'] = etag
 
-            response = {
-                'chain': chain_data,
-                'length': len(chain_data),
-            }
-            return response
+            chain_data = [_block_json(block) for block in chain]
+            return {'chain': chain_data, 'length': len(chain_data)}
+
+        @self.app.get("/chain/stream")
+        async def stream_chain(request: Request):
+            """
+            Restituisce la blockchain come NDJSON, un blocco per riga
+            (nel formato di Block.to_dict, con 'nonce' invece di 'proof').
+            """
+            chain = list(self.node.blockchain.chain)  # Snapshot: appends don't affect the stream
+            etag = _chain_etag(chain)
+            if request.headers.get('if-none-match') == etag:
+                return Response(status_code=304, headers={'ETag': etag})
+
+            # An async generator is iterated on the event loop (a sync one
+            # would run in the threadpool, filling each block's _encoded
+            # cache off the loop thread)
+            async def lines():
+                for block in chain:
+                    yield block.to_json_bytes() + b"\n"
+
+            return StreamingResponse(lines(), media_type="application/x-ndjson", headers={'ETag': etag})
+
+        @self.app.get("/chain/head")
+        async def chain_head():
+            """
+            Restituisce solo lunghezza e hash dell'ultimo blocco.
+            """
+            chain = self.node.blockchain.chain
+            return {'length': len(chain), 'tip_hash': chain[-1].hash}
+
+        @self.app.post("/blocks/receive_batch", response_model=ReceiveBlocksResponse)
+        async def receive_blocks(blocks: List[Dict[str, Any]]):
+            """
+            Riceve più blocchi consecutivi in una sola richiesta.
+            """
+            accepted = self.node.receive_blocks(blocks)
+            return {'message': f'{accepted} blocchi aggiunti', 'accepted': accepted}
 
         @self.app.post("/nodes/register", response_model=RegisterNodesResponse, status_code=201)
         async def register_nodes(request: RegisterNodesRequest):
@@ -197,7 +258,13 @@ class P2PServer:
 
     def run(self):
         """Avvia il server Uvicorn."""
-        uvicorn.run(self.app, host=self.host, port=self.port)
+        try:
+            # One worker: the Node's chain and mempool live in this process.
+            # loop/http "auto" use uvloop and httptools when installed (the `fast` extra)
+            uvicorn.run(self.app, host=self.host, port=self.port, loop="auto", http="auto")
+        finally:
+            # Commit any blocks still waiting for a grouped commit
+            self.node.blockchain.storage.flush()
 
 # --- Main Execution ---
 if __name__ == '__main__':
@@ -0,0 +1,813 @@
+/*
+ * Self-contained SHA-256 shared by the C extensions.
+ *
+ * The compression function is selected once at load time: Intel SHA
+ * Extensions (SHA-NI) when cpuid reports them, the ARMv8 SHA2 instructions
+ * when the kernel reports them (always on Apple silicon), a portable C
+ * version otherwise.
+ */
+#include <string.h>
+#include "sha256.h"
+
+#if defined(__x86_64__) || defined(__i386__)
+#define TP_HAVE_X86 1
+#include <cpuid.h>
+#include <immintrin.h>
+#endif
+
+#if defined(__aarch64__)
+#define TP_HAVE_ARM64 1
+#include <arm_neon.h>
+#if defined(__linux__)
+#include <sys/auxv.h>
+#include <asm/hwcap.h>
+#endif
+/* Per-function opt-in, so the rest of the file still builds for baseline ARMv8 */
+#if defined(__clang__)
+#define TP_ARM_SHA2 __attribute__((target("crypto")))
+#else
+#define TP_ARM_SHA2 __attribute__((target("+crypto")))
+#endif
+#endif
+
+static const uint32_t K[64] = {
+    0x428a2f98, 0x71374491, 0xb5c0fbcf, 0xe9b5dba5, 0x3956c25b, 0x59f111f1, 0x923f82a4, 0xab1c5ed5,
+    0xd807aa98, 0x12835b01, 0x243185be, 0x550c7dc3, 0x72be5d74, 0x80deb1fe, 0x9bdc06a7, 0xc19bf174,
+    0xe49b69c1, 0xefbe4786, 0x0fc19dc6, 0x240ca1cc, 0x2de92c6f, 0x4a7484aa, 0x5cb0a9dc, 0x76f988da,
+    0x983e5152, 0xa831c66d, 0xb00327c8, 0xbf597fc7, 0xc6e00bf3, 0xd5a79147, 0x06ca6351, 0x14292967,
+    0x27b70a85, 0x2e1b2138, 0x4d2c6dfc, 0x53380d13, 0x650a7354, 0x766a0abb, 0x81c2c92e, 0x92722c85,
+    0xa2bfe8a1, 0xa81a664b, 0xc24b8b70, 0xc76c51a3, 0xd192e819, 0xd6990624, 0xf40e3585, 0x106aa070,
+    0x19a4c116, 0x1e376c08, 0x2748774c, 0x34b0bcb5, 0x391c0cb3, 0x4ed8aa4a, 0x5b9cca4f, 0x682e6ff3,
+    0x748f82ee, 0x78a5636f, 0x84c87814, 0x8cc70208, 0x90befffa, 0xa4506ceb, 0xbef9a3f7, 0xc67178f2
+};
+
+static const uint32_t H0[8] = {
+    0x6a09e667, 0xbb67ae85, 0x3c6ef372, 0xa54ff53a, 0x510e527f, 0x9b05688c, 0x1f83d9ab, 0x5be0cd19
+};
+
+#define ROTR(x, n) (((x) >> (n)) | ((x) << (32 - (n))))
+#define BSIG0(x) (ROTR(x, 2) ^ ROTR(x, 13) ^ ROTR(x, 22))
+#define BSIG1(x) (ROTR(x, 6) ^ ROTR(x, 11) ^ ROTR(x, 25))
+#define SSIG0(x) (ROTR(x, 7) ^ ROTR(x, 18) ^ ((x) >> 3))
+#define SSIG1(x) (ROTR(x, 17) ^ ROTR(x, 19) ^ ((x) >> 10))
+
+static inline uint32_t load_be32(const uint8_t *p) {
+    return ((uint32_t)p[0] << 24) | ((uint32_t)p[1] << 16) | ((uint32_t)p[2] << 8) | (uint32_t)p[3];
+}
+
+static inline void store_be32(uint8_t *p, uint32_t v) {
+    p[0] = (uint8_t)(v >> 24);
+    p[1] = (uint8_t)(v >> 16);
+    p[2] = (uint8_t)(v >> 8);
+    p[3] = (uint8_t)v;
+}
+
+// Portable compression function
+static void transform_generic(uint32_t state[8], const uint8_t *data, size_t nblocks) {
+    uint32_t w[64];
+
+    while (nblocks--) {
+        for (int i = 0; i < 16; i++)
+            w[i] = load_be32(data + 4 * i);
+        for (int i = 16; i < 64; i++)
+            w[i] = SSIG1(w[i - 2]) + w[i - 7] + SSIG0(w[i - 15]) + w[i - 16];
+
+        uint32_t a = state[0], b = state[1], c = state[2], d = state[3];
+        uint32_t e = state[4], f = state[5], g = state[6], h = state[7];
+
+        for (int i = 0; i < 64; i++) {
+            uint32_t t1 = h + BSIG1(e) + ((e & f) ^ (~e & g)) + K[i] + w[i];
+            uint32_t t2 = BSIG0(a) + ((a & b) ^ (a & c) ^ (b & c));
+            h = g; g = f; f = e; e = d + t1;
+            d = c; c = b; b = a; a = t1 + t2;
+        }
+
+        state[0] += a; state[1] += b; state[2] += c; state[3] += d;
+        state[4] += e; state[5] += f; state[6] += g; state[7] += h;
+        data += TP_SHA256_BLOCK_LENGTH;
+    }
+}
+
+// Rounds only: `kw` holds K[i] + W[i] for a block whose schedule is known
+static void rounds_kw_generic(uint32_t state[8], const uint32_t kw[64]) {
+    uint32_t a = state[0], b = state[1], c = state[2], d = state[3];
+    uint32_t e = state[4], f = state[5], g = state[6], h = state[7];
+
+    for (int i = 0; i < 64; i++) {
+        uint32_t t1 = h + BSIG1(e) + ((e & f) ^ (~e & g)) + kw[i];
+        uint32_t t2 = BSIG0(a) + ((a & b) ^ (a & c) ^ (b & c));
+        h = g; g = f; f = e; e = d + t1;
+        d = c; c = b; b = a; a = t1 + t2;
+    }
+
+    state[0] += a; state[1] += b; state[2] += c; state[3] += d;
+    state[4] += e; state[5] += f; state[6] += g; state[7] += h;
+}
+
+#ifdef TP_HAVE_X86
+/*
+ * SHA-NI compression function.
+ * Each iteration runs 4 rounds (two sha256rnds2) and extends the message
+ * schedule 4 words at a time with sha256msg1/sha256msg2.
+ */
+__attribute__((target("sha,sse4.1,ssse3")))
+static void transform_shani(uint32_t state[8], const uint8_t *data, size_t nblocks) {
+    const __m128i MASK = _mm_set_epi64x(0x0c0d0e0f08090a0bULL, 0x0405060700010203ULL);
+    __m128i tmp = _mm_loadu_si128((const __m128i *)&state[0]);
+    __m128i state1 = _mm_loadu_si128((const __m128i *)&state[4]);
+
+    tmp = _mm_shuffle_epi32(tmp, 0xB1);                 // CDAB
+    state1 = _mm_shuffle_epi32(state1, 0x1B);           // EFGH
+    __m128i state0 = _mm_alignr_epi8(tmp, state1, 8);   // ABEF
+    state1 = _mm_blend_epi16(state1, tmp, 0xF0);        // CDGH
+
+    while (nblocks--) {
+        __m128i abef_save = state0;
+        __m128i cdgh_save = state1;
+        __m128i m[4];
+
+        for (int i = 0; i < 4; i++)
+            m[i] = _mm_shuffle_epi8(_mm_loadu_si128((const __m128i *)(data + 16 * i)), MASK);
+
+        for (int r = 0; r < 16; r++) {
+            __m128i msg = _mm_add_epi32(m[r & 3], _mm_loadu_si128((const __m128i *)&K[4 * r]));
+            state1 = _mm_sha256rnds2_epu32(state1, state0, msg);
+            msg = _mm_shuffle_epi32(msg, 0x0E);
+            state0 = _mm_sha256rnds2_epu32(state0, state1, msg);
+
+            if (r < 12) {
+                // W[t..t+3] = msg2(msg1(W[t-16], W[t-12]) + W[t-7..t-4], W[t-4..t-1])
+                __m128i w7 = _mm_alignr_epi8(m[(r + 3) & 3], m[(r + 2) & 3], 4);
+                __m128i x = _mm_add_epi32(_mm_sha256msg1_epu32(m[r & 3], m[(r + 1) & 3]), w7);
+                m[r & 3] = _mm_sha256msg2_epu32(x, m[(r + 3) & 3]);
+            }
+        }
+
+        state0 = _mm_add_epi32(state0, abef_save);
+        state1 = _mm_add_epi32(state1, cdgh_save);
+        data += TP_SHA256_BLOCK_LENGTH;
+    }
+
+    tmp = _mm_shuffle_epi32(state0, 0x1B);              // FEBA
+    state1 = _mm_shuffle_epi32(state1, 0xB1);           // DCHG
+    state0 = _mm_blend_epi16(tmp, state1, 0xF0);        // DCBA
+    state1 = _mm_alignr_epi8(state1, tmp, 8);           // HGFE
+
+    _mm_storeu_si128((__m128i *)&state[0], state0);
+    _mm_storeu_si128((__m128i *)&state[4], state1);
+}
+
+__attribute__((target("sha,sse4.1,ssse3")))
+static void rounds_kw_shani(uint32_t state[8], const uint32_t kw[64]) {
+    __m128i tmp = _mm_loadu_si128((const __m128i *)&state[0]);
+    __m128i state1 = _mm_loadu_si128((const __m128i *)&state[4]);
+
+    tmp = _mm_shuffle_epi32(tmp, 0xB1);
+    state1 = _mm_shuffle_epi32(state1, 0x1B);
+    __m128i state0 = _mm_alignr_epi8(tmp, state1, 8);
+    state1 = _mm_blend_epi16(state1, tmp, 0xF0);
+
+    __m128i abef_save = state0;
+    __m128i cdgh_save = state1;
+
+    // No sha256msg1/msg2: the schedule is already folded into kw
+    for (int r = 0; r < 16; r++) {
+        __m128i msg = _mm_loadu_si128((const __m128i *)&kw[4 * r]);
+        state1 = _mm_sha256rnds2_epu32(state1, state0, msg);
+        msg = _mm_shuffle_epi32(msg, 0x0E);
+        state0 = _mm_sha256rnds2_epu32(state0, state1, msg);
+    }
+
+    state0 = _mm_add_epi32(state0, abef_save);
+    state1 = _mm_add_epi32(state1, cdgh_save);
+
+    tmp = _mm_shuffle_epi32(state0, 0x1B);
+    state1 = _mm_shuffle_epi32(state1, 0xB1);
+    state0 = _mm_blend_epi16(tmp, state1, 0xF0);
+    state1 = _mm_alignr_epi8(state1, tmp, 8);
+
+    _mm_storeu_si128((__m128i *)&state[0], state0);
+    _mm_storeu_si128((__m128i *)&state[4], state1);
+}
+
+/* 2-way SHA-NI: two independent messages advance through the rounds together */
+__attribute__((target("sha,sse4.1,ssse3")))
+static void transform_shani_2way(uint32_t sa[8], uint32_t sb[8], const uint8_t *da, const uint8_t *db, size_t nblocks) {
+    const __m128i MASK = _mm_set_epi64x(0x0c0d0e0f08090a0bULL, 0x0405060700010203ULL);
+    __m128i ta = _mm_shuffle_epi32(_mm_loadu_si128((const __m128i *)&sa[0]), 0xB1);
+    __m128i tb = _mm_shuffle_epi32(_mm_loadu_si128((const __m128i *)&sb[0]), 0xB1);
+    __m128i a1 = _mm_shuffle_epi32(_mm_loadu_si128((const __m128i *)&sa[4]), 0x1B);
+    __m128i b1 = _mm_shuffle_epi32(_mm_loadu_si128((const __m128i *)&sb[4]), 0x1B);
+    __m128i a0 = _mm_alignr_epi8(ta, a1, 8);
+    __m128i b0 = _mm_alignr_epi8(tb, b1, 8);
+    a1 = _mm_blend_epi16(a1, ta, 0xF0);
+    b1 = _mm_blend_epi16(b1, tb, 0xF0);
+
+    while (nblocks--) {
+        __m128i a0_save = a0, a1_save = a1, b0_save = b0, b1_save = b1;
+        __m128i ma[4], mb[4];
+
+        for (int i = 0; i < 4; i++) {
+            ma[i] = _mm_shuffle_epi8(_mm_loadu_si128((const __m128i *)(da + 16 * i)), MASK);
+            mb[i] = _mm_shuffle_epi8(_mm_loadu_si128((const __m128i *)(db + 16 * i)), MASK);
+        }
+
+        for (int r = 0; r < 16; r++) {
+            __m128i k = _mm_loadu_si128((const __m128i *)&K[4 * r]);
+            __m128i msga = _mm_add_epi32(ma[r & 3], k);
+            __m128i msgb = _mm_add_epi32(mb[r & 3], k);
+            a1 = _mm_sha256rnds2_epu32(a1, a0, msga);
+            b1 = _mm_sha256rnds2_epu32(b1, b0, msgb);
+            msga = _mm_shuffle_epi32(msga, 0x0E);
+            msgb = _mm_shuffle_epi32(msgb, 0x0E);
+            a0 = _mm_sha256rnds2_epu32(a0, a1, msga);
+            b0 = _mm_sha256rnds2_epu32(b0, b1, msgb);
+
+            if (r < 12) {
+                __m128i xa = _mm_add_epi32(_mm_sha256msg1_epu32(ma[r & 3], ma[(r + 1) & 3]),
+                                           _mm_alignr_epi8(ma[(r + 3) & 3], ma[(r + 2) & 3], 4));
+                __m128i xb = _mm_add_epi32(_mm_sha256msg1_epu32(mb[r & 3], mb[(r + 1) & 3]),
+                                           _mm_alignr_epi8(mb[(r + 3) & 3], mb[(r + 2) & 3], 4));
+                ma[r & 3] = _mm_sha256msg2_epu32(xa, ma[(r + 3) & 3]);
+                mb[r & 3] = _mm_sha256msg2_epu32(xb, mb[(r + 3) & 3]);
+            }
+        }
+
+        a0 = _mm_add_epi32(a0, a0_save);
+        a1 = _mm_add_epi32(a1, a1_save);
+        b0 = _mm_add_epi32(b0, b0_save);
+        b1 = _mm_add_epi32(b1, b1_save);
+        da += TP_SHA256_BLOCK_LENGTH;
+        db += TP_SHA256_BLOCK_LENGTH;
+    }
+
+    ta = _mm_shuffle_epi32(a0, 0x1B);
+    tb = _mm_shuffle_epi32(b0, 0x1B);
+    a1 = _mm_shuffle_epi32(a1, 0xB1);
+    b1 = _mm_shuffle_epi32(b1, 0xB1);
+    _mm_storeu_si128((__m128i *)&sa[0], _mm_blend_epi16(ta, a1, 0xF0));
+    _mm_storeu_si128((__m128i *)&sb[0], _mm_blend_epi16(tb, b1, 0xF0));
+    _mm_storeu_si128((__m128i *)&sa[4], _mm_alignr_epi8(a1, ta, 8));
+    _mm_storeu_si128((__m128i *)&sb[4], _mm_alignr_epi8(b1, tb, 8));
+}
+
+/* 2-way SHA-NI over a block whose K + W are known (shared by both lanes) */
+__attribute__((target("sha,sse4.1,ssse3")))
+static void rounds_kw_shani_2way(uint32_t sa[8], uint32_t sb[8], const uint32_t kw[64]) {
+    __m128i ta = _mm_shuffle_epi32(_mm_loadu_si128((const __m128i *)&sa[0]), 0xB1);
+    __m128i tb = _mm_shuffle_epi32(_mm_loadu_si128((const __m128i *)&sb[0]), 0xB1);
+    __m128i a1 = _mm_shuffle_epi32(_mm_loadu_si128((const __m128i *)&sa[4]), 0x1B);
+    __m128i b1 = _mm_shuffle_epi32(_mm_loadu_si128((const __m128i *)&sb[4]), 0x1B);
+    __m128i a0 = _mm_alignr_epi8(ta, a1, 8);
+    __m128i b0 = _mm_alignr_epi8(tb, b1, 8);
+    a1 = _mm_blend_epi16(a1, ta, 0xF0);
+    b1 = _mm_blend_epi16(b1, tb, 0xF0);
+    __m128i a0_save = a0, a1_save = a1, b0_save = b0, b1_save = b1;
+
+    for (int r = 0; r < 16; r++) {
+        __m128i msg = _mm_loadu_si128((const __m128i *)&kw[4 * r]);
+        a1 = _mm_sha256rnds2_epu32(a1, a0, msg);
+        b1 = _mm_sha256rnds2_epu32(b1, b0, msg);
+        msg = _mm_shuffle_epi32(msg, 0x0E);
+        a0 = _mm_sha256rnds2_epu32(a0, a1, msg);
+        b0 = _mm_sha256rnds2_epu32(b0, b1, msg);
+    }
+
+    a0 = _mm_add_epi32(a0, a0_save);
+    a1 = _mm_add_epi32(a1, a1_save);
+    b0 = _mm_add_epi32(b0, b0_save);
+    b1 = _mm_add_epi32(b1, b1_save);
+
+    ta = _mm_shuffle_epi32(a0, 0x1B);
+    tb = _mm_shuffle_epi32(b0, 0x1B);
+    a1 = _mm_shuffle_epi32(a1, 0xB1);
+    b1 = _mm_shuffle_epi32(b1, 0xB1);
+    _mm_storeu_si128((__m128i *)&sa[0], _mm_blend_epi16(ta, a1, 0xF0));
+    _mm_storeu_si128((__m128i *)&sb[0], _mm_blend_epi16(tb, b1, 0xF0));
+    _mm_storeu_si128((__m128i *)&sa[4], _mm_alignr_epi8(a1, ta, 8));
+    _mm_storeu_si128((__m128i *)&sb[4], _mm_alignr_epi8(b1, tb, 8));
+}
+
+/*
+ * 8-way AVX2: each __m256i holds the same state/schedule word of 8
+ * independent messages, so one vector op advances all 8 hashes.
+ */
+#define V_ROTR(x, n) _mm256_or_si256(_mm256_srli_epi32(x, n), _mm256_slli_epi32(x, 32 - (n)))
+#define V_BSIG0(x) _mm256_xor_si256(_mm256_xor_si256(V_ROTR(x, 2), V_ROTR(x, 13)), V_ROTR(x, 22))
+#define V_BSIG1(x) _mm256_xor_si256(_mm256_xor_si256(V_ROTR(x, 6), V_ROTR(x, 11)), V_ROTR(x, 25))
+#define V_SSIG0(x) _mm256_xor_si256(_mm256_xor_si256(V_ROTR(x, 7), V_ROTR(x, 18)), _mm256_srli_epi32(x, 3))
+#define V_SSIG1(x) _mm256_xor_si256(_mm256_xor_si256(V_ROTR(x, 17), V_ROTR(x, 19)), _mm256_srli_epi32(x, 10))
+
+__attribute__((target("avx2")))
+static void transform_8way_avx2(uint32_t state[8][8], const uint8_t *const data[8], size_t nblocks) {
+    __m256i s[8], w[16];
+
+    for (int i = 0; i < 8; i++)
+        s[i] = _mm256_setr_epi32((int)state[0][i], (int)state[1][i], (int)state[2][i], (int)state[3][i],
+                                 (int)state[4][i], (int)state[5][i], (int)state[6][i], (int)state[7][i]);
+
+    for (size_t blk = 0; blk < nblocks; blk++) {
+        size_t off = blk * TP_SHA256_BLOCK_LENGTH;
+        for (int i = 0; i < 16; i++) {
+            w[i] = _mm256_setr_epi32(
+                (int)load_be32(data[0] + off + 4 * i), (int)load_be32(data[1] + off + 4 * i),
+                (int)load_be32(data[2] + off + 4 * i), (int)load_be32(data[3] + off + 4 * i),
+                (int)load_be32(data[4] + off + 4 * i), (int)load_be32(data[5] + off + 4 * i),
+                (int)load_be32(data[6] + off + 4 * i), (int)load_be32(data[7] + off + 4 * i));
+        }
+
+        __m256i a = s[0], b = s[1], c = s[2], d = s[3];
+        __m256i e = s[4], f = s[5], g = s[6], h = s[7];
+
+        for (int t = 0; t < 64; t++) {
+            if (t >= 16) {
+                w[t & 15] = _mm256_add_epi32(
+                    _mm256_add_epi32(V_SSIG1(w[(t - 2) & 15]), w[(t - 7) & 15]),
+                    _mm256_add_epi32(V_SSIG0(w[(t - 15) & 15]), w[t & 15]));
+            }
+            __m256i ch = _mm256_xor_si256(_mm256_and_si256(e, f), _mm256_andnot_si256(e, g));
+            __m256i maj = _mm256_or_si256(_mm256_and_si256(a, b), _mm256_and_si256(c, _mm256_or_si256(a, b)));
+            __m256i t1 = _mm256_add_epi32(_mm256_add_epi32(h, V_BSIG1(e)),
+                                          _mm256_add_epi32(_mm256_add_epi32(ch, _mm256_set1_epi32((int)K[t])), w[t & 15]));
+            __m256i t2 = _mm256_add_epi32(V_BSIG0(a), maj);
+            h = g; g = f; f = e; e = _mm256_add_epi32(d, t1);
+            d = c; c = b; b = a; a = _mm256_add_epi32(t1, t2);
+        }
+
+        s[0] = _mm256_add_epi32(s[0], a); s[1] = _mm256_add_epi32(s[1], b);
+        s[2] = _mm256_add_epi32(s[2], c); s[3] = _mm256_add_epi32(s[3], d);
+        s[4] = _mm256_add_epi32(s[4], e); s[5] = _mm256_add_epi32(s[5], f);
+        s[6] = _mm256_add_epi32(s[6], g); s[7] = _mm256_add_epi32(s[7], h);
+    }
+
+    for (int i = 0; i < 8; i++) {
+        uint32_t lanes[8];
+        _mm256_storeu_si256((__m256i *)lanes, s[i]);
+        for (int l = 0; l < 8; l++)
+            state[l][i] = lanes[l];
+    }
+}
+
+/* 8-way AVX2 over a block whose K + W are known: no message schedule */
+__attribute__((target("avx2")))
+static void rounds_kw_8way_avx2(uint32_t state[8][8], const uint32_t kw[64]) {
+    __m256i s[8];
+
+    for (int i = 0; i < 8; i++)
+        s[i] = _mm256_setr_epi32((int)state[0][i], (int)state[1][i], (int)state[2][i], (int)state[3][i],
+                                 (int)state[4][i], (int)state[5][i], (int)state[6][i], (int)state[7][i]);
+
+    __m256i a = s[0], b = s[1], c = s[2], d = s[3];
+    __m256i e = s[4], f = s[5], g = s[6], h = s[7];
+
+    for (int t = 0; t < 64; t++) {
+        __m256i ch = _mm256_xor_si256(_mm256_and_si256(e, f), _mm256_andnot_si256(e, g));
+        __m256i maj = _mm256_or_si256(_mm256_and_si256(a, b), _mm256_and_si256(c, _mm256_or_si256(a, b)));
+        __m256i t1 = _mm256_add_epi32(_mm256_add_epi32(h, V_BSIG1(e)),
+                                      _mm256_add_epi32(ch, _mm256_set1_epi32((int)kw[t])));
+        __m256i t2 = _mm256_add_epi32(V_BSIG0(a), maj);
+        h = g; g = f; f = e; e = _mm256_add_epi32(d, t1);
+        d = c; c = b; b = a; a = _mm256_add_epi32(t1, t2);
+    }
+
+    s[0] = _mm256_add_epi32(s[0], a); s[1] = _mm256_add_epi32(s[1], b);
+    s[2] = _mm256_add_epi32(s[2], c); s[3] = _mm256_add_epi32(s[3], d);
+    s[4] = _mm256_add_epi32(s[4], e); s[5] = _mm256_add_epi32(s[5], f);
+    s[6] = _mm256_add_epi32(s[6], g); s[7] = _mm256_add_epi32(s[7], h);
+
+    for (int i = 0; i < 8; i++) {
+        uint32_t lanes[8];
+        _mm256_storeu_si256((__m256i *)lanes, s[i]);
+        for (int l = 0; l < 8; l++)
+            state[l][i] = lanes[l];
+    }
+}
+
+/*
+ * 4-way SSE2: the same layout with 128-bit vectors, for x86 CPUs that have
+ * neither SHA-NI nor AVX2 (SSE2 is part of the x86-64 baseline).
+ */
+#define V4_ROTR(x, n) _mm_or_si128(_mm_srli_epi32(x, n), _mm_slli_epi32(x, 32 - (n)))
+#define V4_BSIG0(x) _mm_xor_si128(_mm_xor_si128(V4_ROTR(x, 2), V4_ROTR(x, 13)), V4_ROTR(x, 22))
+#define V4_BSIG1(x) _mm_xor_si128(_mm_xor_si128(V4_ROTR(x, 6), V4_ROTR(x, 11)), V4_ROTR(x, 25))
+#define V4_SSIG0(x) _mm_xor_si128(_mm_xor_si128(V4_ROTR(x, 7), V4_ROTR(x, 18)), _mm_srli_epi32(x, 3))
+#define V4_SSIG1(x) _mm_xor_si128(_mm_xor_si128(V4_ROTR(x, 17), V4_ROTR(x, 19)), _mm_srli_epi32(x, 10))
+
+__attribute__((target("sse2")))
+static void transform_4way_sse2(uint32_t state[4][8], const uint8_t *const data[4], size_t nblocks) {
+    __m128i s[8], w[16];
+
+    for (int i = 0; i < 8; i++)
+        s[i] = _mm_setr_epi32((int)state[0][i], (int)state[1][i], (int)state[2][i], (int)state[3][i]);
+
+    for (size_t blk = 0; blk < nblocks; blk++) {
+        size_t off = blk * TP_SHA256_BLOCK_LENGTH;
+        for (int i = 0; i < 16; i++) {
+            w[i] = _mm_setr_epi32(
+                (int)load_be32(data[0] + off + 4 * i), (int)load_be32(data[1] + off + 4 * i),
+                (int)load_be32(data[2] + off + 4 * i), (int)load_be32(data[3] + off + 4 * i));
+        }
+
+        __m128i a = s[0], b = s[1], c = s[2], d = s[3];
+        __m128i e = s[4], f = s[5], g = s[6], h = s[7];
+
+        for (int t = 0; t < 64; t++) {
+            if (t >= 16) {
+                w[t & 15] = _mm_add_epi32(
+                    _mm_add_epi32(V4_SSIG1(w[(t - 2) & 15]), w[(t - 7) & 15]),
+                    _mm_add_epi32(V4_SSIG0(w[(t - 15) & 15]), w[t & 15]));
+            }
+            __m128i ch = _mm_xor_si128(_mm_and_si128(e, f), _mm_andnot_si128(e, g));
+            __m128i maj = _mm_or_si128(_mm_and_si128(a, b), _mm_and_si128(c, _mm_or_si128(a, b)));
+            __m128i t1 = _mm_add_epi32(_mm_add_epi32(h, V4_BSIG1(e)),
+                                       _mm_add_epi32(_mm_add_epi32(ch, _mm_set1_epi32((int)K[t])), w[t & 15]));
+            __m128i t2 = _mm_add_epi32(V4_BSIG0(a), maj);
+            h = g; g = f; f = e; e = _mm_add_epi32(d, t1);
+            d = c; c = b; b = a; a = _mm_add_epi32(t1, t2);
+        }
+
+        s[0] = _mm_add_epi32(s[0], a); s[1] = _mm_add_epi32(s[1], b);
+        s[2] = _mm_add_epi32(s[2], c); s[3] = _mm_add_epi32(s[3], d);
+        s[4] = _mm_add_epi32(s[4], e); s[5] = _mm_add_epi32(s[5], f);
+        s[6] = _mm_add_epi32(s[6], g); s[7] = _mm_add_epi32(s[7], h);
+    }
+
+    for (int i = 0; i < 8; i++) {
+        uint32_t lanes[4];
+        _mm_storeu_si128((__m128i *)lanes, s[i]);
+        for (int l = 0; l < 4; l++)
+            state[l][i] = lanes[l];
+    }
+}
+
+__attribute__((target("sse2")))
+static void rounds_kw_4way_sse2(uint32_t state[4][8], const uint32_t kw[64]) {
+    __m128i s[8];
+
+    for (int i = 0; i < 8; i++)
+        s[i] = _mm_setr_epi32((int)state[0][i], (int)state[1][i], (int)state[2][i], (int)state[3][i]);
+
+    __m128i a = s[0], b = s[1], c = s[2], d = s[3];
+    __m128i e = s[4], f = s[5], g = s[6], h = s[7];
+
+    for (int t = 0; t < 64; t++) {
+        __m128i ch = _mm_xor_si128(_mm_and_si128(e, f), _mm_andnot_si128(e, g));
+        __m128i maj = _mm_or_si128(_mm_and_si128(a, b), _mm_and_si128(c, _mm_or_si128(a, b)));
+        __m128i t1 = _mm_add_epi32(_mm_add_epi32(h, V4_BSIG1(e)),
+                                   _mm_add_epi32(ch, _mm_set1_epi32((int)kw[t])));
+        __m128i t2 = _mm_add_epi32(V4_BSIG0(a), maj);
+        h = g; g = f; f = e; e = _mm_add_epi32(d, t1);
+        d = c; c = b; b = a; a = _mm_add_epi32(t1, t2);
+    }
+
+    s[0] = _mm_add_epi32(s[0], a); s[1] = _mm_add_epi32(s[1], b);
+    s[2] = _mm_add_epi32(s[2], c); s[3] = _mm_add_epi32(s[3], d);
+    s[4] = _mm_add_epi32(s[4], e); s[5] = _mm_add_epi32(s[5], f);
+    s[6] = _mm_add_epi32(s[6], g); s[7] = _mm_add_epi32(s[7], h);
+
+    for (int i = 0; i < 8; i++) {
+        uint32_t lanes[4];
+        _mm_storeu_si128((__m128i *)lanes, s[i]);
+        for (int l = 0; l < 4; l++)
+            state[l][i] = lanes[l];
+    }
+}
+
+static int cpu_has_shani(void) {
+    unsigned int eax, ebx, ecx, edx;
+
+    // SSSE3 (ECX bit 9) and SSE4.1 (ECX bit 19) are required by the shuffles
+    if (!__get_cpuid(1, &eax, &ebx, &ecx, &edx))
+        return 0;
+    if (!(ecx & (1u << 9)) || !(ecx & (1u << 19)))
+        return 0;
+
+    // SHA extensions: CPUID.(EAX=7,ECX=0):EBX bit 29
+    if (!__get_cpuid_count(7, 0, &eax, &ebx, &ecx, &edx))
+        return 0;
+    return (ebx >> 29) & 1;
+}
+#endif
+
+#ifdef TP_HAVE_ARM64
+/*
+ * ARMv8 SHA2 compression function. State stays in natural ABCD/EFGH order;
+ * each iteration runs 4 rounds (sha256h + sha256h2) and, for the first 12,
+ * extends the schedule 4 words ahead with sha256su0/sha256su1.
+ */
+TP_ARM_SHA2
+static void transform_armv8(uint32_t state[8], const uint8_t *data, size_t nblocks) {
+    uint32x4_t state0 = vld1q_u32(&state[0]);
+    uint32x4_t state1 = vld1q_u32(&state[4]);
+
+    while (nblocks--) {
+        uint32x4_t abcd_save = state0;
+        uint32x4_t efgh_save = state1;
+        uint32x4_t msg[4];
+        for (int i = 0; i < 4; i++)
+            msg[i] = vreinterpretq_u32_u8(vrev32q_u8(vld1q_u8(data + 16 * i)));
+
+        for (int r = 0; r < 16; r++) {
+            uint32x4_t wk = vaddq_u32(msg[r & 3], vld1q_u32(&K[4 * r]));
+            if (r < 12)
+                msg[r & 3] = vsha256su1q_u32(vsha256su0q_u32(msg[r & 3], msg[(r + 1) & 3]),
+                                             msg[(r + 2) & 3], msg[(r + 3) & 3]);
+            uint32x4_t abcd = state0;
+            state0 = vsha256hq_u32(state0, state1, wk);
+            state1 = vsha256h2q_u32(state1, abcd, wk);
+        }
+
+        state0 = vaddq_u32(state0, abcd_save);
+        state1 = vaddq_u32(state1, efgh_save);
+        data += TP_SHA256_BLOCK_LENGTH;
+    }
+
+    vst1q_u32(&state[0], state0);
+    vst1q_u32(&state[4], state1);
+}
+
+TP_ARM_SHA2
+static void rounds_kw_armv8(uint32_t state[8], const uint32_t kw[64]) {
+    uint32x4_t state0 = vld1q_u32(&state[0]);
+    uint32x4_t state1 = vld1q_u32(&state[4]);
+    uint32x4_t abcd_save = state0;
+    uint32x4_t efgh_save = state1;
+
+    // No sha256su0/su1: the schedule is already folded into kw
+    for (int r = 0; r < 16; r++) {
+        uint32x4_t wk = vld1q_u32(&kw[4 * r]);
+        uint32x4_t abcd = state0;
+        state0 = vsha256hq_u32(state0, state1, wk);
+        state1 = vsha256h2q_u32(state1, abcd, wk);
+    }
+
+    vst1q_u32(&state[0], vaddq_u32(state0, abcd_save));
+    vst1q_u32(&state[4], vaddq_u32(state1, efgh_save));
+}
+
+static int cpu_has_armv8_sha2(void) {
+#if defined(__APPLE__)
+    return 1;  // Every Apple arm64 core implements FEAT_SHA256
+#elif defined(__linux__) && defined(HWCAP_SHA2)
+    return (getauxval(AT_HWCAP) & HWCAP_SHA2) != 0;
+#else
+    return 0;
+#endif
+}
+#endif
+
+static void (*transform_impl)(uint32_t *, const uint8_t *, size_t) = transform_generic;
+static void (*rounds_kw_impl)(uint32_t *, const uint32_t *) = rounds_kw_generic;
+static const char *impl_name = "generic";
+static int have_shani = 0;
+static int have_avx2 = 0;
+static int have_sse2 = 0;
+
+// Runs when the extension is loaded
+__attribute__((constructor))
+static void select_transform(void) {
+#ifdef TP_HAVE_X86
+    __builtin_cpu_init();
+    have_avx2 = __builtin_cpu_supports("avx2");
+    have_sse2 = __builtin_cpu_supports("sse2");
+    if (cpu_has_shani()) {
+        have_shani = 1;
+        transform_impl = transform_shani;
+        rounds_kw_impl = rounds_kw_shani;
+        impl_name = "sha-ni";
+    }
+#endif
+#ifdef TP_HAVE_ARM64
+    if (cpu_has_armv8_sha2()) {
+        transform_impl = transform_armv8;
+        rounds_kw_impl = rounds_kw_armv8;
+        impl_name = "armv8-sha2";
+    }
+#endif
+}
+
+void tp_sha256_transform_2way(uint32_t s0[8], uint32_t s1[8], const uint8_t *d0, const uint8_t *d1, size_t nblocks) {
+#ifdef TP_HAVE_X86
+    if (have_shani) {
+        transform_shani_2way(s0, s1, d0, d1, nblocks);
+        return;
+    }
+#endif
+    transform_impl(s0, d0, nblocks);
+    transform_impl(s1, d1, nblocks);
+}
+
+void tp_sha256_transform_8way(uint32_t state[8][8], const uint8_t *const data[8], size_t nblocks) {
+#ifdef TP_HAVE_X86
+    if (have_avx2) {
+        transform_8way_avx2(state, data, nblocks);
+        return;
+    }
+#endif
+    for (int l = 0; l < 8; l++)
+        transform_impl(state[l], data[l], nblocks);
+}
+
+void tp_sha256_transform_4way(uint32_t state[4][8], const uint8_t *const data[4], size_t nblocks) {
+#ifdef TP_HAVE_X86
+    if (have_sse2) {
+        transform_4way_sse2(state, data, nblocks);
+        return;
+    }
+#endif
+    for (int l = 0; l < 4; l++)
+        transform_impl(state[l], data[l], nblocks);
+}
+
+void tp_sha256_schedule_kw(const uint8_t block[TP_SHA256_BLOCK_LENGTH], uint32_t kw[64]) {
+    uint32_t w[64];
+    for (int i = 0; i < 16; i++)
+        w[i] = load_be32(block + 4 * i);
+    for (int i = 16; i < 64; i++)
+        w[i] = SSIG1(w[i - 2]) + w[i - 7] + SSIG0(w[i - 15]) + w[i - 16];
+    for (int i = 0; i < 64; i++)
+        kw[i] = K[i] + w[i];
+}
+
+void tp_sha256_rounds_kw(uint32_t state[8], const uint32_t kw[64]) {
+    rounds_kw_impl(state, kw);
+}
+
+void tp_sha256_rounds_kw_2way(uint32_t s0[8], uint32_t s1[8], const uint32_t kw[64]) {
+#ifdef TP_HAVE_X86
+    if (have_shani) {
+        rounds_kw_shani_2way(s0, s1, kw);
+        return;
+    }
+#endif
+    rounds_kw_impl(s0, kw);
+    rounds_kw_impl(s1, kw);
+}
+
+void tp_sha256_rounds_kw_4way(uint32_t state[4][8], const uint32_t kw[64]) {
+#ifdef TP_HAVE_X86
+    if (have_sse2) {
+        rounds_kw_4way_sse2(state, kw);
+        return;
+    }
+#endif
+    for (int l = 0; l < 4; l++)
+        rounds_kw_impl(state[l], kw);
+}
+
+void tp_sha256_rounds_kw_8way(uint32_t state[8][8], const uint32_t kw[64]) {
+#ifdef TP_HAVE_X86
+    if (have_avx2) {
+        rounds_kw_8way_avx2(state, kw);
+        return;
+    }
+#endif
+    for (int l = 0; l < 8; l++)
+        rounds_kw_impl(state[l], kw);
+}
+
+int tp_sha256_preferred_lanes(void) {
+    if (have_shani)
+        return 2;
+    if (have_avx2)
+        return 8;
+    if (have_sse2)
+        return 4;
+    return 1;
+}
+
+int tp_sha256_has_4way(void) {
+    return have_sse2;
+}
+
+void tp_sha256_transform(uint32_t state[8], const uint8_t *data, size_t nblocks) {
+    transform_impl(state, data, nblocks);
+}
+
+const char *tp_sha256_impl(void) {
+    return impl_name;
+}
+
+void tp_sha256_init(tp_sha256_ctx *ctx) {
+    memcpy(ctx->state, H0, sizeof(H0));
+    ctx->buflen = 0;
+    ctx->total = 0;
+}
+
+void tp_sha256_update(tp_sha256_ctx *ctx, const uint8_t *data, size_t len) {
+    ctx->total += len;
+
+    if (ctx->buflen) {
+        size_t fill = TP_SHA256_BLOCK_LENGTH - ctx->buflen;
+        if (len < fill) {
+            memcpy(ctx->buf + ctx->buflen, data, len);
+            ctx->buflen += len;
+            return;
+        }
+        memcpy(ctx->buf + ctx->buflen, data, fill);
+        transform_impl(ctx->state, ctx->buf, 1);
+        data += fill;
+        len -= fill;
+        ctx->buflen = 0;
+    }
+
+    if (len >= TP_SHA256_BLOCK_LENGTH) {
+        size_t nblocks = len / TP_SHA256_BLOCK_LENGTH;
+        transform_impl(ctx->state, data, nblocks);
+        data += nblocks * TP_SHA256_BLOCK_LENGTH;
+        len -= nblocks * TP_SHA256_BLOCK_LENGTH;
+    }
+
+    if (len) {
+        memcpy(ctx->buf, data, len);
+        ctx->buflen = len;
+    }
+}
+
+/*
+ * Block headers are hashed over and over at the same length while mining, and
+ * for the usual header sizes the last block is pure padding: an optional 0x80
+ * byte, zeros and the bit length. Its schedule depends only on (lead, bits), so
+ * K + W for it is computed once and reused while the length stays the same.
+ */
+typedef struct {
+    uint64_t bits;
+    int lead;
+    int valid;
+    uint32_t kw[64];
+} padding_schedule;
+
+static __thread padding_schedule pad_cache;
+
+static const uint32_t *padding_kw(uint64_t bits, int lead) {
+    padding_schedule *p = &pad_cache;
+    if (p->valid && p->bits == bits && p->lead == lead)
+        return p->kw;
+
+    uint32_t w[64] = {0};
+    w[0] = lead ? 0x80000000u : 0;
+    w[14] = (uint32_t)(bits >> 32);
+    w[15] = (uint32_t)bits;
+    for (int i = 16; i < 64; i++)
+        w[i] = SSIG1(w[i - 2]) + w[i - 7] + SSIG0(w[i - 15]) + w[i - 16];
+    for (int i = 0; i < 64; i++)
+        p->kw[i] = K[i] + w[i];
+
+    p->bits = bits;
+    p->lead = lead;
+    p->valid = 1;
+    return p->kw;
+}
+
+void tp_sha256_final_words(tp_sha256_ctx *ctx, uint32_t out[8]) {
+    uint64_t bits = ctx->total * 8;
+    size_t n = ctx->buflen;
+
+    if (n == 0) {
+        // Message ended on a block boundary: the final block is 0x80 + length
+        rounds_kw_impl(ctx->state, padding_kw(bits, 1));
+        goto done;
+    }
+
+    ctx->buf[n++] = 0x80;
+    if (n > 56) {
+        memset(ctx->buf + n, 0, TP_SHA256_BLOCK_LENGTH - n);
+        transform_impl(ctx->state, ctx->buf, 1);
+        // Final block holds nothing but zeros and the length
+        rounds_kw_impl(ctx->state, padding_kw(bits, 0));
+        goto done;
+    }
+    memset(ctx->buf + n, 0, 56 - n);
+    store_be32(ctx->buf + 56, (uint32_t)(bits >> 32));
+    store_be32(ctx->buf + 60, (uint32_t)bits);
+    transform_impl(ctx->state, ctx->buf, 1);
+
+done:
+    memcpy(out, ctx->state, sizeof(ctx->state));
+}
+
+void tp_sha256_words_to_bytes(const uint32_t words[8], uint8_t out[TP_SHA256_DIGEST_LENGTH]) {
+    for (int i = 0; i < 8; i++)
+        store_be32(out + 4 * i, words[i]);
+}
+
+void tp_sha256_final(tp_sha256_ctx *ctx, uint8_t out[TP_SHA256_DIGEST_LENGTH]) {
+    uint32_t words[8];
+    tp_sha256_final_words(ctx, words);
+    tp_sha256_words_to_bytes(words, out);
+}
+
+void tp_sha256(const uint8_t *data, size_t len, uint8_t out[TP_SHA256_DIGEST_LENGTH]) {
+    tp_sha256_ctx ctx;
+    tp_sha256_init(&ctx);
+    tp_sha256_update(&ctx, data, len);
+    tp_sha256_final(&ctx, out);
+}
+
+void tp_hex_encode(const uint8_t *in, size_t len, char *out) {
+    static const char digits[] = "0123456789abcdef";
+    for (size_t i = 0; i < len; i++) {
+        out[2 * i] = digits[in[i] >> 4];
+        out[2 * i + 1] = digits[in[i] & 0x0F];
+    }
+}
@@ -0,0 +1,60 @@
+#ifndef TWOPIDGEONS_SHA256_H
+#define TWOPIDGEONS_SHA256_H
+
+#include <stddef.h>
+#include <stdint.h>
+
+#define TP_SHA256_DIGEST_LENGTH 32
+#define TP_SHA256_BLOCK_LENGTH 64
+
+typedef struct {
+    uint32_t state[8];
+    uint8_t buf[TP_SHA256_BLOCK_LENGTH];
+    size_t buflen;
+    uint64_t total;
+} tp_sha256_ctx;
+
+/* Compresses `nblocks` 64-byte blocks into `state` (SHA-NI when available). */
+void tp_sha256_transform(uint32_t state[8], const uint8_t *data, size_t nblocks);
+
+void tp_sha256_init(tp_sha256_ctx *ctx);
+void tp_sha256_update(tp_sha256_ctx *ctx, const uint8_t *data, size_t len);
+void tp_sha256_final(tp_sha256_ctx *ctx, uint8_t out[TP_SHA256_DIGEST_LENGTH]);
+/* Same as tp_sha256_final but leaves the digest as 8 native words (no byte swap). */
+void tp_sha256_final_words(tp_sha256_ctx *ctx, uint32_t out[8]);
+void tp_sha256_words_to_bytes(const uint32_t words[8], uint8_t out[TP_SHA256_DIGEST_LENGTH]);
+
+/*
+ * Multi-lane compression of independent messages (same block count per lane).
+ * 2-way interleaves SHA-NI to hide sha256rnds2 latency; 4-way and 8-way use
+ * SSE2 and AVX2 lanes. All fall back to the single-lane function when the
+ * CPU lacks the feature.
+ */
+void tp_sha256_transform_2way(uint32_t s0[8], uint32_t s1[8], const uint8_t *d0, const uint8_t *d1, size_t nblocks);
+void tp_sha256_transform_4way(uint32_t state[4][8], const uint8_t *const data[4], size_t nblocks);
+void tp_sha256_transform_8way(uint32_t state[8][8], const uint8_t *const data[8], size_t nblocks);
+
+/*
+ * Blocks that are the same for every message (e.g. the padding block of a
+ * fixed-length input): tp_sha256_schedule_kw expands one into K + W once, and
+ * the rounds_kw functions then compress it without a message schedule.
+ */
+void tp_sha256_schedule_kw(const uint8_t block[TP_SHA256_BLOCK_LENGTH], uint32_t kw[64]);
+void tp_sha256_rounds_kw(uint32_t state[8], const uint32_t kw[64]);
+void tp_sha256_rounds_kw_2way(uint32_t s0[8], uint32_t s1[8], const uint32_t kw[64]);
+void tp_sha256_rounds_kw_4way(uint32_t state[4][8], const uint32_t kw[64]);
+void tp_sha256_rounds_kw_8way(uint32_t state[8][8], const uint32_t kw[64]);
+
+/* Lanes that give the best throughput on this CPU: 2 (SHA-NI), 8 (AVX2), 4 (SSE2) or 1. */
+int tp_sha256_preferred_lanes(void);
+/* True if tp_sha256_transform_4way runs vectorized (used for 8-way tails). */
+int tp_sha256_has_4way(void);
+
+/* One-shot helpers */
+void tp_sha256(const uint8_t *data, size_t len, uint8_t out[TP_SHA256_DIGEST_LENGTH]);
+void tp_hex_encode(const uint8_t *in, size_t len, char *out);
+
+/* Name of the compression function selected at load time ("sha-ni", "armv8-sha2" or "generic"). */
+const char *tp_sha256_impl(void);
+
+#endif
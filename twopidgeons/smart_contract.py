@@ -3,6 +3,11 @@ import operator
 import functools
 import struct
 
+try:
+    from . import vm_module
+except ImportError:
+    vm_module = None
+
 # OpCodes mapping for C VM
 OP_HALT = 0x00
 OP_PUSH = 0x01
@@ -18,10 +23,14 @@ OP_AND  = 0x30
 OP_OR   = 0x31
 OP_NOT  = 0x32
 
+# OP_PUSH and its operand (native-order double, unpadded), packed in one call
+PUSH_FMT = struct.Struct('=Bd')
+
 class Compiler(ast.NodeVisitor):
     def __init__(self):
         self.bytecode = bytearray()
         self.variables = []
+        self._var_idx = {}
 
     def compile(self, expr: str):
         tree = ast.parse(expr, mode='eval')
@@ -30,22 +39,25 @@ class Compiler(ast.NodeVisitor):
         return bytes(self.bytecode), self.variables
 
     def visit_Constant(self, node):
-        self.bytecode.append(OP_PUSH)
-        # Pack as double (8 bytes)
+        # Opcode followed by the value as a double (8 bytes)
         try:
             val = float(node.value)
-            self.bytecode.extend(struct.pack("d", val))
+            self.bytecode += PUSH_FMT.pack(OP_PUSH, val)
         except ValueError:
             # Handle strings or other types? VM only supports doubles for now.
             # For simplicity, we treat strings as 0.0 or raise error
             raise ValueError(f"Only numeric constants supported in C VM. Got: {node.value}")
 
     def visit_Name(self, node):
-        if node.id not in self.variables:
+        idx = self._var_idx.get(node.id)
+        if idx is None:
+            idx = len(self.variables)
+            if idx > 255:
+                # OP_LOAD's operand is a single byte
+                raise ValueError("Too many variables for C VM (max 256)")
+            self._var_idx[node.id] = idx
             self.variables.append(node.id)
-        idx = self.variables.index(node.id)
-        self.bytecode.append(OP_LOAD)
-        self.bytecode.append(idx)
+        self.bytecode += bytes((OP_LOAD, idx))
 
     def visit_BinOp(self, node):
         self.visit(node.left)
@@ -76,10 +88,61 @@ class Compiler(ast.NodeVisitor):
             if isinstance(node.op, ast.And): self.bytecode.append(OP_AND)
             elif isinstance(node.op, ast.Or): self.bytecode.append(OP_OR)
 
+# Distinct condition scripts whose compiled forms are kept
+CONTRACT_CACHE_SIZE = 1024
+
+# Expressions a condition may contain; anything else (calls, attributes,
+# subscripts, lambdas, comprehensions...) is rejected before compiling
+_ALLOWED_EXPRS = (ast.Constant, ast.Name, ast.BinOp, ast.UnaryOp, ast.Compare, ast.BoolOp)
+
+@functools.lru_cache(maxsize=CONTRACT_CACHE_SIZE)
+def _compile_script(condition_script: str):
+    """
+    (bytecode, variables) for the C VM, or None if the script needs Python
+    (no C VM, or non-numeric constants and syntax the VM compiler rejects).
+    """
+    if vm_module is None:
+        return None
+    try:
+        bytecode, variables = Compiler().compile(condition_script)
+        return bytecode, tuple(variables)
+    except Exception:
+        return None
+
+class _EagerBoolOps(ast.NodeTransformer):
+    """
+    Rewrites `a and b` as `(not not a) & (not not b)` (`|` for `or`):
+    conditions evaluate every operand and yield a bool, so an error in any
+    operand fails the condition.
+    """
+
+    def visit_BoolOp(self, node):
+        self.generic_visit(node)
+        op = ast.BitAnd() if isinstance(node.op, ast.And) else ast.BitOr()
+        truth = [ast.UnaryOp(ast.Not(), ast.UnaryOp(ast.Not(), v)) for v in node.values]
+        result = truth[0]
+        for value in truth[1:]:
+            result = ast.BinOp(result, op, value)
+        return ast.copy_location(result, node)
+
+class _ContextScope:
+    """Name lookups of compiled conditions; a missing or None variable is an error."""
+    __slots__ = ('context',)
+
+    def __init__(self, context: dict):
+        self.context = context
+
+    def __getitem__(self, name):
+        val = self.context.get(name)
+        if val is None:
+            raise ValueError(f"Variable '{name}' not found in context")
+        return val
+
 class SmartContract:
     """
-    A safe, lightweight interpreter for validating transaction conditions.
-    Supports basic arithmetic, comparisons, and logical operators.
+    A safe, lightweight evaluator for transaction conditions: the C VM for
+    numeric scripts, otherwise Python bytecode compiled from an allow-listed
+    AST. Supports basic arithmetic, comparisons, and logical operators.
     """
     
     def __init__(self):
@@ -99,6 +162,27 @@ class SmartContract:
             ast.GtE: operator.ge,
             # Logical operators are handled differently in AST but we map them for concept
         }
+        # Compiled against this engine's operators, so cached per instance
+        # (the C VM program is cached process-wide)
+        self._python_code = functools.lru_cache(maxsize=CONTRACT_CACHE_SIZE)(self._compile_python)
+
+    def _compile_python(self, condition_script: str):
+        """
+        Checks a script against the allowed syntax and operators and compiles
+        it to a code object. Raises ValueError (or SyntaxError) otherwise.
+        """
+        tree = ast.parse(condition_script, mode='eval')
+        for node in ast.walk(tree.body):
+            if isinstance(node, ast.expr) and not isinstance(node, _ALLOWED_EXPRS):
+                raise ValueError(f"Syntax not supported: {type(node)}")
+            if isinstance(node, (ast.BinOp, ast.UnaryOp)) and type(node.op) not in self.allowed_operators:
+                raise ValueError(f"Operator {type(node.op)} not supported")
+            if isinstance(node, ast.Compare):
+                for op in node.ops:
+                    if type(op) not in self.allowed_operators:
+                        raise ValueError(f"Comparator {type(op)} not supported")
+        tree = ast.fix_missing_locations(_EagerBoolOps().visit(tree))
+        return compile(tree, '<smart-contract>', 'eval')
 
     def validate(self, condition_script: str, context: dict) -> bool:
         """
@@ -108,75 +192,26 @@ class SmartContract:
         if not condition_script:
             return True
             
-        # Try to use C VM first
-        try:
-            from . import vm_module
-            compiler = Compiler()
-            bytecode, vars_needed = compiler.compile(condition_script)
-            
-            # Prepare values list
-            values = []
-            for var_name in vars_needed:
-                val = context.get(var_name)
-                if val is None: raise ValueError(f"Missing var {var_name}")
-                # Convert strings to numbers if possible, or fail
-                # The VM currently only supports doubles.
-                # If the script uses strings (recipient == 'bob'), the compiler will fail
-                # and we fall back to Python interpreter.
-                values.append(float(val))
-                
-            return vm_module.execute(bytecode, values)
-            
-        except (ImportError, ValueError, Exception) as e:
-            # Fallback to Python interpreter if C VM fails (e.g. string operations)
-            # print(f"VM fallback to Python: {e}")
-            pass
+        # Numeric scripts run on the C VM; whether a script is one was decided
+        # when it was first compiled
+        program = _compile_script(condition_script)
+        if program is not None:
+            bytecode, vars_needed = program
+            try:
+                # The VM only supports doubles: a missing or non-numeric
+                # value (e.g. a string) falls back to compiled Python
+                values = [float(context[var_name]) for var_name in vars_needed]
+            except (KeyError, TypeError, ValueError):
+                values = None
+            if values is not None:
+                try:
+                    return vm_module.execute(bytecode, values)
+                except Exception:
+                    pass  # e.g. division by zero: let Python report it
 
         try:
-            tree = ast.parse(condition_script, mode='eval')
-            return bool(self._eval_node(tree.body, context))
+            code = self._python_code(condition_script)
+            return bool(eval(code, {'__builtins__': {}}, _ContextScope(context)))
         except Exception as e:
             print(f"Smart Contract Execution Error: {e}")
             return False
-
-    def _eval_node(self, node, context):
-        if isinstance(node, ast.Constant): # Python 3.8+
-            return node.value
-        elif isinstance(node, ast.Num): # Python < 3.8
-            return node.n
-        elif isinstance(node, ast.Str): # Python < 3.8
-            return node.s
-        elif isinstance(node, ast.Name):
-            val = context.get(node.id)
-            if val is None:
-                raise ValueError(f"Variable '{node.id}' not found in context")
-            return val
-        elif isinstance(node, ast.BinOp):
-            op = self.allowed_operators.get(type(node.op))
-            if not op:
-                raise ValueError(f"Operator {type(node.op)} not supported")
-            return op(self._eval_node(node.left, context), self._eval_node(node.right, context))
-        elif isinstance(node, ast.Compare):
-            left = self._eval_node(node.left, context)
-            for op, comparator in zip(node.ops, node.comparators):
-                op_func = self.allowed_operators.get(type(op))
-                if not op_func:
-                    raise ValueError(f"Comparator {type(op)} not supported")
-                right = self._eval_node(comparator, context)
-                if not op_func(left, right):
-                    return False
-                left = right
-            return True
-        elif isinstance(node, ast.BoolOp):
-            values = [self._eval_node(v, context) for v in node.values]
-            if isinstance(node.op, ast.And):
-                return all(values)
-            elif isinstance(node.op, ast.Or):
-                return any(values)
-        elif isinstance(node, ast.UnaryOp):
-            op = self.allowed_operators.get(type(node.op))
-            if not op:
-                raise ValueError(f"Unary operator {type(node.op)} not supported")
-            return op(self._eval_node(node.operand, context))
-            
-        raise ValueError(f"Syntax not supported: {type(node)}")
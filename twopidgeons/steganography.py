@@ -1,4 +1,6 @@
 from PIL import Image
+from typing import BinaryIO, Union
+import io
 import struct
 
 class Steganography:
@@ -10,10 +12,45 @@ class Steganography:
     
     TAG_IMAGE_DESCRIPTION = 0x010e
 
+    @staticmethod
+    def _replace_jpeg_exif(jpeg: bytes, exif_payload: bytes) -> bytes:
+        """
+        Returns the JPEG with its APP1 Exif segment replaced by `exif_payload`
+        ("Exif\0\0" + TIFF data), leaving the compressed image data untouched.
+        Raises ValueError if the file or payload can't be handled this way.
+        """
+        if jpeg[:2] != b'\xff\xd8' or len(exif_payload) > 0xffff - 2:
+            raise ValueError("Not a JPEG, or EXIF too large for one segment")
+        kept = []
+        insert_at = 0
+        pos = 2
+        # Header segments up to Start Of Scan; everything from SOS on is copied as is
+        while True:
+            if pos + 4 > len(jpeg) or jpeg[pos] != 0xff:
+                raise ValueError("Malformed JPEG header")
+            marker = jpeg[pos + 1]
+            if marker == 0xff:
+                pos += 1  # Fill byte before a marker
+                continue
+            if marker == 0xda:
+                break
+            length = struct.unpack_from('>H', jpeg, pos + 2)[0]
+            segment = jpeg[pos:pos + 2 + length]
+            if not (marker == 0xe1 and segment[4:10] == b'Exif\x00\x00'):
+                kept.append(segment)
+                if marker == 0xe0 and insert_at == len(kept) - 1:
+                    insert_at = len(kept)  # JFIF APP0 must stay first
+            pos += 2 + length
+        app1 = b'\xff\xe1' + struct.pack('>H', len(exif_payload) + 2) + exif_payload
+        kept.insert(insert_at, app1)
+        return b'\xff\xd8' + b''.join(kept) + jpeg[pos:]
+
     @staticmethod
     def embed(image_path: str, data: str, format: str = 'JPEG', quality: int = 85) -> bool:
         """
-        Embeds a string into the image metadata.
+        Embeds a string into the image metadata. A JPEG kept as JPEG only has
+        its EXIF segment rewritten (no decode or re-encode, `quality` unused);
+        other images are re-encoded in `format`.
         """
         try:
             img = Image.open(image_path)
@@ -21,6 +58,19 @@ class Steganography:
             
             # Embed data into ImageDescription tag
             exif[Steganography.TAG_IMAGE_DESCRIPTION] = data
+
+            if img.format == 'JPEG' and format.upper() == 'JPEG':
+                with open(image_path, 'rb') as f:
+                    original = f.read()
+                img.close()
+                try:
+                    updated = Steganography._replace_jpeg_exif(original, exif.tobytes())
+                except ValueError:
+                    img = Image.open(io.BytesIO(original))  # Re-encode below
+                else:
+                    with open(image_path, 'wb') as f:
+                        f.write(updated)
+                    return True
             
             # Save the image with the new EXIF data
             # Use optimize=True for better compression
@@ -31,12 +81,27 @@ class Steganography:
             return False
 
     @staticmethod
-    def extract(image_path: str) -> str:
+    def embed_to_bytes(img: Image.Image, data: str, format: str = 'JPEG', quality: int = 85) -> bytes:
+        """
+        Encodes an already opened image with the string in its metadata and
+        returns the file bytes, so compression and embedding cost one encode.
+        """
+        exif = Image.Exif()
+        exif[Steganography.TAG_IMAGE_DESCRIPTION] = data
+        out = io.BytesIO()
+        img.save(out, exif=exif, format=format, quality=quality, optimize=True)
+        return out.getvalue()
+
+    @staticmethod
+    def extract(image: Union[str, bytes, BinaryIO]) -> str:
         """
         Extracts the hidden string from the image metadata.
+        Accepts a file path, the raw image bytes or a binary file object.
         """
         try:
-            img = Image.open(image_path)
+            if isinstance(image, (bytes, bytearray, memoryview)):
+                image = io.BytesIO(image)
+            img = Image.open(image)
             exif = img.getexif()
             
             data = exif.get(Steganography.TAG_IMAGE_DESCRIPTION)
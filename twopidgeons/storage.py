@@ -1,8 +1,50 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional
+from collections import defaultdict
+from typing import List, Dict, Any, Optional, Tuple
+import hashlib
+import mmap
+import os
 import sqlite3
+import struct
 import json
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _dumps(obj: Any) -> bytes:
+    """Compact JSON bytes (orjson when available)."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj)
+        except TypeError:
+            pass  # e.g. integers wider than 64 bits
+    return json.dumps(obj, separators=(',', ':')).encode()
+
+
+def _loads(data: bytes) -> Any:
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(data)
+
+class RawTransactions:
+    """A block's serialized transaction rows, parsed only when first read."""
+    __slots__ = ('rows',)
+
+    def __init__(self, rows: List[Any]):
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def load(self) -> List[Dict[str, Any]]:
+        return [_loads(row) for row in self.rows]
+
 class StorageBackend(ABC):
     """Abstract base class for blockchain storage backends."""
 
@@ -16,9 +58,29 @@ class StorageBackend(ABC):
         """Save a block and its transactions."""
         pass
 
+    def save_blocks(self, blocks: List[Tuple[Dict[str, Any], List[Dict[str, Any]]]]):
+        """
+        Save several (block_data, transactions) pairs in order. Backends
+        override this to write them in a single transaction/append.
+        """
+        for block_data, transactions in blocks:
+            self.save_block(block_data, transactions)
+
+    def replace_blocks(self, blocks: List[Tuple[Dict[str, Any], List[Dict[str, Any]]]]):
+        """
+        Replace the stored chain with the given (block_data, transactions)
+        pairs. Backends override this so a failure part-way through leaves
+        the previous chain in place rather than an empty store.
+        """
+        self.clear_chain()
+        self.save_blocks(blocks)
+
     @abstractmethod
     def load_chain(self) -> List[Dict[str, Any]]:
-        """Load the entire chain from storage."""
+        """
+        Load the entire chain from storage. A block's 'transactions' may be
+        a RawTransactions, parsed when the Block first reads it.
+        """
         pass
 
     @abstractmethod
@@ -28,20 +90,49 @@ class StorageBackend(ABC):
 
     @abstractmethod
     def find_transaction_by_hash(self, image_hash: str) -> Optional[Dict[str, Any]]:
-        """Find a transaction by image hash."""
+        """Find a transaction by image hash, falling back to source hash."""
         pass
 
+    def flush(self):
+        """Make every saved block durable (for backends that group commits)."""
+        pass
+
+    def chain_verified(self) -> bool:
+        """
+        True if the data returned by the last load_chain matched a checksum
+        recorded at save time, so the stored block hashes can be trusted
+        without recomputing them.
+        """
+        return False
+
 
 class SQLiteBackend(StorageBackend):
     """Storage backend using SQLite."""
 
-    def __init__(self, db_path: str):
+    # Fixed SQL text so sqlite3's per-connection statement cache reuses the
+    # compiled statements instead of re-parsing them on every lookup
+    FIND_BY_IMAGE_HASH = "SELECT data FROM transactions WHERE image_hash = ? LIMIT 1"
+    FIND_BY_SOURCE_HASH = "SELECT data FROM transactions WHERE source_hash = ? LIMIT 1"
+
+    def __init__(self, db_path: str, commit_every: int = 1):
         self.db_path = db_path
+        # Blocks per commit: above 1, a crash can lose up to commit_every - 1
+        # of the most recent blocks unless flush() is called
+        self.commit_every = max(1, commit_every)
+        self._uncommitted = 0
         self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
         self.initialize()
 
     def initialize(self):
         cursor = self.conn.cursor()
+        # WAL makes a commit a sequential append instead of a rollback-journal
+        # rewrite; NORMAL only syncs at checkpoints (a crash may lose the last
+        # commits but never corrupts the database)
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        # Temp b-trees in RAM and a 64 MiB page cache (negative = KiB)
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA cache_size=-65536")
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS blocks (
                 idx INTEGER PRIMARY KEY,
@@ -69,35 +160,89 @@ class SQLiteBackend(StorageBackend):
                 FOREIGN KEY(block_idx) REFERENCES blocks(idx)
             )
         """)
+        # find_transaction_by_hash looks up by image_hash, then source_hash;
+        # without indexes every lookup scans the whole transactions table
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_transactions_image_hash ON transactions(image_hash)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_transactions_source_hash ON transactions(source_hash)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_transactions_block ON transactions(block_idx)")
         self.conn.commit()
 
-    def save_block(self, block_data: Dict[str, Any], transactions: List[Dict[str, Any]]):
-        cursor = self.conn.cursor()
+    @staticmethod
+    def _insert_block(cursor, block_data: Dict[str, Any], transactions: List[Dict[str, Any]]):
         cursor.execute("INSERT INTO blocks (idx, timestamp, previous_hash, hash, nonce, merkle_root) VALUES (?, ?, ?, ?, ?, ?)",
                        (block_data['index'], block_data['timestamp'], block_data['previous_hash'], 
                         block_data['hash'], block_data['nonce'], block_data['merkle_root']))
-        
-        for tx in transactions:
-            tx_json = json.dumps(tx)
-            img_hash = tx.get('image_hash')
-            src_hash = tx.get('source_hash')
-            cursor.execute("INSERT INTO transactions (block_idx, image_hash, source_hash, data) VALUES (?, ?, ?, ?)",
-                           (block_data['index'], img_hash, src_hash, tx_json))
+
+        block_idx = block_data['index']
+        cursor.executemany("INSERT INTO transactions (block_idx, image_hash, source_hash, data) VALUES (?, ?, ?, ?)",
+                           [(block_idx, tx.get('image_hash'), tx.get('source_hash'), _dumps(tx).decode())
+                            for tx in transactions])
+
+    def save_block(self, block_data: Dict[str, Any], transactions: List[Dict[str, Any]]):
+        cursor = self.conn.cursor()
+        if not self.conn.in_transaction:
+            cursor.execute("BEGIN")
+        # The savepoint undoes a half-inserted block without dropping the
+        # earlier blocks still waiting for the grouped commit
+        cursor.execute("SAVEPOINT save_block")
+        try:
+            self._insert_block(cursor, block_data, transactions)
+        except Exception:
+            cursor.execute("ROLLBACK TO save_block")
+            cursor.execute("RELEASE save_block")
+            if not self._uncommitted:
+                self.conn.rollback()
+            raise
+        cursor.execute("RELEASE save_block")
+
+        self._uncommitted += 1
+        if self._uncommitted >= self.commit_every:
+            self.flush()
+
+    def flush(self):
         self.conn.commit()
+        self._uncommitted = 0
+
+    def save_blocks(self, blocks: List[Tuple[Dict[str, Any], List[Dict[str, Any]]]]):
+        self.flush()
+        # One write transaction (and one sync) for the whole batch
+        with self.conn:
+            cursor = self.conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            for block_data, transactions in blocks:
+                self._insert_block(cursor, block_data, transactions)
+
+    def replace_blocks(self, blocks: List[Tuple[Dict[str, Any], List[Dict[str, Any]]]]):
+        self.flush()
+        # The deletes and inserts commit together, or not at all
+        with self.conn:
+            cursor = self.conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute("DELETE FROM transactions")
+            cursor.execute("DELETE FROM blocks")
+            for block_data, transactions in blocks:
+                self._insert_block(cursor, block_data, transactions)
 
     def load_chain(self) -> List[Dict[str, Any]]:
         try:
             cursor = self.conn.cursor()
             cursor.execute("SELECT idx, timestamp, previous_hash, hash, nonce, merkle_root FROM blocks ORDER BY idx ASC")
             rows = cursor.fetchall()
+
+            # All transactions in one query (insertion order within a block)
+            # instead of one query per block
+            by_block = defaultdict(list)
+            cursor.execute("SELECT block_idx, data FROM transactions ORDER BY block_idx, id")
+            for block_idx, data in cursor:
+                by_block[block_idx].append(data)
+
             chain_data = []
             for row in rows:
                 idx, timestamp, previous_hash, block_hash, nonce, merkle_root = row
-                
-                cursor.execute("SELECT data FROM transactions WHERE block_idx = ?", (idx,))
-                tx_rows = cursor.fetchall()
-                transactions = [json.loads(r[0]) for r in tx_rows]
-                
+                # Parsed on first access: loading and validating the chain
+                # only needs the stored headers
+                transactions = RawTransactions(by_block.get(idx, []))
+
                 block_data = {
                     'index': idx,
                     'timestamp': timestamp,
@@ -117,14 +262,14 @@ class SQLiteBackend(StorageBackend):
         cursor = self.conn.cursor()
         cursor.execute("DELETE FROM transactions")
         cursor.execute("DELETE FROM blocks")
-        self.conn.commit()
+        self.flush()
 
     def find_transaction_by_hash(self, image_hash: str) -> Optional[Dict[str, Any]]:
         cursor = self.conn.cursor()
-        cursor.execute("SELECT data FROM transactions WHERE image_hash = ?", (image_hash,))
-        row = cursor.fetchone()
-        if row:
-            return json.loads(row[0])
+        for query in (self.FIND_BY_IMAGE_HASH, self.FIND_BY_SOURCE_HASH):
+            row = cursor.execute(query, (image_hash,)).fetchone()
+            if row:
+                return _loads(row[0])
         return None
 
 
@@ -134,6 +279,7 @@ class InMemoryBackend(StorageBackend):
     def __init__(self):
         self.blocks = []
         self.transactions_map = {} # Map image_hash -> transaction
+        self.source_map = {} # Map source_hash -> transaction
 
     def initialize(self):
         pass
@@ -149,6 +295,8 @@ class InMemoryBackend(StorageBackend):
         for tx in transactions:
             if 'image_hash' in tx:
                 self.transactions_map[tx['image_hash']] = tx
+            if 'source_hash' in tx:
+                self.source_map[tx['source_hash']] = tx
 
     def load_chain(self) -> List[Dict[str, Any]]:
         return self.blocks
@@ -156,6 +304,241 @@ class InMemoryBackend(StorageBackend):
     def clear_chain(self):
         self.blocks = []
         self.transactions_map = {}
+        self.source_map = {}
+
+    def find_transaction_by_hash(self, image_hash: str) -> Optional[Dict[str, Any]]:
+        tx = self.transactions_map.get(image_hash)
+        return tx if tx is not None else self.source_map.get(image_hash)
+
+
+class LogBackend(StorageBackend):
+    """
+    Append-only binary log (one record per block, never rewritten).
+
+    Record layout: u32 body length, u8 kind, body. A binary body is
+    BLOCK_HEADER followed by the transactions as a JSON blob. Blocks whose
+    header fields don't fit the fixed layout (e.g. the genesis block's
+    previous_hash "0") are stored as a single JSON document instead, so
+    every field round-trips exactly and stored hashes keep validating.
+    """
+
+    RECORD_PREFIX = struct.Struct(">IB")
+    # index, timestamp, nonce, hash, previous_hash, merkle_root
+    BLOCK_HEADER = struct.Struct(">QdQ32s32s32s")
+    KIND_BINARY = 0
+    KIND_JSON = 1
+    MAX_U64 = (1 << 64) - 1
+
+    def __init__(self, log_path: str, fsync: bool = False):
+        self.log_path = log_path
+        # Sync appends and header to disk before save returns (survives power
+        # loss, not just process crashes); off by default, an fsync costs ms
+        self.fsync = fsync
+        # Small chain header {"length", "sha256"} describing the log, rewritten atomically per block
+        self.header_path = log_path + ".head"
+        self._tx_index: Optional[Dict[str, Dict[str, Any]]] = None
+        self._source_index: Dict[str, Dict[str, Any]] = {}
+        # Running SHA-256 of the log contents, checked against the header on load
+        self._digest = None
+        self._verified = False
+        self.initialize()
+
+    def initialize(self):
+        with open(self.log_path, "ab"):
+            pass
+        size = os.path.getsize(self.log_path)
+        header = self._read_header()
+        if header and header.get('length') == size:
+            return  # Clean shutdown: the log ends exactly where the header says
+
+        # Crash recovery: drop a trailing record cut short mid-append
+        end = self._valid_end()
+        if end != size:
+            with open(self.log_path, "r+b") as f:
+                f.truncate(end)
+
+    def _valid_end(self) -> int:
+        """Offset just past the last complete record."""
+        size = os.path.getsize(self.log_path)
+        offset = 0
+        with open(self.log_path, "rb") as f:
+            while offset + self.RECORD_PREFIX.size <= size:
+                f.seek(offset)
+                body_len, _ = self.RECORD_PREFIX.unpack(f.read(self.RECORD_PREFIX.size))
+                end = offset + self.RECORD_PREFIX.size + body_len
+                if end > size:
+                    break
+                offset = end
+        return offset
+
+    @staticmethod
+    def _hex32(value: Any) -> Optional[bytes]:
+        """Raw bytes of a lowercase 64-char hex digest, None if it isn't one."""
+        if type(value) is not str or len(value) != 64:
+            return None
+        try:
+            raw = bytes.fromhex(value)
+        except ValueError:
+            return None
+        return raw if raw.hex() == value else None
+
+    def _encode_record(self, block_data: Dict[str, Any], transactions: List[Dict[str, Any]]) -> bytes:
+        index, nonce = block_data['index'], block_data['nonce']
+        hashes = [self._hex32(block_data[k]) for k in ('hash', 'previous_hash', 'merkle_root')]
+        if (type(index) is int and 0 <= index <= self.MAX_U64
+                and type(nonce) is int and 0 <= nonce <= self.MAX_U64
+                and type(block_data['timestamp']) is float
+                and None not in hashes):
+            body = self.BLOCK_HEADER.pack(index, block_data['timestamp'], nonce, *hashes) + _dumps(transactions)
+            kind = self.KIND_BINARY
+        else:
+            record = dict(block_data)
+            record['transactions'] = transactions
+            body = _dumps(record)
+            kind = self.KIND_JSON
+        return self.RECORD_PREFIX.pack(len(body), kind) + body
+
+    def _decode_record(self, buf, offset: int, body_len: int, kind: int) -> Dict[str, Any]:
+        if kind == self.KIND_JSON:
+            return _loads(buf[offset:offset + body_len])
+
+        index, timestamp, nonce, block_hash, previous_hash, merkle_root = self.BLOCK_HEADER.unpack_from(buf, offset)
+        tx_start = offset + self.BLOCK_HEADER.size
+        return {
+            'index': index,
+            'timestamp': timestamp,
+            'previous_hash': previous_hash.hex(),
+            'hash': block_hash.hex(),
+            'nonce': nonce,
+            'merkle_root': merkle_root.hex(),
+            'transactions': _loads(buf[tx_start:offset + body_len])
+        }
+
+    def _index_transactions(self, transactions: List[Dict[str, Any]]):
+        for tx in transactions:
+            if 'image_hash' in tx:
+                self._tx_index[tx['image_hash']] = tx
+            if 'source_hash' in tx:
+                self._source_index[tx['source_hash']] = tx
+
+    def _write_header(self, length: int):
+        # Write-then-rename so a crash never leaves a half-written header
+        tmp_path = self.header_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({'length': length, 'sha256': self._digest.hexdigest()}, f)
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, self.header_path)
+        if self.fsync and hasattr(os, 'O_DIRECTORY'):
+            # The rename itself is only durable once the directory is synced
+            fd = os.open(os.path.dirname(os.path.abspath(self.header_path)), os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def _read_header(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.header_path) as f:
+                header = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return header if isinstance(header, dict) else None
+
+    def save_block(self, block_data: Dict[str, Any], transactions: List[Dict[str, Any]]):
+        self.save_blocks([(block_data, transactions)])
+
+    def save_blocks(self, blocks: List[Tuple[Dict[str, Any], List[Dict[str, Any]]]]):
+        records = b"".join(self._encode_record(block_data, transactions)
+                           for block_data, transactions in blocks)
+        if self._digest is None:
+            # First save without a load: seed the running digest from the file
+            self._digest = hashlib.sha256()
+            with open(self.log_path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    self._digest.update(chunk)
+        with open(self.log_path, "ab") as f:
+            f.write(records)
+            length = f.tell()
+            if self.fsync:
+                # Records reach the disk before the header that covers them
+                f.flush()
+                os.fsync(f.fileno())
+        self._digest.update(records)
+        self._write_header(length)
+        if self._tx_index is not None:
+            for _, transactions in blocks:
+                self._index_transactions(transactions)
+
+    def replace_blocks(self, blocks: List[Tuple[Dict[str, Any], List[Dict[str, Any]]]]):
+        records = b"".join(self._encode_record(block_data, transactions)
+                           for block_data, transactions in blocks)
+        # Write the new log beside the old one and rename it into place: a
+        # crash before the rename keeps the old log, one after it only leaves
+        # a stale header (the log is then loaded unverified)
+        tmp_path = self.log_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(records)
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, self.log_path)
+        self._digest = hashlib.sha256(records)
+        self._write_header(len(records))
+        if self._tx_index is not None:
+            self._tx_index = {}
+            self._source_index = {}
+            for _, transactions in blocks:
+                self._index_transactions(transactions)
+
+    def chain_verified(self) -> bool:
+        return self._verified
+
+    def load_chain(self) -> List[Dict[str, Any]]:
+        chain_data = []
+        self._tx_index = {}
+        self._source_index = {}
+        self._digest = hashlib.sha256()
+        self._verified = False
+        try:
+            with open(self.log_path, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                if size == 0:
+                    return chain_data
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    # One pass over the whole log; hashlib drops the GIL for it
+                    self._digest.update(mm)
+                    header = self._read_header() or {}
+                    self._verified = (header.get('length') == size
+                                      and header.get('sha256') == self._digest.hexdigest())
+                    offset = 0
+                    while offset + self.RECORD_PREFIX.size <= size:
+                        body_len, kind = self.RECORD_PREFIX.unpack_from(mm, offset)
+                        offset += self.RECORD_PREFIX.size
+                        if offset + body_len > size:
+                            break
+                        block_data = self._decode_record(mm, offset, body_len, kind)
+                        self._index_transactions(block_data['transactions'])
+                        chain_data.append(block_data)
+                        offset += body_len
+            return chain_data
+        except Exception as e:
+            print(f"Error loading blockchain from log: {e}")
+            self._digest = None
+            self._verified = False
+            return []
+
+    def clear_chain(self):
+        with open(self.log_path, "wb"):
+            pass
+        self._tx_index = {}
+        self._source_index = {}
+        self._digest = hashlib.sha256()
+        self._write_header(0)
 
     def find_transaction_by_hash(self, image_hash: str) -> Optional[Dict[str, Any]]:
-        return self.transactions_map.get(image_hash)
+        if self._tx_index is None:
+            self.load_chain()
+        tx = self._tx_index.get(image_hash)
+        return tx if tx is not None else self._source_index.get(image_hash)
@@ -4,11 +4,15 @@ import os
 
 # Try to import the C extension for better performance
 try:
-    from .twopidgeons_c import is_valid_filename_c
+    from .twopidgeons_c import is_valid_filename_c, is_jpeg_file_c
 except ImportError as e:
     # Fallback if compilation failed or not installed
     print(f"Warning: C extension not loaded. Error: {e}")
     is_valid_filename_c = None
+    is_jpeg_file_c = None
+
+# Compiled once; fullmatch, like the C check, also rejects a trailing newline
+_FILENAME_RE = re.compile(r"[a-z]{5}\.2pg")
 
 def is_valid_filename(filename: str) -> bool:
     """
@@ -20,8 +24,7 @@ def is_valid_filename(filename: str) -> bool:
         return is_valid_filename_c(filename)
 
     # Fallback to Python Regex
-    pattern = r"^[a-z]{5}\.2pg$"
-    return bool(re.match(pattern, filename))
+    return _FILENAME_RE.fullmatch(filename) is not None
 
 def is_jpeg_file_fast(filename: str) -> bool:
     """
@@ -42,3 +45,13 @@ def is_jpeg_file_fast(filename: str) -> bool:
 def calculate_hash(data: bytes) -> str:
     """Calculates the SHA-256 hash of binary data."""
     return hashlib.sha256(data).hexdigest()
+
+def calculate_hash_file(path: str) -> str:
+    """SHA-256 of a file, read in chunks instead of loaded whole."""
+    with open(path, "rb") as f:
+        if hasattr(hashlib, "file_digest"):  # Python 3.11+
+            return hashlib.file_digest(f, "sha256").hexdigest()
+        h = hashlib.sha256()
+        for chunk in iter(lambda: f.read(65536), b""):
+            h.update(chunk)
+        return h.hexdigest()
@@ -1,6 +1,7 @@
 #define PY_SSIZE_T_CLEAN
 #include <Python.h>
 #include <stdlib.h>
+#include <string.h>
 
 // OpCodes
 #define OP_HALT 0x00
@@ -47,7 +48,8 @@ static PyObject* execute(PyObject* self, PyObject* args) {
                 goto end;
             case OP_PUSH: {
                 if (pc + sizeof(double) > code_len) { PyErr_SetString(PyExc_RuntimeError, "Truncated bytecode"); goto error; }
-                double val = *(double*)(code + pc);
+                double val;
+                memcpy(&val, code + pc, sizeof(double));  // Operand isn't aligned
                 pc += sizeof(double);
                 if (sp >= STACK_SIZE - 1) { PyErr_SetString(PyExc_RuntimeError, "Stack overflow"); goto error; }
                 PUSH(val);
@@ -1,7 +1,7 @@
 import os
 import hashlib
-import base64
-from .crypto_utils import encrypt_data_hybrid, decrypt_data_hybrid, deserialize_public_key
+import binascii
+from .crypto_utils import encrypt_data_hybrid, decrypt_data_hybrid, deserialize_public_key_cached
 
 class ZKProof:
     """
@@ -19,10 +19,11 @@ class ZKProof:
     """
     
     @staticmethod
-    def create_challenge(public_key_pem: bytes) -> tuple[str, str]:
+    def create_challenge_raw(public_key_pem: bytes) -> tuple[bytes, str]:
         """
-        Generates a challenge for the owner of the public key.
-        Returns: (encrypted_challenge_b64, expected_response_hash)
+        Generates a challenge for the owner of the public key, for transports
+        that carry bytes.
+        Returns: (encrypted_challenge, expected_response_hash)
         """
         # 1. Generate random secret
         secret = os.urandom(32)
@@ -31,31 +32,48 @@ class ZKProof:
         expected_response = hashlib.sha256(secret).hexdigest()
         
         # 3. Encrypt secret with Public Key
-        # We use the existing hybrid encryption from crypto_utils
-        public_key = deserialize_public_key(public_key_pem)
+        # We use the existing hybrid encryption from crypto_utils; a key
+        # challenged repeatedly is only parsed once
+        public_key = deserialize_public_key_cached(public_key_pem)
         encrypted_secret = encrypt_data_hybrid(secret, public_key)
         
-        # 4. Encode for transport
-        encrypted_challenge_b64 = base64.b64encode(encrypted_secret).decode('utf-8')
-        
-        return encrypted_challenge_b64, expected_response
+        return encrypted_secret, expected_response
 
     @staticmethod
-    def solve_challenge(private_key, encrypted_challenge_b64: str) -> str:
+    def create_challenge(public_key_pem: bytes) -> tuple[str, str]:
         """
-        Solves the challenge using the Private Key.
+        Generates a challenge for the owner of the public key.
+        Returns: (encrypted_challenge_b64, expected_response_hash)
+        """
+        encrypted_secret, expected_response = ZKProof.create_challenge_raw(public_key_pem)
+        # Encode for transport
+        return binascii.b2a_base64(encrypted_secret, newline=False).decode('ascii'), expected_response
+
+    @staticmethod
+    def solve_challenge_raw(private_key, encrypted_secret: bytes) -> str:
+        """
+        Solves a challenge from create_challenge_raw using the Private Key.
         Returns: response_hash
         """
         try:
-            # 1. Decode
-            encrypted_secret = base64.b64decode(encrypted_challenge_b64)
-            
-            # 2. Decrypt
+            # 1. Decrypt
             secret = decrypt_data_hybrid(encrypted_secret, private_key)
             
-            # 3. Hash
-            response = hashlib.sha256(secret).hexdigest()
-            return response
+            # 2. Hash
+            return hashlib.sha256(secret).hexdigest()
         except Exception as e:
             print(f"ZKP Failed: {e}")
             return None
+
+    @staticmethod
+    def solve_challenge(private_key, encrypted_challenge_b64: str) -> str:
+        """
+        Solves the challenge using the Private Key.
+        Returns: response_hash
+        """
+        try:
+            encrypted_secret = binascii.a2b_base64(encrypted_challenge_b64)
+        except (binascii.Error, ValueError) as e:
+            print(f"ZKP Failed: {e}")
+            return None
+        return ZKProof.solve_challenge_raw(private_key, encrypted_secret)